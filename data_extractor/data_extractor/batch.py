@@ -0,0 +1,188 @@
+import glob
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from data_extractor.data_extractor.extraction_spec import FULL_SPEC
+from data_extractor.data_extractor.helper import SUPPORTED_EXTENSIONS, ExtractData
+from data_extractor.data_extractor.instrumentation import NULL_METRICS, DocumentMetrics, metrics_for
+from data_extractor.storage.save_data import SaveData
+from data_extractor.storage.sql_storage import SQLStorage
+
+# Files each worker may have extracted (or be extracting) ahead of saving, so
+# finished results cannot pile up in memory when saving is the slower side
+IN_FLIGHT_PER_WORKER = 2
+
+
+def collect_files(source: str) -> List[str]:
+    """
+    Return the supported documents under a directory (recursively) or matching a glob.
+
+    :param source: A directory path or a glob pattern such as 'files/**/*.pdf'.
+    """
+    if os.path.isdir(source):
+        paths = [os.path.join(root, name)
+                 for root, _, names in os.walk(source)
+                 for name in names]
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(path for path in paths
+                  if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS))
+
+
+def extract_file(file_path: str, options: Dict[str, Any], instrument: bool = False) -> Dict[str, Any]:
+    """
+    Extract one file and return its data together with status and timing.
+
+    Any error is recorded in the result instead of being raised, so one bad
+    file never stops the batch.
+
+    :param instrument: Record the extraction's stage timings and counters; they are
+                       returned as a snapshot under 'metrics', since workers cannot report them.
+    """
+    start = time.perf_counter()
+    metrics = DocumentMetrics(file_path) if instrument else NULL_METRICS
+    result = {"file_path": file_path, "status": "ok", "error": None, "reason": None, "pages": 0, "cached": False,
+              "data": None, "document_id": None, "content_hash": None, "format": None, "size": None}
+    try:
+        helper = ExtractData(file_path, metrics=metrics, **options)
+        result["data"] = helper.extractData()
+        result["pages"] = helper.page_count or 0
+        result["cached"] = helper.cache_hit
+        # what extraction learned about the file, so saving need not read it again
+        result["content_hash"] = helper.content_hash
+        result["format"] = helper.file_format
+        result["size"] = helper.file_size
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e) or type(e).__name__
+        # e.g. 'encrypted' for files rejected by format detection before any parse
+        result["reason"] = getattr(e, "reason", None)
+    result["extract_seconds"] = time.perf_counter() - start
+    result["metrics"] = metrics.snapshot()
+    return result
+
+
+def iter_extracted(paths: List[str], workers: int, options: Dict[str, Any],
+                   instrument: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Yield extraction results in input order, in-process or across a process pool.
+
+    The pool runs at most IN_FLIGHT_PER_WORKER files per worker ahead of the
+    result being consumed.
+    """
+    if workers <= 1:
+        for path in paths:
+            yield extract_file(path, options, instrument)
+        return
+
+    paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = deque(executor.submit(extract_file, path, options, instrument)
+                        for path in islice(paths, workers * IN_FLIGHT_PER_WORKER))
+        while futures:
+            result = futures.popleft().result()
+            # the next file starts before this result is saved, so the workers stay busy
+            for path in islice(paths, 1):
+                futures.append(executor.submit(extract_file, path, options, instrument))
+            yield result
+
+
+def run_batch(paths: List[str], workers: int = 1, database: Optional[str] = None,
+              output_root: str = "extracted_data", options: Optional[Dict[str, Any]] = None,
+              image_storage: Optional[str] = None, metrics_sinks: Optional[List[Any]] = None,
+              sql_storage: Optional[SQLStorage] = None,
+              on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Extract and save every file in `paths` inside this process.
+
+    Extraction runs in a pool of `workers` processes (1 runs in-process), while
+    saving happens here over a single shared SQLite connection.
+
+    :param paths: Files to process.
+    :param workers: Number of extraction worker processes.
+    :param database: SQLite database path; defaults to DATABASE_NAME.
+    :param output_root: Directory under which every file's output folder is created.
+    :param options: Extra keyword arguments passed to ExtractData.
+    :param image_storage: 'blob' or 'reference'; defaults to IMAGE_STORAGE.
+    :param metrics_sinks: Sinks every file's stage timings and counters are reported to; see instrumentation.py.
+    :param sql_storage: Optional open SQLStorage to save to instead of `database`; it is left open.
+    :param on_result: Called with every file's result once it is saved (or failed), e.g. to record it;
+                      what it stores through `sql_storage` is committed together with the document.
+    :return: A summary with the per-file results and throughput.
+    """
+    options = options or {}
+    database = database or os.getenv("DATABASE_NAME", "database")
+    started = time.perf_counter()
+    results = []
+
+    shared_storage = sql_storage
+    sql_storage = shared_storage or SQLStorage(database, image_storage or os.getenv("IMAGE_STORAGE", "blob"))
+    try:
+        for result in iter_extracted(paths, workers, options, instrument=bool(metrics_sinks)):
+            save_start = time.perf_counter()
+            metrics = metrics_for(result["file_path"], metrics_sinks)
+            metrics.merge(result.pop("metrics"))
+            # the document and whatever on_result records for it are committed together,
+            # so a crash in between never leaves a saved document on_result did not see
+            previous_metrics = sql_storage.metrics
+            sql_storage.metrics = metrics
+            try:
+                with sql_storage.transaction():
+                    if result["status"] == "ok":
+                        try:
+                            saveData = SaveData(result["data"], result["file_path"], sql_storage=sql_storage,
+                                                output_root=output_root, page_count=result["pages"] or None,
+                                                metrics=metrics, spec=options.get("spec", FULL_SPEC),
+                                                content_hash=result["content_hash"], file_format=result["format"],
+                                                file_size=result["size"])
+                            saveData.saveToLocal()
+                            # a failed save only rolls back its own rows
+                            result["document_id"] = saveData.saveToSQLDatabase()
+                        except Exception as e:
+                            result["status"] = "failed"
+                            result["error"] = str(e) or type(e).__name__
+                    result["save_seconds"] = time.perf_counter() - save_start
+                    # drop the extracted payload so memory does not grow with the corpus
+                    result["data"] = None
+                    if on_result is not None:
+                        on_result(result)
+            finally:
+                sql_storage.metrics = previous_metrics
+            metrics.report(result["status"], result["error"])
+            results.append(result)
+    finally:
+        if shared_storage is None:
+            sql_storage.close()
+
+    elapsed = time.perf_counter() - started
+    succeeded = [result for result in results if result["status"] == "ok"]
+    pages = sum(result["pages"] for result in succeeded)
+    return {
+        "results": results,
+        "elapsed_seconds": elapsed,
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "cache_hits": sum(1 for result in results if result["cached"]),
+        "pages": pages,
+        "docs_per_second": len(succeeded) / elapsed if elapsed else 0.0,
+        "pages_per_second": pages / elapsed if elapsed else 0.0}
+
+
+def print_summary(summary: Dict[str, Any]):
+    """Print the per-file status table and the throughput of a batch run."""
+    print(f"{'STATUS':<8}{'PAGES':>7}{'EXTRACT(s)':>12}{'SAVE(s)':>10}  FILE")
+    for result in summary["results"]:
+        status = "cached" if result["cached"] and result["status"] == "ok" else result["status"]
+        print(f"{status:<8}{result['pages']:>7}{result['extract_seconds']:>12.3f}"
+              f"{result['save_seconds']:>10.3f}  {result['file_path']}")
+        if result["error"]:
+            reason = f" ({result['reason']})" if result.get("reason") else ""
+            print(f"{'':<8}error: {result['error']}{reason}")
+    print("-------------------------------")
+    print(f"Processed {summary['succeeded'] + summary['failed']} files "
+          f"({summary['succeeded']} ok, {summary['failed']} failed, {summary['cache_hits']} from cache) "
+          f"in {summary['elapsed_seconds']:.2f}s")
+    print(f"Throughput: {summary['docs_per_second']:.2f} docs/sec, {summary['pages_per_second']:.2f} pages/sec")
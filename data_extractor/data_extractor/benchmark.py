@@ -0,0 +1,306 @@
+import glob
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, List, Optional
+from data_extractor.data_extractor.batch import collect_files
+from data_extractor.data_extractor.extraction_cache import hash_file
+from data_extractor.data_extractor.helper import ExtractData
+from data_extractor.storage.file_storage import FileStorage
+from data_extractor.storage.save_data import SaveData
+from data_extractor.storage.sql_storage import SQLStorage
+
+# The sample documents the suite runs over by default
+DEFAULT_SOURCES = ("test_files", "files")
+
+# Engine options benchmarked for every format
+ENGINES = {
+    ".pdf": {"default": {}, "pymupdf": {"pdf_engine": "pymupdf"}, "unscreened": {"table_screen": "off"},
+             "pymupdf_tables": {"table_engine": "pymupdf"}},
+    ".docx": {"default": {}, "raw": {"ooxml_engine": "raw"}},
+    ".pptx": {"default": {}, "raw": {"ooxml_engine": "raw"}},
+    ".ppt": {"default": {}},
+}
+
+EXTRACT_METHODS = ("extract_text", "extract_images", "extract_urls", "extract_tables")
+
+# A case is only a regression when it is slower by this fraction and by at
+# least MIN_REGRESSION_SECONDS, so timer noise on tiny cases is ignored.
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def measure(run: Callable[[Any], Any], repeat: int = 3, setup: Optional[Callable[[], Any]] = None,
+            trace_memory: bool = True) -> Dict[str, Any]:
+    """
+    Time `run` and measure its peak memory.
+
+    The fastest of `repeat` runs is reported for wall and CPU time; peak
+    memory comes from one extra run under tracemalloc, so tracing never
+    slows the timed runs down.
+
+    :param run: Callable to measure; it receives the result of `setup` (None without one).
+    :param repeat: Number of timed runs.
+    :param setup: Untimed callable run before every run, e.g. to load the document.
+    :param trace_memory: Whether to do the traced run; peak_bytes is None without it.
+    """
+    if repeat < 1:
+        raise ValueError("Repeat must be at least 1.")
+    wall = []
+    cpu = []
+    result = None
+    peak = None
+    for _ in range(repeat + 1 if trace_memory else repeat):
+        state = setup() if setup else None
+        traced = len(wall) == repeat
+        if traced:
+            tracemalloc.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = run(state)
+        wall_end, cpu_end = time.perf_counter(), time.process_time()
+        if traced:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            wall.append(wall_end - wall_start)
+            cpu.append(cpu_end - cpu_start)
+    return {"wall_seconds": min(wall), "cpu_seconds": min(cpu), "peak_bytes": peak, "result": result}
+
+
+def rates(metrics: Dict[str, Any], pages: Optional[int], size: int) -> Dict[str, Any]:
+    """Add pages/sec and bytes/sec to a measurement and drop its result."""
+    wall = metrics["wall_seconds"]
+    return {
+        "wall_seconds": wall,
+        "cpu_seconds": metrics["cpu_seconds"],
+        "peak_bytes": metrics["peak_bytes"],
+        "pages_per_second": pages / wall if pages and wall else None,
+        "bytes_per_second": size / wall if wall else None,
+        "pages": pages,
+        "bytes": size}
+
+
+def case_path(path: str, source: str) -> str:
+    """
+    Name a file the same way wherever the suite runs from: by its path below
+    the root of `source`, prefixed with that root's own name.
+
+    :param source: The directory, glob or file `path` was collected from; the
+                   root of a glob is its longest leading part without wildcards.
+    """
+    if os.path.isdir(source):
+        root = source
+    else:
+        parts = []
+        for part in os.path.normpath(source).split(os.sep):
+            if glob.has_magic(part):
+                break
+            parts.append(part)
+        root = os.sep.join(parts) or os.curdir
+        if not os.path.isdir(root):
+            root = os.path.dirname(root) or os.curdir
+    root = os.path.abspath(root)
+    relative = os.path.relpath(os.path.abspath(path), root)
+    return "/".join([os.path.basename(root), *relative.split(os.sep)])
+
+
+def benchmark_file(file_path: str, engine: str, options: Dict[str, Any], repeat: int,
+                   work_dir: str, trace_memory: bool = True, name: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Benchmark loading, every extract_* method and both storages for one file and engine.
+
+    :param name: The file's name in the case keys, see case_path(); defaults to `file_path`.
+    """
+    helper = ExtractData(file_path, **options)
+    size = os.path.getsize(file_path)
+    cases = {}
+
+    def loaded():
+        extractor = helper.checkForExtension(file_path)
+        extractor.load(file_path)
+        return extractor
+
+    def load(_):
+        extractor = loaded()
+        pages = extractor.count_pages()
+        extractor.close()
+        return pages
+
+    measured = measure(load, repeat, trace_memory=trace_memory)
+    pages = measured["result"]
+    cases["load"] = rates(measured, pages, size)
+
+    for method in EXTRACT_METHODS:
+        # every method runs on a freshly loaded document, as the first call of a session would
+        def extract(extractor, method=method):
+            try:
+                return getattr(extractor, method)()
+            finally:
+                extractor.close()
+        cases[method] = rates(measure(extract, repeat, setup=loaded, trace_memory=trace_memory), pages, size)
+
+    data = helper.extractData()
+    output_root = os.path.join(work_dir, "files")
+
+    def file_storage_write(_):
+        shutil.rmtree(output_root, ignore_errors=True)
+        saveData = SaveData(data, file_path, output_root=output_root)
+        file_storage = FileStorage(os.path.join(output_root, "document"), saveData.text_layout, saveData.file_writers)
+        try:
+            file_storage.store(data["text"], os.path.basename(file_path), "text")
+            if data["images"]:
+                file_storage.store(data["images"], os.path.basename(file_path), "image")
+            if data["urls"]:
+                file_storage.store(data["urls"], os.path.basename(file_path), "url")
+            if data["tables"]:
+                file_storage.store(data["tables"], os.path.basename(file_path), "data_table")
+        finally:
+            file_storage.close()
+        return file_storage.write_stats()["bytes"]
+
+    measured = measure(file_storage_write, repeat, trace_memory=trace_memory)
+    cases["file_storage"] = rates(measured, pages, measured["result"])
+
+    def sql_storage_write(_):
+        database = os.path.join(work_dir, "benchmark.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+        sql_storage = SQLStorage(database)
+        try:
+            SaveData(data, file_path, sql_storage=sql_storage, page_count=pages, content_hash=helper.content_hash,
+                     file_format=helper.file_format, file_size=helper.file_size).saveToSQLDatabase()
+        finally:
+            sql_storage.close()
+        return os.path.getsize(database)
+
+    measured = measure(sql_storage_write, repeat, trace_memory=trace_memory)
+    cases["sql_storage"] = rates(measured, pages, measured["result"])
+    return {f"{name or file_path}::{engine}::{stage}": metrics for stage, metrics in cases.items()}
+
+
+def run_benchmarks(sources=DEFAULT_SOURCES, repeat: int = 3, engines: Optional[List[str]] = None,
+                   trace_memory: bool = True) -> Dict[str, Any]:
+    """
+    Run the suite over every supported document under `sources`.
+
+    Byte-identical files are benchmarked once, and files that cannot be
+    extracted (corrupt or password protected samples) are listed as skipped.
+    Cases are keyed by case_path(), so results from another working directory
+    or with absolute source paths still match the baseline.
+
+    :param sources: Directories or globs to collect documents from.
+    :param repeat: Number of timed runs per case.
+    :param engines: Engine names to run (e.g. ['default']); all by default.
+    :param trace_memory: Measure peak memory with an extra traced run per case.
+    :return: {'environment', 'cases', 'skipped'}, ready to be written as JSON.
+    """
+    paths = {}
+    seen = set()
+    for source in sources:
+        for path in collect_files(source):
+            content_hash = hash_file(path)
+            if content_hash not in seen:
+                seen.add(content_hash)
+                paths[path] = case_path(path, source)
+
+    cases = {}
+    skipped = {}
+    work_dir = tempfile.mkdtemp(prefix="benchmark-")
+    try:
+        for path, name in paths.items():
+            extension = os.path.splitext(path)[1].lower()
+            for engine, options in ENGINES[extension].items():
+                if engines and engine not in engines:
+                    continue
+                try:
+                    # SaveData prints progress; keep the benchmark output readable
+                    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                        cases.update(benchmark_file(path, engine, options, repeat, work_dir, trace_memory, name))
+                except Exception as e:
+                    skipped[f"{name}::{engine}"] = str(e) or type(e).__name__
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "repeat": repeat,
+                        "trace_memory": trace_memory},
+        "cases": cases,
+        "skipped": skipped}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Return the cases that got slower, or use more memory, than in the baseline.
+
+    Cases found in only one of the two are returned too, with the metric
+    'missing', so a run that matches none of the baseline never passes.
+
+    :param results: Output of run_benchmarks().
+    :param baseline: A saved earlier output of run_benchmarks().
+    :param tolerance: Allowed fractional increase, e.g. 0.25 for 25%.
+    """
+    regressions = []
+    for case, metrics in results["cases"].items():
+        before = baseline["cases"].get(case)
+        if before is None:
+            regressions.append({"case": case, "metric": "missing", "baseline": None, "current": metrics,
+                                "change": None})
+            continue
+        for metric, floor in (("wall_seconds", MIN_REGRESSION_SECONDS), ("peak_bytes", 0)):
+            if metrics[metric] is None or before[metric] is None:
+                continue
+            limit = before[metric] * (1 + tolerance)
+            if metrics[metric] > limit and metrics[metric] - before[metric] > floor:
+                regressions.append({"case": case, "metric": metric, "baseline": before[metric],
+                                    "current": metrics[metric],
+                                    "change": metrics[metric] / before[metric] - 1 if before[metric] else None})
+    for case, before in baseline["cases"].items():
+        if case not in results["cases"]:
+            regressions.append({"case": case, "metric": "missing", "baseline": before, "current": None,
+                                "change": None})
+    return regressions
+
+
+def save_results(results: Dict[str, Any], path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def print_report(results: Dict[str, Any], regressions: Optional[List[Dict[str, Any]]] = None):
+    """Print one line per case, then the skipped files and any regressions."""
+    print(f"{'WALL(s)':>9}{'CPU(s)':>9}{'PEAK(MB)':>10}{'PAGES/s':>10}{'MB/s':>9}  CASE")
+    for case, metrics in sorted(results["cases"].items()):
+        pages_rate = f"{metrics['pages_per_second']:.1f}" if metrics["pages_per_second"] else "-"
+        bytes_rate = f"{metrics['bytes_per_second'] / 1e6:.2f}" if metrics["bytes_per_second"] else "-"
+        peak = f"{metrics['peak_bytes'] / 1e6:.2f}" if metrics["peak_bytes"] is not None else "-"
+        print(f"{metrics['wall_seconds']:>9.4f}{metrics['cpu_seconds']:>9.4f}{peak:>10}"
+              f"{pages_rate:>10}{bytes_rate:>9}  {case}")
+    for case, error in sorted(results["skipped"].items()):
+        print(f"skipped: {case} ({error})")
+    if regressions is None:
+        return
+    print("-------------------------------")
+    if not regressions:
+        print("No regressions against the baseline.")
+    for regression in regressions:
+        if regression["metric"] == "missing":
+            where = "baseline" if regression["baseline"] is None else "results"
+            print(f"REGRESSION {regression['case']}: missing from the {where}")
+            continue
+        change = f"{regression['change']:+.0%}" if regression["change"] is not None else "new"
+        print(f"REGRESSION {regression['case']} {regression['metric']}: "
+              f"{regression['baseline']:.4g} -> {regression['current']:.4g} ({change})")
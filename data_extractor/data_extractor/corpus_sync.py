@@ -0,0 +1,161 @@
+import fnmatch
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+from data_extractor.data_extractor.batch import collect_files, run_batch
+from data_extractor.data_extractor.extraction_cache import hash_file
+from data_extractor.storage.sql_storage import SQLStorage
+
+# What sync_corpus() does with every file:
+# new        not in the manifest yet; extracted
+# changed    its content hash differs from the manifest; extracted, and its old rows are deleted
+# touched    size or modification time changed but not the content; only the manifest is updated
+# unchanged  same size and modification time as in the manifest; not even read
+# deleted    in the manifest but gone from disk; its rows are deleted
+# pending    modified less than `settle` seconds ago, e.g. still being copied; left for the next sync
+SYNC_ACTIONS = ("new", "changed", "touched", "unchanged", "deleted", "pending")
+
+# Seconds between two syncs of watch_corpus()
+DEFAULT_POLL_SECONDS = 5.0
+
+# watch_corpus() leaves files modified less than this many seconds ago for the next round
+DEFAULT_SETTLE_SECONDS = 2.0
+
+
+def in_scope(path: str, source: str) -> bool:
+    """Whether a manifest path belongs to `source`, a directory or a glob."""
+    if os.path.isdir(source):
+        return path.startswith(os.path.join(os.path.abspath(source), ""))
+    return fnmatch.fnmatch(path, os.path.abspath(source))
+
+
+def plan_sync(sql_storage: SQLStorage, source: str, settle: float = 0.0) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Compare the files under `source` with the manifest.
+
+    Files whose size and modification time match the manifest are taken as
+    unchanged without reading them; only the others are hashed. A file that
+    disappears while it is looked at counts as deleted, or as pending when it
+    is gone (or unreadable) by the time it is hashed.
+
+    :param source: A directory path or a glob pattern, as for collect_files().
+    :param settle: Files modified less than this many seconds ago are pending.
+    :return: {action: [{'path', 'size', 'mtime_ns', 'content_hash', 'document_id'}]} for every SYNC_ACTIONS entry;
+             'document_id' is the document stored for the file so far.
+    """
+    manifest = sql_storage.manifest_entries()
+    plan = {action: [] for action in SYNC_ACTIONS}
+    now = time.time()
+    for path in map(os.path.abspath, collect_files(source)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # deleted or renamed since it was listed; its manifest entry is handled as deleted below
+            continue
+        entry = manifest.get(path)
+        item = {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "content_hash": None,
+                "document_id": entry["document_id"] if entry else None}
+        if now - stat.st_mtime < settle:
+            plan["pending"].append(item)
+        elif entry is not None and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            item["content_hash"] = entry["content_hash"]
+            plan["unchanged"].append(item)
+        else:
+            try:
+                item["content_hash"] = hash_file(path)
+            except OSError:
+                # gone or unreadable while being hashed; the next sync looks at it again
+                plan["pending"].append(item)
+                continue
+            if entry is None:
+                plan["new"].append(item)
+            elif entry["content_hash"] == item["content_hash"]:
+                plan["touched"].append(item)
+            else:
+                plan["changed"].append(item)
+
+    pending = {item["path"] for item in plan["pending"]}
+    for path, entry in manifest.items():
+        if in_scope(path, source) and path not in pending and not os.path.isfile(path):
+            plan["deleted"].append({"path": path, **entry})
+    return plan
+
+
+def sync_corpus(source: str, database: Optional[str] = None, settle: float = 0.0, **batch_options) -> Dict[str, Any]:
+    """
+    Bring the database up to date with the files under `source`.
+
+    Only new and changed files are extracted. The rows of deleted files, and
+    the old rows of changed ones, are deleted, so re-running over the same
+    corpus never stores a document twice. A file that fails to extract is
+    dropped from the manifest and tried again by the next sync.
+
+    :param source: A directory path or a glob pattern, as for collect_files().
+    :param database: SQLite database path; defaults to DATABASE_NAME.
+    :param settle: Files modified less than this many seconds ago are left for the next sync.
+    :param batch_options: Passed on to run_batch(), e.g. workers, output_root or options.
+    :return: The run_batch() summary of the extracted files, with the plan's counts under 'sync'.
+    """
+    database = database or os.getenv("DATABASE_NAME", "database")
+    sql_storage = SQLStorage(database, batch_options.pop("image_storage", None) or os.getenv("IMAGE_STORAGE", "blob"))
+    try:
+        plan = plan_sync(sql_storage, source, settle)
+
+        with sql_storage.transaction():
+            for item in plan["deleted"]:
+                if item["document_id"] is not None:
+                    sql_storage.delete_document(item["document_id"])
+                sql_storage.remove_manifest(item["path"])
+            for item in plan["touched"]:
+                sql_storage.record_manifest(item["path"], item["size"], item["mtime_ns"], item["content_hash"],
+                                            item["document_id"])
+
+        items = {item["path"]: item for item in plan["new"] + plan["changed"]}
+
+        def record(result):
+            item = items[os.path.abspath(result["file_path"])]
+            # run_batch() commits this together with the new document, so a crash
+            # can never leave a stored document without its manifest row
+            with sql_storage.transaction():
+                if item["document_id"] is not None:
+                    sql_storage.delete_document(item["document_id"])
+                if result["status"] == "ok":
+                    sql_storage.record_manifest(item["path"], item["size"], item["mtime_ns"], item["content_hash"],
+                                                result["document_id"])
+                else:
+                    sql_storage.remove_manifest(item["path"])
+
+        summary = run_batch(list(items), sql_storage=sql_storage, on_result=record, **batch_options)
+    finally:
+        sql_storage.close()
+
+    summary["sync"] = {action: len(plan[action]) for action in SYNC_ACTIONS}
+    return summary
+
+
+def watch_corpus(source: str, interval: float = DEFAULT_POLL_SECONDS, settle: float = DEFAULT_SETTLE_SECONDS,
+                 rounds: Optional[int] = None, on_sync: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 **sync_options):
+    """
+    Poll `source` and sync every `interval` seconds, ingesting new arrivals as they settle.
+
+    :param rounds: Stop after this many syncs; None polls until interrupted.
+    :param on_sync: Called with the summary of every sync, e.g. print_sync_summary.
+    :param sync_options: Passed on to sync_corpus(), e.g. database or workers.
+    """
+    completed = 0
+    while rounds is None or completed < rounds:
+        summary = sync_corpus(source, settle=settle, **sync_options)
+        if on_sync is not None:
+            on_sync(summary)
+        completed += 1
+        if rounds is None or completed < rounds:
+            time.sleep(interval)
+
+
+def print_sync_summary(summary: Dict[str, Any]):
+    """Print what a sync did with the files, in one line."""
+    counts = summary["sync"]
+    print(f"Sync: {counts['new']} new, {counts['changed']} changed, {counts['deleted']} deleted, "
+          f"{counts['touched']} touched, {counts['unchanged']} unchanged, {counts['pending']} pending; "
+          f"{summary['failed']} failed in {summary['elapsed_seconds']:.2f}s")
@@ -0,0 +1,52 @@
+from typing import Any, Callable, Dict, Optional
+
+
+class DocumentSession():
+    """
+    Holds the parsed handles of a single document for one extraction run.
+
+    Every handle is opened lazily on first use and then reused by all the
+    extract_* methods, so a document is parsed at most once per backend.
+    Handles are closed together when the session is closed.
+
+    `file_path` is a path or a DocumentSource; every opener is called with it.
+    """
+
+    def __init__(self, file_path, loader):
+        self.file_path = file_path
+        self.loader = loader
+        self._handles: Dict[str, Any] = {}
+        self._closers: Dict[str, Optional[Callable[[Any], None]]] = {}
+
+    def get(self, name: str, opener: Callable[[str], Any], closer: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        Return the handle registered under `name`, opening it on first use.
+
+        :param name: Key of the handle, e.g. 'fitz' or 'pdfplumber'.
+        :param opener: Callable that opens the file path (or DocumentSource) and returns the handle.
+        :param closer: Optional callable used to release the handle on close().
+        """
+        if name not in self._handles:
+            self._handles[name] = opener(self.file_path)
+            self._closers[name] = closer
+        return self._handles[name]
+
+    @property
+    def document(self) -> Any:
+        """The document object returned by the extractor's loader."""
+        return self.get("document", self.loader.load_file, self.loader.close_file)
+
+    def close(self):
+        """Close every handle opened by this session."""
+        for name, handle in self._handles.items():
+            closer = self._closers.get(name)
+            if closer is not None:
+                closer(handle)
+        self._handles.clear()
+        self._closers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,150 @@
+import io
+import mmap
+import os
+from typing import Any, BinaryIO, Optional, Union
+import fitz
+
+
+class MemoryStream(io.RawIOBase):
+    """
+    A read-only, seekable stream over a bytes-like buffer.
+
+    Every stream has its own position, so several backends can read the same
+    buffer at once; bytes are only copied out as they are read.
+    """
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer).cast("B")
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        end = min(self.position + len(target), len(self.view))
+        size = max(end - self.position, 0)
+        target[:size] = self.view[self.position:end]
+        self.position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = len(self.view) + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence}).")
+        if self.position < 0:
+            raise ValueError("Negative seek position.")
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def close(self):
+        # the view must be released before the buffer (e.g. an mmap) can be closed
+        if not self.closed:
+            self.view.release()
+        super().close()
+
+
+class DocumentSource():
+    """
+    The bytes of one input document, read or memory-mapped once.
+
+    Every backend (PyPDF2, PyMuPDF, pdfplumber, python-docx, python-pptx,
+    zipfile) opens its own stream over the same buffer instead of opening the
+    file again, and documents that arrive over the network never need to be
+    written to disk.
+    """
+
+    def __init__(self, name: str, data, path: Optional[str] = None, mapped_file: Optional[BinaryIO] = None):
+        """
+        :param name: File name of the document; its extension selects the extractor.
+        :param data: The document bytes: bytes, bytearray, memoryview or mmap.
+        :param path: Path of the file on disk the bytes came from, if any.
+        :param mapped_file: Open file backing an mmap `data`, closed with the source.
+        """
+        self.name = name
+        self.data = data
+        self.path = path
+        self.mapped_file = mapped_file
+
+    @classmethod
+    def from_path(cls, path: str, use_mmap: bool = False) -> "DocumentSource":
+        """
+        Read a file once, or memory-map it so pages are only loaded as backends touch them.
+
+        :param path: Path of the document.
+        :param use_mmap: Map the file instead of reading it into memory.
+        """
+        if not use_mmap:
+            with open(path, "rb") as f:
+                return cls(os.path.basename(path), f.read(), path=path)
+
+        f = open(path, "rb")
+        try:
+            # empty files cannot be mapped
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        except Exception:
+            f.close()
+            raise
+        return cls(os.path.basename(path), data, path=path, mapped_file=f)
+
+    @classmethod
+    def from_stream(cls, name: str, stream: BinaryIO) -> "DocumentSource":
+        """Read an uploaded/network stream once into memory."""
+        return cls(name, stream.read())
+
+    def open(self) -> BinaryIO:
+        """Return a new stream over the document bytes with its own read position."""
+        if isinstance(self.data, bytes):
+            # BytesIO shares an initial bytes object instead of copying it
+            return io.BytesIO(self.data)
+        return io.BufferedReader(MemoryStream(self.data))
+
+    def buffer(self) -> Any:
+        """The document bytes as a buffer PyMuPDF can open without a file."""
+        return self.data if isinstance(self.data, bytes) else memoryview(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def close(self):
+        """Unmap and close the backing file, if any."""
+        if isinstance(self.data, mmap.mmap):
+            try:
+                self.data.close()
+            except BufferError:
+                # a backend still holds a view of the map; it is unmapped once that view is freed
+                pass
+        if self.mapped_file is not None:
+            self.mapped_file.close()
+            self.mapped_file = None
+
+
+def source_name(source: Union[str, DocumentSource]) -> str:
+    """The file name (or path) of a path or DocumentSource, for extension checks."""
+    return source.name if isinstance(source, DocumentSource) else source
+
+
+def source_path(source: Union[str, DocumentSource]) -> Optional[str]:
+    """The path on disk of a path or DocumentSource; None for in-memory documents."""
+    return source.path if isinstance(source, DocumentSource) else source
+
+
+def open_source(source: Union[str, DocumentSource]) -> Union[str, BinaryIO]:
+    """What to hand a backend that accepts a path or a binary stream: the path, or a new stream."""
+    return source.open() if isinstance(source, DocumentSource) else source
+
+
+def open_fitz(source: Union[str, DocumentSource]):
+    """Open a path or DocumentSource with PyMuPDF."""
+    if isinstance(source, DocumentSource):
+        return fitz.open(stream=source.buffer(), filetype="pdf")
+    return fitz.open(source)
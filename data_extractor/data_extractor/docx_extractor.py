@@ -1,92 +1,209 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 import fitz
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from data_extractor.data_extractor.document_session import DocumentSession
 from data_extractor.data_extractor.extractor import Extractor
+from data_extractor.data_extractor.ooxml import hyperlink_records
+from data_extractor.data_extractor.structured_text import StructuredTables
+
+# Parts outside the body whose hyperlinks are extracted too
+NOTE_PART_TYPES = (RT.HEADER, RT.FOOTER, RT.FOOTNOTES, RT.ENDNOTES)
 
 class DOCXExtractor(Extractor):
     def __init__(self, loader):
         self.loader = loader
         self.file = None
         self.file_path = None
+        self.session = None
         
     def load(self, file_path):
         """Load the file using the appropriate loader based on file type."""
-        self.file = self.loader.load_file(file_path)
+        self.close()
+        self.session = DocumentSession(file_path, self.loader)
+        self.file = self.session.document
         self.file_path = file_path 
+
+    def count_pages(self):
+        # DOCX files carry no page layout, so sections are counted instead
+        return len(self.file.sections)
         
-    def extract_text(self):
-        # Extract text from DOCX
-            doc = self.loader.load_file(self.file_path)
-            text = ""
+    def iter_text(self):
+        # Extract text from DOCX, section by section
+        for section_num, blocks in enumerate(self.iter_sections(), start=1):
+            yield section_num, self.section_text(blocks)
 
+    def section_text(self, blocks) -> str:
+        """Join the paragraphs of a section, then the rows of its tables, one per line."""
+        doc = self.session.document
+        paragraph_lines = []
+        table_lines = []
+        for element in blocks:
             # Extract text from paragraphs
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-
+            if element.tag == qn("w:p"):
+                paragraph_lines.append(Paragraph(element, doc._body).text + "\n")
             # Extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = "\t".join(cell.text.strip() for cell in row.cells)
-                    text += row_text + "\n"
-
-            return text
+            else:
+                for row in Table(element, doc._body).rows:
+                    table_lines.append("\t".join(cell.text.strip() for cell in row.cells) + "\n")
+        return "".join(paragraph_lines) + "".join(table_lines)
     
     def extract_images(self):
         images = []
         # DOCX image extraction
-        doc = self.loader.load_file(self.file_path)
+        doc = self.session.document
+        self.image_index(new_pass=True)
         for rel in doc.part.rels.values():
-            if "image" in rel.target_ref:
-                image_blob = rel.target_part.blob
-                # Get the image extension
-                image_ext = rel.target_part.content_type.split('/')[1]
-                # Append the image information only if it is not None
-                if image_blob is not None:
-                    images.append({
-                        "image_data": image_blob,
-                        "ext": image_ext,
-                        "page": rel.target_ref
-                    })
-        doc = None  # Explicitly close the document
+            # Append the image information only if it is not None
+            if "image" in rel.target_ref and rel.target_part.blob is not None:
+                images.append(self.image_record(rel))
         return images
     
     def extract_urls(self) -> List[Dict[str, Any]]:
-        """Extract hyperlinks from a DOCX file."""
+        """
+        Extract hyperlinks from a DOCX file in one pass over the body.
+
+        Every w:hyperlink is resolved through its r:id against the document's
+        relationships; hyperlink relationships not placed in the body, and the
+        links of headers, footers, footnotes and endnotes, follow.
+        """
+        rels = self.file.part.rels
+        seen_rels = set()
         extracted_links = []
+        paragraph_index = 0
+        for element in self.file.element.body.iterchildren():
+            if element.tag == qn("w:p"):
+                # Using the paragraph index as the page number
+                paragraph_index += 1
+                extracted_links.extend(self.block_links(element, paragraph_index, rels, seen_rels))
+            elif element.tag == qn("w:tbl"):
+                extracted_links.extend(self.block_links(element, None, rels, seen_rels))
+
+        extracted_links.extend(self.unplaced_links(rels, seen_rels))
+        extracted_links.extend(self.part_links())
+        return extracted_links
+
+    def block_links(self, element, page_number, rels, seen_rels) -> List[Dict[str, Any]]:
+        """
+        Resolve the w:hyperlink elements of one paragraph or table.
+
+        Each relationship is reported once, at its first placement.
+        """
+        return hyperlink_records(element, page_number, rels, seen_rels)
 
-        # Access the document's relationships to find hyperlinks
+    def unplaced_links(self, rels, seen_rels) -> List[Dict[str, Any]]:
+        """The hyperlink relationships of the document part that no body element refers to."""
+        return [{"linked_text": "", "url": rel.target_ref, "page_number": None}
+                for rel_id, rel in rels.items()
+                if rel_id not in seen_rels and "hyperlink" in rel.reltype]
+
+    def part_links(self) -> List[Dict[str, Any]]:
+        """Extract the hyperlinks of the headers, footers, footnotes and endnotes."""
+        links = []
+        seen_parts = set()
         for rel in self.file.part.rels.values():
-            if "hyperlink" in rel.reltype:
-                # Extract the hyperlink target
-                hyperlink = rel.target_ref
-                
-                # Look for the text associated with this hyperlink
-                linked_text = None
+            if rel.is_external or rel.reltype not in NOTE_PART_TYPES:
+                continue
+            part = rel.target_part
+            if part.partname in seen_parts:
+                continue
+            seen_parts.add(part.partname)
+            # header/footer parts are parsed by python-docx, notes parts are plain blobs
+            element = part.element if hasattr(part, "element") else parse_xml(part.blob)
+            links.extend(self.block_links(element, None, part.rels, set()))
+        return links
+
+    def extract_tables(self):
+        # Extract tables from DOCX, with the section each one is in
+        doc = self.session.document
+        segments = []
+        for section_num, blocks in enumerate(self.iter_sections(), start=1):
+            tables = [Table(element, doc._body) for element in blocks if element.tag == qn("w:tbl")]
+            segments.append((section_num, [[[cell.text.strip() for cell in row.cells] for row in table.rows]
+                                           for table in tables]))
+        return StructuredTables.from_segments(segments)
+
+    def iter_sections(self) -> Iterator[List[Any]]:
+        """Yield the top-level paragraph and table elements of each section, in body order."""
+        blocks = []
+        for child in self.file.element.body.iterchildren():
+            if child.tag in (qn("w:p"), qn("w:tbl")):
+                blocks.append(child)
+            # a paragraph holding a sectPr closes the current section
+            if child.tag == qn("w:p") and child.xpath("./w:pPr/w:sectPr"):
+                yield blocks
+                blocks = []
+        yield blocks
+
+    def iter_units(self) -> Iterator[Dict[str, Any]]:
+        """Yield one record per selected section with its selected artifacts."""
+        doc = self.file
+        spec = self.spec
+        rels = doc.part.rels
+        self.image_index(new_pass=True)
+        seen_rels = set()
+        paragraph_index = 0
+        sections = list(self.iter_sections())
+        selected = spec.page_numbers(len(sections))
+        for section_num, blocks in enumerate(sections, start=1):
+            if not selected or section_num > selected[-1]:
+                break
+            if section_num not in selected:
+                # skipped sections still number their paragraphs and place their relationships
+                for element in blocks:
+                    paragraph_index += element.tag == qn("w:p")
+                    seen_rels.update(element.xpath(".//a:blip/@r:embed | .//w:hyperlink/@r:id"))
+                continue
+
+            unit = {"page": section_num, "text": "", "images": [], "urls": [], "tables": []}
+            paragraph_lines = []
+            table_lines = []
+            for element in blocks:
                 page_number = None
-                for para_index, para in enumerate(self.file.paragraphs, start=1):
-                    for run in para.runs:
-                        if hyperlink in run._element.xml:
-                            linked_text = run.text
-                            page_number = para_index  # Using the paragraph index as the page number
-                            break
-                    if linked_text:
-                        break
-                
-                # Append the link, associated text, and page number to the extracted links
-                extracted_links.append({
-                    "linked_text": linked_text or "",  # Use an empty string if no text is found
-                    "url": hyperlink,
-                    "page_number": page_number
-                })
+                if element.tag == qn("w:p"):
+                    paragraph_index += 1
+                    page_number = paragraph_index
+                    if spec.wants("text"):
+                        paragraph_lines.append(Paragraph(element, doc._body).text + "\n")
+                elif spec.wants("text") or spec.wants("tables"):
+                    table = Table(element, doc._body)
+                    table_content = [[cell.text.strip() for cell in row.cells] for row in table.rows]
+                    if spec.wants("tables"):
+                        unit["tables"].append(table_content)
+                    if spec.wants("text"):
+                        table_lines.extend("\t".join(row) + "\n" for row in table_content)
 
-        return extracted_links
+                # Images and hyperlinks placed in this block
+                if spec.wants("images"):
+                    for rel_id in element.xpath(".//a:blip/@r:embed"):
+                        if rel_id in rels and rel_id not in seen_rels and "image" in rels[rel_id].target_ref:
+                            seen_rels.add(rel_id)
+                            unit["images"].append(self.image_record(rels[rel_id]))
+                if spec.wants("urls"):
+                    unit["urls"].extend(self.block_links(element, page_number, rels, seen_rels))
 
+            # Text of a section lists paragraphs first, then table rows, as section_text does
+            unit["text"] = "".join(paragraph_lines) + "".join(table_lines)
 
+            # Relationships not placed in the body (headers, footers, unused) go to the last section
+            if section_num == len(sections):
+                if spec.wants("images"):
+                    for rel_id, rel in rels.items():
+                        if rel_id not in seen_rels and "image" in rel.target_ref and rel.target_part.blob is not None:
+                            unit["images"].append(self.image_record(rel))
+                if spec.wants("urls"):
+                    unit["urls"].extend(self.unplaced_links(rels, seen_rels))
+                    unit["urls"].extend(self.part_links())
+            yield unit
 
-    def extract_tables(self):
-        # Extract tables from DOCX
-        doc = self.loader.load_file(self.file_path)
-        table_data = []
-        for table in doc.tables:
-            table_content = [[cell.text.strip() for cell in row.cells] for row in table.rows]
-            table_data.append(table_content)
-        return table_data
\ No newline at end of file
+    def image_record(self, rel) -> Dict[str, Any]:
+        """Build the image dict of an image relationship."""
+        image_part = rel.target_part
+        # relationships pointing at the same media part share one hashed image
+        return self.image_index().placement(
+            image_part.partname,
+            lambda: (image_part.blob, image_part.content_type.split('/')[1], None),
+            page=rel.target_ref)
\ No newline at end of file
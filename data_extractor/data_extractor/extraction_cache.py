@@ -0,0 +1,113 @@
+import hashlib
+import pickle
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+# Bump this whenever an extractor's output changes, so results cached by an
+# older version are never served again (see ExtractionCache.invalidate_stale).
+EXTRACTOR_VERSION = "7"
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data) -> str:
+    """Return the SHA-256 hex digest of in-memory document bytes (bytes, memoryview or mmap)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ExtractionCache():
+    """
+    Persistent SQLite cache of extraction results, keyed by the hash of the
+    input bytes, the extractor version and the extraction options.
+
+    Entries are evicted least-recently-used first once the cache grows past
+    `max_bytes`.
+    """
+
+    def __init__(self, database: str, max_bytes: int = DEFAULT_MAX_BYTES, version: str = EXTRACTOR_VERSION):
+        self.database = database
+        self.max_bytes = max_bytes
+        self.version = version
+        self.conn = sqlite3.connect(database, timeout=30)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS extraction_cache (
+            cache_key TEXT PRIMARY KEY,
+            content_hash TEXT,
+            version TEXT,
+            size INTEGER,
+            page_count INTEGER,
+            last_used REAL,
+            data BLOB
+        )""")
+        self.conn.commit()
+
+    def make_key(self, content_hash: str, options: str = "") -> str:
+        """Combine the content hash, extractor version and options into a cache key."""
+        return f"{content_hash}:{self.version}:{options}"
+
+    def get(self, content_hash: str, options: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Return the cached entry as {'data': ..., 'page_count': ...}, or None on a miss.
+        """
+        cache_key = self.make_key(content_hash, options)
+        row = self.conn.execute("SELECT data, page_count FROM extraction_cache WHERE cache_key = ?",
+                                (cache_key,)).fetchone()
+        if row is None:
+            return None
+        self.conn.execute("UPDATE extraction_cache SET last_used = ? WHERE cache_key = ?", (time.time(), cache_key))
+        self.conn.commit()
+        return {"data": pickle.loads(row[0]), "page_count": row[1]}
+
+    def put(self, content_hash: str, data: Dict[str, Any], page_count: Optional[int] = None, options: str = ""):
+        """Store an extraction result and evict old entries if the cache is over its size limit."""
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            # never cache a result that would evict everything else
+            return
+        self.conn.execute("""INSERT OR REPLACE INTO extraction_cache
+            (cache_key, content_hash, version, size, page_count, last_used, data) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (self.make_key(content_hash, options), content_hash, self.version, len(payload), page_count,
+             time.time(), sqlite3.Binary(payload)))
+        self.evict()
+        self.conn.commit()
+
+    def total_size(self) -> int:
+        """Total size in bytes of the cached payloads."""
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM extraction_cache").fetchone()[0]
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        excess = self.total_size() - self.max_bytes
+        if excess <= 0:
+            return
+        rows = self.conn.execute("SELECT cache_key, size FROM extraction_cache ORDER BY last_used").fetchall()
+        for cache_key, size in rows:
+            if excess <= 0:
+                break
+            self.conn.execute("DELETE FROM extraction_cache WHERE cache_key = ?", (cache_key,))
+            excess -= size
+
+    def invalidate(self, content_hash: Optional[str] = None):
+        """Remove the entries of one document, or every entry when no hash is given."""
+        if content_hash is None:
+            self.conn.execute("DELETE FROM extraction_cache")
+        else:
+            self.conn.execute("DELETE FROM extraction_cache WHERE content_hash = ?", (content_hash,))
+        self.conn.commit()
+
+    def invalidate_stale(self):
+        """Remove every entry written by another extractor version."""
+        self.conn.execute("DELETE FROM extraction_cache WHERE version != ?", (self.version,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
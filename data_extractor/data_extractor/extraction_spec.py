@@ -0,0 +1,147 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from data_extractor.data_extractor.image_index import image_size
+from data_extractor.data_extractor.instrumentation import NULL_METRICS
+from data_extractor.data_extractor.structured_text import StructuredTables, StructuredText
+
+# The kinds of data an extractor produces, in the order they are extracted
+ARTIFACTS = ("text", "images", "urls", "tables")
+
+
+def parse_pages(pages: str) -> List[int]:
+    """
+    Parse a page selection such as '1-3,7' into one-based page numbers.
+
+    :param pages: Comma-separated page numbers and inclusive ranges.
+    """
+    numbers = []
+    for part in filter(None, (part.strip() for part in pages.split(","))):
+        first, dash, last = part.partition("-")
+        try:
+            start = int(first)
+            end = int(last) if dash else start
+        except ValueError:
+            raise ValueError("Invalid page selection. Use page numbers and ranges such as 1-3,7.")
+        if start < 1 or end < start:
+            raise ValueError("Invalid page selection. Use page numbers and ranges such as 1-3,7.")
+        numbers.extend(range(start, end + 1))
+    return numbers
+
+
+class ExtractionSpec():
+    """
+    What one extraction request needs: which artifacts, which pages/slides/sections,
+    and limits on their number and size.
+
+    Extractors only do the work of the selected artifacts and pages, so a
+    text-only request never runs table detection or decodes an image.
+    """
+
+    def __init__(self, artifacts: Iterable[str] = ARTIFACTS, pages: Optional[Iterable[int]] = None,
+                 max_pages: Optional[int] = None, max_image_bytes: Optional[int] = None):
+        """
+        :param artifacts: Artifacts to extract, any of ARTIFACTS.
+        :param pages: One-based page (PDF), slide (PPTX) or section (DOCX) numbers; None for all.
+        :param max_pages: Process at most this many of the selected pages.
+        :param max_image_bytes: Drop images larger than this many bytes.
+        """
+        artifacts = set(artifacts)
+        if not artifacts or not artifacts <= set(ARTIFACTS):
+            raise ValueError(f"Unsupported artifact. Use one of: {', '.join(ARTIFACTS)}.")
+        if max_pages is not None and max_pages < 1:
+            raise ValueError("Maximum pages must be at least 1.")
+        self.artifacts = tuple(artifact for artifact in ARTIFACTS if artifact in artifacts)
+        self.pages = sorted(set(pages)) if pages is not None else None
+        self.max_pages = max_pages
+        self.max_image_bytes = max_image_bytes
+
+    @classmethod
+    def from_strings(cls, artifacts: Optional[str] = None, pages: Optional[str] = None,
+                     max_pages: Optional[str] = None, max_image_bytes: Optional[str] = None) -> "ExtractionSpec":
+        """Build a spec from command line/environment values such as 'text,tables' and '1-3,7'; empty means no restriction."""
+        return cls(
+            artifacts=[artifact.strip() for artifact in artifacts.split(",")] if artifacts else ARTIFACTS,
+            pages=parse_pages(pages) if pages else None,
+            max_pages=int(max_pages) if max_pages else None,
+            max_image_bytes=int(max_image_bytes) if max_image_bytes else None)
+
+    def wants(self, artifact: str) -> bool:
+        return artifact in self.artifacts
+
+    @property
+    def all_pages(self) -> bool:
+        """Whether every page of the document is processed."""
+        return self.pages is None and self.max_pages is None
+
+    @property
+    def is_full(self) -> bool:
+        """Whether this spec asks for everything, as extractData() always did."""
+        return self.all_pages and self.artifacts == ARTIFACTS and self.max_image_bytes is None
+
+    def page_numbers(self, page_count: int) -> List[int]:
+        """The selected one-based page numbers of a document with `page_count` pages, in order."""
+        if self.pages is None:
+            numbers = range(1, page_count + 1)
+        else:
+            numbers = [number for number in self.pages if number <= page_count]
+        return list(numbers[:self.max_pages] if self.max_pages is not None else numbers)
+
+    def keeps_image(self, image: Dict[str, Any]) -> bool:
+        return self.max_image_bytes is None or image_size(image) <= self.max_image_bytes
+
+    def filter_unit(self, unit: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply the image size limit to a page/slide/section record."""
+        if self.max_image_bytes is not None and unit["images"]:
+            unit["images"] = [image for image in unit["images"] if self.keeps_image(image)]
+        return unit
+
+    def key(self) -> str:
+        """A stable description of the spec, e.g. for cache keys; '' for the full spec."""
+        if self.is_full:
+            return ""
+        pages = ",".join(map(str, self.pages)) if self.pages is not None else ""
+        return f"{'+'.join(self.artifacts)}|{pages}|{self.max_pages or ''}|{self.max_image_bytes or ''}"
+
+
+# The spec of a plain extractData() call: every artifact of every page
+FULL_SPEC = ExtractionSpec()
+
+
+def collect_units(units: Iterator[Dict[str, Any]], spec: ExtractionSpec) -> Dict[str, Any]:
+    """Assemble the records of an extractor's iter_units() into the dictionary extractData() returns."""
+    text_segments = []
+    table_segments = []
+    collected = {artifact: [] for artifact in ("images", "urls")}
+    for unit in units:
+        text_segments.append((unit["page"], unit["text"]))
+        table_segments.append((unit["page"], unit["tables"]))
+        for artifact, items in collected.items():
+            items.extend(unit[artifact])
+    extracted_data = {"text": StructuredText.from_segments(text_segments),
+                      "tables": StructuredTables.from_segments(table_segments), **collected}
+    # skipped artifacts are None, so they are told apart from empty ones
+    return {artifact: extracted_data[artifact] if spec.wants(artifact) else None for artifact in ARTIFACTS}
+
+
+def extract_with_spec(extractor, spec: ExtractionSpec, metrics=NULL_METRICS) -> Dict[str, Any]:
+    """
+    Run the extract_* methods of the selected artifacts on a loaded extractor.
+
+    A page selection is served from iter_units(), which only visits the
+    selected pages. Skipped artifacts are None in the result.
+    """
+    extractor.spec = spec
+    if not spec.all_pages:
+        with metrics.span("units"):
+            extracted_data = collect_units(extractor.iter_units(), spec)
+    else:
+        extracted_data = {}
+        for artifact in ARTIFACTS:
+            if not spec.wants(artifact):
+                extracted_data[artifact] = None
+                continue
+            with metrics.span(artifact):
+                extracted_data[artifact] = getattr(extractor, f"extract_{artifact}")()
+
+    if extracted_data["images"] and spec.max_image_bytes is not None:
+        extracted_data["images"] = [image for image in extracted_data["images"] if spec.keeps_image(image)]
+    return extracted_data
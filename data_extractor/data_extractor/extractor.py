@@ -1,13 +1,27 @@
 from abc import ABC, abstractmethod
+from data_extractor.data_extractor.extraction_spec import FULL_SPEC
+from data_extractor.data_extractor.image_index import ImageIndex
+from data_extractor.data_extractor.instrumentation import NULL_METRICS
+from data_extractor.data_extractor.structured_text import StructuredText
 
 class Extractor(ABC):
+    # records stage timings and counters; ExtractData replaces it when instrumentation is on
+    metrics = NULL_METRICS
+    # the artifacts and pages iter_units() produces; ExtractData sets the spec of the request
+    spec = FULL_SPEC
+
     @abstractmethod
     def load(self, file_path):
         pass
 
     @abstractmethod
-    def extract_text(self):
+    def iter_text(self):
+        """Yield (page, text) for every page (PDF), slide (PPTX) or section (DOCX)."""
         pass
+
+    def extract_text(self) -> StructuredText:
+        """The text of the loaded document with its page boundaries, assembled once per session."""
+        return self.session.get("text", lambda _: StructuredText.from_segments(self.iter_text()))
     
     @abstractmethod
     def extract_images(self):
@@ -19,4 +33,38 @@ class Extractor(ABC):
     
     @abstractmethod
     def extract_tables(self):
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def iter_units(self):
+        """
+        Yield one record per page (PDF), slide (PPTX) or section (DOCX).
+
+        Each record is a dict with 'page', 'text', 'images', 'urls' and 'tables',
+        so a document can be consumed without holding all of it in memory.
+        """
+        pass
+
+    @abstractmethod
+    def count_pages(self):
+        """Return the number of pages (PDF), slides (PPTX) or sections (DOCX)."""
+        pass
+
+    def image_index(self, new_pass: bool = False) -> ImageIndex:
+        """
+        The ImageIndex of the loaded document, shared by every extract call.
+
+        :param new_pass: Start a new pass over the document's images, as
+                         extract_images() and iter_units() do when they begin.
+        """
+        image_index = self.session.get("images", lambda _: ImageIndex())
+        if new_pass:
+            image_index.start_pass()
+        return image_index
+
+    def close(self):
+        """Release the document session opened by load()."""
+        session = getattr(self, "session", None)
+        if session is not None:
+            session.close()
+            self.session = None
\ No newline at end of file
@@ -0,0 +1,186 @@
+import os
+import re
+import zipfile
+from typing import NamedTuple, Optional
+import olefile
+from lxml import etree
+from data_extractor.data_extractor.document_source import open_source
+from data_extractor.data_extractor.ooxml import qn
+
+# Formats a file name's extension claims; '.ppt' files are often PPTX packages in disguise
+EXTENSION_FORMATS = {".pdf": "pdf", ".docx": "docx", ".pptx": "pptx", ".ppt": "pptx"}
+
+# The error loaders have always raised for an unusable file of each format
+INVALID_FILE_ERRORS = {"pdf": "Invalid PDF file.", "docx": "Invalid DOCX file.", "pptx": "Invalid PPT file.",
+                       "ppt": "Invalid PPT file."}
+
+# Why a file was rejected without being parsed:
+# empty         the file has no bytes
+# unreadable    the file could not be opened
+# unrecognized  no known signature, or a zip/OLE2 container of another kind
+# truncated     a PDF without its trailer (startxref/%%EOF)
+# corrupt       a zip whose central directory or [Content_Types].xml cannot be read,
+#               or an OLE2 file whose directory cannot be read
+# encrypted     a PDF with an /Encrypt trailer entry, or a password protected OOXML file
+# unsupported   a legacy binary Word/PowerPoint file
+# wrong_format  a valid document of another format than the loader reads
+REASONS = ("empty", "unreadable", "unrecognized", "truncated", "corrupt", "encrypted", "unsupported", "wrong_format")
+
+PDF_MAGIC = b"%PDF-"
+ZIP_MAGIC = b"PK\x03\x04"
+OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+# Readers accept a PDF header anywhere in the first KB, and the spec puts %%EOF in the last one
+HEAD_SIZE = 1024
+TAIL_SIZE = 1024
+
+# Bytes read at the startxref offset to find an xref stream's (or linearized trailer's) /Encrypt entry
+XREF_SIZE = 4096
+
+# Content types of the main part of each OOXML format, as listed in [Content_Types].xml
+OOXML_MAIN_TYPES = {
+    "docx": ("wordprocessingml", "ms-word"),
+    "pptx": ("presentationml", "ms-powerpoint"),
+}
+
+# Names of the OLE2 streams that tell the kind of file
+OLE2_STREAMS = {
+    "encrypted": "EncryptedPackage",
+    "ppt": "PowerPoint Document",
+    "doc": "WordDocument",
+}
+
+
+class Detection(NamedTuple):
+    """What a file's bytes say it is."""
+    # 'pdf', 'docx', 'pptx', 'ppt' or 'doc'; None when it cannot be told
+    format: Optional[str]
+    # None when the file looks extractable, else one of REASONS
+    reason: Optional[str]
+
+    def is_valid(self, file_format: str) -> bool:
+        return self.format == file_format and self.reason is None
+
+
+class InvalidFileError(ValueError):
+    """A file rejected before parsing; the message is the loader's usual one, the reason one of REASONS."""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def extension_format(file_name: str) -> Optional[str]:
+    """The format a file name's extension claims, or None for unsupported extensions."""
+    return EXTENSION_FORMATS.get(os.path.splitext(file_name)[1].lower())
+
+
+def detect_format(source) -> Detection:
+    """
+    Tell the format of a document from its signature and container, without parsing it.
+
+    Only the head and tail of a PDF, the central directory and [Content_Types].xml
+    of a zip, or the directory entry names of an OLE2 file are looked at.
+
+    :param source: Path of the document, or a DocumentSource.
+    """
+    try:
+        stream = open_source(source)
+        if isinstance(stream, str):
+            stream = open(stream, "rb")
+    except OSError:
+        return Detection(None, "unreadable")
+
+    with stream:
+        head = stream.read(HEAD_SIZE)
+        if not head:
+            return Detection(None, "empty")
+        if head.startswith(ZIP_MAGIC):
+            return detect_ooxml(stream)
+        if head.startswith(OLE2_MAGIC):
+            return detect_ole2(stream)
+        if PDF_MAGIC in head:
+            return detect_pdf(stream)
+    return Detection(None, "unrecognized")
+
+
+def detect_pdf(stream) -> Detection:
+    """Check that a PDF ends in its trailer and is not encrypted."""
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(max(size - TAIL_SIZE, 0))
+    tail = stream.read()
+    startxref = re.findall(rb"startxref\s+(\d+)", tail)
+    if b"%%EOF" not in tail or not startxref:
+        return Detection("pdf", "truncated")
+    if b"/Encrypt" in tail:
+        return Detection("pdf", "encrypted")
+
+    # xref streams (and the first-page trailer of linearized files) keep /Encrypt at the startxref offset
+    stream.seek(int(startxref[-1]))
+    xref = re.split(rb"stream|startxref", stream.read(XREF_SIZE), maxsplit=1)[0]
+    if b"/Encrypt" in xref:
+        return Detection("pdf", "encrypted")
+    return Detection("pdf", None)
+
+
+def detect_ooxml(stream) -> Detection:
+    """Tell DOCX from PPTX by the content type of the main part in [Content_Types].xml."""
+    try:
+        package = zipfile.ZipFile(stream)
+    except (zipfile.BadZipFile, ValueError):
+        return Detection(None, "corrupt")
+
+    with package:
+        if "[Content_Types].xml" not in package.NameToInfo:
+            return Detection(None, "unrecognized")
+        try:
+            content_types = etree.fromstring(package.read("[Content_Types].xml"))
+        except (zipfile.BadZipFile, etree.XMLSyntaxError, EOFError, ValueError):
+            return Detection(None, "corrupt")
+
+    for override in content_types.iter(qn("ct:Override")):
+        content_type = override.get("ContentType", "")
+        if not content_type.endswith(".main+xml"):
+            continue
+        for file_format, markers in OOXML_MAIN_TYPES.items():
+            if any(marker in content_type for marker in markers):
+                return Detection(file_format, None)
+    return Detection(None, "unrecognized")
+
+
+def detect_ole2(stream) -> Detection:
+    """
+    Tell password protected OOXML files from legacy Word/PowerPoint binaries by their stream names.
+
+    Only the header, the FAT and the directory sectors are read, never the streams themselves.
+    """
+    stream.seek(0)
+    try:
+        ole = olefile.OleFileIO(stream)
+    except Exception:
+        return Detection(None, "corrupt")
+    try:
+        if ole.exists(OLE2_STREAMS["encrypted"]):
+            # the format of the encrypted package cannot be told without decrypting it
+            return Detection(None, "encrypted")
+        for file_format in ("ppt", "doc"):
+            if ole.exists(OLE2_STREAMS[file_format]):
+                return Detection(file_format, "unsupported")
+        return Detection(None, "unrecognized")
+    finally:
+        ole.close()
+
+
+def require_format(source, file_format: str, error: Optional[str] = None) -> Detection:
+    """
+    Raise InvalidFileError unless `source` is a valid-looking file of `file_format`.
+
+    :param source: Path of the document, or a DocumentSource.
+    :param file_format: The format the caller can read, e.g. 'pdf'.
+    :param error: Message of the error; defaults to the format's INVALID_FILE_ERRORS entry.
+    """
+    detection = detect_format(source)
+    if detection.is_valid(file_format):
+        return detection
+    reason = detection.reason or "wrong_format"
+    raise InvalidFileError(error or INVALID_FILE_ERRORS[file_format], reason)
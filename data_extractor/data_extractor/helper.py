@@ -1,53 +1,238 @@
+import os
+from data_extractor.data_extractor.document_source import DocumentSource
 from data_extractor.data_extractor.docx_extractor import DOCXExtractor
+from data_extractor.data_extractor.extraction_cache import ExtractionCache, hash_bytes
+from data_extractor.data_extractor.extraction_spec import FULL_SPEC, extract_with_spec
+from data_extractor.data_extractor.format_detection import (INVALID_FILE_ERRORS, InvalidFileError, detect_format,
+                                                            extension_format)
+from data_extractor.data_extractor.instrumentation import NULL_METRICS, count_artifacts
 from data_extractor.data_extractor.pdf_extractor import PDFExtractor
+from data_extractor.data_extractor.pdf_parallel import DEFAULT_SHARD_SIZE
 from data_extractor.data_extractor.pptx_extractor import PPTXExtractor
+from data_extractor.data_extractor.pymupdf_extractor import PyMuPDFExtractor
+from data_extractor.data_extractor.raw_docx_extractor import RawDOCXExtractor
+from data_extractor.data_extractor.raw_pptx_extractor import RawPPTXExtractor
 from data_extractor.file_loaders.docx_loader import DOCXLoader
+from data_extractor.file_loaders.ooxml_loader import OOXMLLoader
 from data_extractor.file_loaders.pdf_loader import PDFLoader
 from data_extractor.file_loaders.ppt_loader import PPTLoader
+from data_extractor.file_loaders.pymupdf_loader import PyMuPDFLoader
+
+# PDF engines that can be selected with ExtractData(pdf_engine=...)
+PDF_ENGINES = ("default", "pymupdf")
+
+# DOCX/PPTX engines that can be selected with ExtractData(ooxml_engine=...)
+OOXML_ENGINES = ("default", "raw")
+
+# File extensions ExtractData can route to an extractor
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".pptx", ".ppt")
 
 
 class ExtractData():
-    def __init__(self, file_path):
+    def __init__(self, file_path, pdf_engine="default", pdf_workers=1, pdf_shard_size=DEFAULT_SHARD_SIZE,
+                 cache=None, ooxml_engine="default", pptx_workers=1, data=None, use_mmap=False,
+                 metrics=NULL_METRICS, spec=FULL_SPEC, table_engine="pdfplumber", table_screen="on"):
+        """
+        :param file_path: Path of the document, or its file name when `data` is given.
+        :param data: The document itself, as bytes or a binary stream (e.g. an upload), so it
+                     never has to be written to disk.
+        :param use_mmap: Memory-map the file at `file_path` instead of reading it into memory.
+        :param metrics: A DocumentMetrics recording the stage timings and counters of the extraction.
+        :param spec: An ExtractionSpec selecting the artifacts and pages to extract; skipped
+                     artifacts are None in the result.
+        :param table_engine: 'pdfplumber' or 'pymupdf' detects the tables of the default PDF engine.
+        :param table_screen: 'on' skips PDF table detection on pages without ruling lines, 'off' runs it on
+                             every page and 'verify' also counts the pages 'on' would miss (so
+                             it always extracts, even with a cache).
+        """
+        if pdf_engine not in PDF_ENGINES:
+            raise ValueError(f"Unsupported PDF engine. Use one of: {', '.join(PDF_ENGINES)}.")
+        if ooxml_engine not in OOXML_ENGINES:
+            raise ValueError(f"Unsupported OOXML engine. Use one of: {', '.join(OOXML_ENGINES)}.")
         self.file_path = file_path
+        self.data = data
+        self.use_mmap = use_mmap
+        self.pdf_engine = pdf_engine
+        # 'raw' reads DOCX/PPTX XML straight from the zip instead of python-docx/python-pptx
+        self.ooxml_engine = ooxml_engine
+        # pdf_workers > 1 extracts PDF images and tables across a process pool
+        self.pdf_workers = pdf_workers
+        self.pdf_shard_size = pdf_shard_size
+        # pptx_workers > 1 spreads the slides of large PPTX decks across a process pool
+        self.pptx_workers = pptx_workers
+        self.table_engine = table_engine
+        self.table_screen = table_screen
+        # an ExtractionCache, or the path of its database, to reuse results of identical files
+        self.cache = cache
+        # number of pages/slides/sections of the last extracted document
+        self.page_count = None
+        # 'pdf', 'docx' or 'pptx', as told by the content of the last extracted document
+        self.file_format = None
+        # SHA-256 and byte size of the last extracted document, for the cache and the documents table
+        self.content_hash = None
+        self.file_size = None
+        # whether the last extractData() call was served from the cache
+        self.cache_hit = False
+        # NULL_METRICS records nothing, so instrumentation costs nothing when it is off
+        self.metrics = metrics
+        # FULL_SPEC extracts every artifact of every page
+        self.spec = spec
         
     def checkForExtension(self, file_path):
-        if file_path.endswith(".pdf"):
+        file_format = extension_format(file_path)
+        if file_format is None:
+            raise ValueError("Unsupported file format. Use PDF, DOCX, or PPTX.")
+        return self.extractorFor(file_format)
+
+    def extractorFor(self, file_format):
+        """Return the extractor of the selected engine for a 'pdf', 'docx' or 'pptx' document."""
+        if file_format == "pdf" and self.pdf_engine == "pymupdf":
+            loader = PyMuPDFLoader()
+            extractor = PyMuPDFExtractor(loader, table_screen=self.table_screen)
+        elif file_format == "pdf":
             loader = PDFLoader()
-            extractor = PDFExtractor(loader)
-        elif file_path.endswith(".docx"):
+            extractor = PDFExtractor(loader, workers=self.pdf_workers, shard_size=self.pdf_shard_size,
+                                     table_engine=self.table_engine, table_screen=self.table_screen)
+        elif file_format == "docx" and self.ooxml_engine == "raw":
+            loader = OOXMLLoader(".docx")
+            extractor = RawDOCXExtractor(loader)
+        elif file_format == "pptx" and self.ooxml_engine == "raw":
+            loader = OOXMLLoader(".pptx")
+            extractor = RawPPTXExtractor(loader)
+        elif file_format == "docx":
             loader = DOCXLoader()
             extractor = DOCXExtractor(loader)
-        elif file_path.endswith(".pptx") or file_path.endswith(".ppt"):
+        elif file_format == "pptx":
             loader = PPTLoader()
-            extractor = PPTXExtractor(loader)
+            extractor = PPTXExtractor(loader, workers=self.pptx_workers)
         else:
             raise ValueError("Unsupported file format. Use PDF, DOCX, or PPTX.") 
+        extractor.metrics = self.metrics
+        extractor.spec = self.spec
         
         # return the appropriate extractor
         return extractor
 
+    def invalidFile(self, reason):
+        """The error for a document that cannot be extracted, in the words of the format its name claims."""
+        claimed = extension_format(self.file_path)
+        if claimed is None:
+            return ValueError("Unsupported file format. Use PDF, DOCX, or PPTX.")
+        return InvalidFileError(INVALID_FILE_ERRORS[claimed], reason)
+
+    def detectFormat(self, source):
+        """
+        Tell the document's format from its bytes instead of its name.
+
+        Mislabeled files reach the extractor of their real format, while empty,
+        corrupt, encrypted and legacy binary files are rejected before any parse.
+        """
+        with self.metrics.span("detect"):
+            detection = detect_format(source)
+        if detection.reason is not None:
+            raise self.invalidFile(detection.reason)
+        self.file_format = detection.format
+        return detection.format
+
+    def openSource(self):
+        """Read (or memory-map) the document once; every backend then reads from this buffer."""
+        if self.data is None:
+            try:
+                return DocumentSource.from_path(self.file_path, self.use_mmap)
+            except OSError:
+                raise self.invalidFile("unreadable")
+        if isinstance(self.data, (bytes, bytearray, memoryview)):
+            return DocumentSource(os.path.basename(self.file_path), self.data)
+        return DocumentSource.from_stream(os.path.basename(self.file_path), self.data)
+
     def extractData(self):
-        # check for extension
-        extractor = self.checkForExtension(self.file_path)
+        self.cache_hit = False
+        source = self.openSource()
+        try:
+            # route by content, not by extension
+            extractor = self.extractorFor(self.detectFormat(source))
+            # the bytes are already in memory; hashing them here spares SaveData re-reading the file
+            self.content_hash = hash_bytes(source.data)
+            self.file_size = len(source.data)
+            # 'verify' is run to count the tables the screen misses, which a cached result cannot tell
+            if self.cache is None or (self.file_format == "pdf" and self.table_screen == "verify"):
+                return self.runExtractor(extractor, source)
+            return self.extractCached(extractor, source)
+        finally:
+            source.close()
+
+    def extractCached(self, extractor, source):
+        # look the file's content hash up before running any extractor
+        cache = ExtractionCache(self.cache) if isinstance(self.cache, str) else self.cache
+        try:
+            content_hash = self.content_hash
+            # only the engine of the file's format changes what is extracted
+            options = self.pdf_engine if self.file_format == "pdf" else self.ooxml_engine
+            if self.file_format == "pdf" and self.pdf_engine == "default" and self.table_engine != "pdfplumber":
+                options += f"+{self.table_engine}"
+            # screened and unscreened table detection may find different tables
+            if self.file_format == "pdf" and self.table_screen != "on":
+                options += f"+screen-{self.table_screen}"
+            # a partial extraction is cached apart from the full one
+            options += self.spec.key()
+            with self.metrics.span("cache_lookup"):
+                cached = cache.get(content_hash, options)
+            if cached is not None:
+                self.cache_hit = True
+                self.page_count = cached["page_count"]
+                self.metrics.count("cache_hits")
+                count_artifacts(self.metrics, cached["data"], self.page_count)
+                return cached["data"]
+
+            extracted_data = self.runExtractor(extractor, source)
+            cache.put(content_hash, extracted_data, self.page_count, options)
+            return extracted_data
+        finally:
+            if cache is not self.cache:
+                cache.close()
 
+    def runExtractor(self, extractor, source):
+        metrics = self.metrics
         # Extract texts
-        extractor.load(self.file_path)
-        
-        #extract texts 
-        extracted_text = extractor.extract_text()
+        with metrics.span("load"):
+            extractor.load(source)
+        try:
+            self.page_count = extractor.count_pages()
 
-        # Extract images (if available)
-        images = extractor.extract_images()
+            # extract the text, images, URLs and tables the spec asks for
+            extracted_data = extract_with_spec(extractor, self.spec, metrics)
+        finally:
+            # release every parsed handle of the document session
+            extractor.close()
         
-        # Extract URLs
-        urls = extractor.extract_urls()
+        count_artifacts(metrics, extracted_data, self.page_count)
+        return extracted_data
 
-        # Extract tables
-        tables = extractor.extract_tables()
-        
-        # return a dictionary of items extracted
-        return {
-            "text": extracted_text,
-            "images": images,
-            "urls": urls,
-            "tables": tables}
\ No newline at end of file
+    def iterUnits(self):
+        """
+        Yield the document one page/slide/section record at a time.
+
+        The extractor's document session stays open while the generator is
+        consumed and is closed once it is exhausted or discarded.
+        """
+        source = self.openSource()
+        extractor = None
+        try:
+            extractor = self.extractorFor(self.detectFormat(source))
+            with self.metrics.span("load"):
+                extractor.load(source)
+            self.page_count = extractor.count_pages()
+            units = extractor.iter_units()
+            while True:
+                # only the time spent producing a unit is recorded, not the consumer's
+                with self.metrics.span("units"):
+                    unit = next(units, None)
+                if unit is None:
+                    return
+                self.spec.filter_unit(unit)
+                count_artifacts(self.metrics, unit, 1)
+                yield unit
+        finally:
+            if extractor is not None:
+                extractor.close()
+            source.close()
\ No newline at end of file
@@ -0,0 +1,76 @@
+import hashlib
+from typing import Any, Callable, Dict, Tuple
+
+
+def hash_image(image_bytes: bytes) -> str:
+    """Return the content hash used to deduplicate images across documents."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class ImageIndex():
+    """
+    Decodes and hashes every distinct image of a document once per pass.
+
+    Images are keyed by whatever identifies them inside the document (the
+    xref of a PDF image, the part name of a DOCX/PPTX media part). Only the
+    hash, ext, dimensions and size of each image are kept: its bytes are
+    handed out with its first placement of a pass alone, so streaming a
+    document never holds more image bytes than the current page's. Later
+    placements carry the same hash, by which storages find the bytes they
+    already wrote.
+    """
+
+    def __init__(self):
+        self.images: Dict[Any, Dict[str, Any]] = {}
+        # keys whose bytes were handed out since the current pass began
+        self.handed_out = set()
+
+    def start_pass(self):
+        """Begin another pass over the document; every image's next placement carries its bytes again."""
+        self.handed_out.clear()
+
+    def get(self, key: Any, load: Callable[[], Tuple[bytes, str, Any]]) -> Dict[str, Any]:
+        """
+        Return {'ext', 'dimensions', 'hash', 'size'} for `key`, plus 'image_data'
+        on its first use in this pass (calling `load`).
+
+        :param key: Identifier of the image inside the document.
+        :param load: Callable returning (image_bytes, ext, dimensions).
+        """
+        if key in self.handed_out:
+            return dict(self.images[key])
+        image_bytes, image_ext, dimensions = load()
+        if key not in self.images:
+            self.images[key] = {
+                "ext": image_ext,
+                "dimensions": dimensions,
+                "hash": hash_image(image_bytes),
+                "size": len(image_bytes)
+            }
+        self.handed_out.add(key)
+        return dict(self.images[key], image_data=image_bytes)
+
+    def placement(self, key: Any, load: Callable[[], Tuple[bytes, str, Any]], **details) -> Dict[str, Any]:
+        """
+        Return the image dict of one placement of an image.
+
+        The dict carries the image's hash, ext and size (and its bytes, for
+        its first placement in the pass) plus the placement's own details,
+        such as its page.
+        """
+        image = self.get(key, load)
+        if image["dimensions"] is None:
+            del image["dimensions"]
+        image.update(details)
+        return image
+
+
+def image_size(image: Dict[str, Any]) -> int:
+    """The byte size of an image dict, whether or not it carries the bytes."""
+    return image["size"] if "size" in image else len(image["image_data"])
+
+
+def load_pdf_image(pdf_document, xref: int) -> Tuple[bytes, str, Tuple[int, int]]:
+    """Decode one PDF image by xref with PyMuPDF, in the form ImageIndex.get expects."""
+    base_image = pdf_document.extract_image(xref)
+    return base_image["image"], base_image["ext"], (base_image["width"], base_image["height"])
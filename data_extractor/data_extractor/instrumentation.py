@@ -0,0 +1,223 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, List, Optional, TextIO
+from data_extractor.data_extractor.image_index import image_size
+
+# Counters every document report carries, so sinks always see the same keys
+COUNTERS = ("pages", "images", "image_bytes", "tables", "links", "rows_written", "files_written", "bytes_written",
+            "table_pages_screened", "table_pages_skipped", "table_pages_missed", "table_pages_with_tables")
+
+# Prefix of every metric in the Prometheus textfile
+PROMETHEUS_PREFIX = "data_extractor"
+
+
+class NullMetrics():
+    """
+    The recorder used when instrumentation is off.
+
+    span() hands back one shared no-op context manager and count() returns
+    at once, so instrumented code pays a method call and nothing else.
+    """
+
+    enabled = False
+    span_context = nullcontext()
+
+    def span(self, name: str):
+        return self.span_context
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def merge(self, snapshot: Dict[str, Any]):
+        pass
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        return None
+
+    def report(self, status: str = "ok", error: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return None
+
+
+NULL_METRICS = NullMetrics()
+
+
+class DocumentMetrics():
+    """
+    Per-stage timings and counters of one document, sent to sinks by report().
+
+    Spans with the same name add up, so a stage that runs several times (or
+    on several writer threads) reports its total time. Recording is thread-safe.
+    """
+
+    enabled = True
+
+    def __init__(self, document: str, sinks: Optional[List[Any]] = None):
+        """
+        :param document: Name of the document, e.g. its file path.
+        :param sinks: Objects with an emit(report) method; see sinks_from_spec().
+        """
+        self.document = document
+        self.sinks = sinks or []
+        self.spans: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str):
+        """Time the block and add it to the stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.spans[name] = self.spans.get(name, 0.0) + elapsed
+
+    def count(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The spans and counters recorded so far, e.g. to send them back from a worker process."""
+        with self.lock:
+            return {"spans": dict(self.spans), "counters": dict(self.counters)}
+
+    def merge(self, snapshot: Optional[Dict[str, Any]]):
+        """Add the spans and counters of a snapshot recorded elsewhere."""
+        if snapshot is None:
+            return
+        with self.lock:
+            for name, seconds in snapshot["spans"].items():
+                self.spans[name] = self.spans.get(name, 0.0) + seconds
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self, status: str = "ok", error: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Send the document's report to every sink and return it.
+
+        :param status: 'ok', or 'failed' for a document that could not be extracted or saved.
+        :param error: The error message of a failed document.
+        """
+        report = {"document": self.document, "status": status, "error": error, **self.snapshot()}
+        for sink in self.sinks:
+            sink.emit(report)
+        return report
+
+
+class JSONLineSink():
+    """Writes every report as one JSON line, to a file (appended) or a stream such as stderr."""
+
+    def __init__(self, target: Optional[str] = None):
+        """:param target: Path of the log file; None or '-' writes to stderr."""
+        self.path = None if target in (None, "-") else target
+        self.lock = threading.Lock()
+
+    def emit(self, report: Dict[str, Any]):
+        line = json.dumps(report, sort_keys=True) + "\n"
+        with self.lock:
+            if self.path is None:
+                self.write(sys.stderr, line)
+                return
+            with open(self.path, "a") as f:
+                self.write(f, line)
+
+    def write(self, stream: TextIO, line: str):
+        stream.write(line)
+        stream.flush()
+
+
+class PrometheusTextfileSink():
+    """
+    Keeps running totals over every reported document and rewrites a
+    Prometheus textfile (for the node exporter's textfile collector) after each one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # documents reported, per status
+        self.documents: Dict[str, int] = {}
+        self.spans: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def emit(self, report: Dict[str, Any]):
+        with self.lock:
+            self.documents[report["status"]] = self.documents.get(report["status"], 0) + 1
+            for name, seconds in report["spans"].items():
+                self.spans[name] = self.spans.get(name, 0.0) + seconds
+            for name, value in report["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            self.write()
+
+    def write(self):
+        lines = [f"# TYPE {PROMETHEUS_PREFIX}_documents_total counter"]
+        lines.extend(f'{PROMETHEUS_PREFIX}_documents_total{{status="{status}"}} {count}'
+                     for status, count in sorted(self.documents.items()))
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds_total counter")
+        lines.extend(f'{PROMETHEUS_PREFIX}_stage_seconds_total{{stage="{name}"}} {seconds:.6f}'
+                     for name, seconds in sorted(self.spans.items()))
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name}_total counter")
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}_total {value}")
+
+        # the collector must never read a half-written file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+class CallbackSink():
+    """Hands every report to a user callback."""
+
+    def __init__(self, callback: Callable[[Dict[str, Any]], None]):
+        self.callback = callback
+
+    def emit(self, report: Dict[str, Any]):
+        self.callback(report)
+
+
+def sinks_from_spec(spec: Optional[str]) -> List[Any]:
+    """
+    Build sinks from a comma-separated spec such as METRICS_SINK.
+
+    'json' logs to stderr, 'json:<path>' appends to a file and
+    'prometheus:<path>' writes a textfile. An empty spec means no sinks.
+    """
+    sinks = []
+    for entry in filter(None, (part.strip() for part in (spec or "").split(","))):
+        kind, _, target = entry.partition(":")
+        if kind == "json":
+            sinks.append(JSONLineSink(target or None))
+        elif kind == "prometheus" and target:
+            sinks.append(PrometheusTextfileSink(target))
+        else:
+            raise ValueError("Unsupported metrics sink. Use one of: json, json:<path>, prometheus:<path>.")
+    return sinks
+
+
+def count_artifacts(metrics, data: Dict[str, Any], pages: Optional[int]):
+    """
+    Count the pages, images, image bytes, tables and links of an extraction result or unit.
+
+    Image bytes are counted once per distinct image, as they are stored.
+    """
+    if not metrics.enabled:
+        return
+    images = data.get("images") or []
+    distinct = {image.get("hash") or id(image): image_size(image) for image in images}
+    metrics.count("pages", pages or 0)
+    metrics.count("images", len(images))
+    metrics.count("image_bytes", sum(distinct.values()))
+    metrics.count("tables", len(data.get("tables") or []))
+    metrics.count("links", len(data.get("urls") or []))
+
+
+def metrics_for(document: str, sinks: Optional[List[Any]]):
+    """A DocumentMetrics reporting to `sinks`, or NULL_METRICS when there are none."""
+    return DocumentMetrics(document, sinks) if sinks else NULL_METRICS
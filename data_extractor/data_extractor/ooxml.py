@@ -0,0 +1,160 @@
+import posixpath
+import zipfile
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+from lxml import etree
+
+# Namespaces of the OOXML parts read by the raw engine
+NAMESPACES = {
+    "w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "ct": "http://schemas.openxmlformats.org/package/2006/content-types",
+    "pr": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+
+# Extensions python-pptx reports for the image formats it supports
+IMAGE_EXTENSIONS = {
+    "image/bmp": "bmp",
+    "image/gif": "gif",
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/tiff": "tiff",
+    "image/x-wmf": "wmf",
+}
+
+
+def qn(tag: str) -> str:
+    """Turn a prefixed tag such as 'w:p' into lxml's '{namespace}p' form."""
+    prefix, name = tag.split(":")
+    return f"{{{NAMESPACES[prefix]}}}{name}"
+
+
+class Relationship(NamedTuple):
+    """One relationship of a part, with the attributes python-docx/python-pptx relationships have."""
+    rId: str
+    reltype: str
+    target_ref: str
+    is_external: bool
+    # absolute name of the target part, e.g. '/word/media/image1.png'; None for external targets
+    partname: Optional[str]
+
+
+class OOXMLPackage():
+    """
+    Read-only access to the parts of a DOCX/PPTX zip without building an object model.
+
+    Parts are read straight from the zip when asked for; relationships and
+    content types are parsed once.
+    """
+
+    def __init__(self, file):
+        """:param file: Path of the package, or a seekable binary stream over its bytes."""
+        self.zip = zipfile.ZipFile(file)
+        self.names = set(self.zip.namelist())
+        self.rels_cache: Dict[str, Dict[str, Relationship]] = {}
+        self.content_types = self.read_content_types()
+        # e.g. '/word/document.xml' or '/ppt/presentation.xml'
+        self.main_partname = self.main_part()
+
+    def read_content_types(self) -> Dict[str, Dict[str, str]]:
+        root = etree.fromstring(self.zip.read("[Content_Types].xml"))
+        defaults = {element.get("Extension").lower(): element.get("ContentType")
+                    for element in root.iter(qn("ct:Default"))}
+        overrides = {element.get("PartName"): element.get("ContentType")
+                     for element in root.iter(qn("ct:Override"))}
+        return {"defaults": defaults, "overrides": overrides}
+
+    def has_part(self, partname: str) -> bool:
+        return partname.lstrip("/") in self.names
+
+    def read(self, partname: str) -> bytes:
+        """Return the raw bytes of a part, e.g. an image, without decoding it."""
+        return self.zip.read(partname.lstrip("/"))
+
+    def open(self, partname: str):
+        """Open a part for streaming reads."""
+        return self.zip.open(partname.lstrip("/"))
+
+    def parse(self, partname: str):
+        """Parse a (small) XML part, such as a slide, into an element tree."""
+        with self.open(partname) as part:
+            return etree.parse(part).getroot()
+
+    def content_type(self, partname: str) -> Optional[str]:
+        override = self.content_types["overrides"].get(partname)
+        if override is not None:
+            return override
+        return self.content_types["defaults"].get(posixpath.splitext(partname)[1].lstrip(".").lower())
+
+    def rels(self, partname: str) -> Dict[str, Relationship]:
+        """Return the relationships of a part by rId, in the order of its .rels file."""
+        if partname not in self.rels_cache:
+            directory, name = posixpath.split(partname)
+            rels_name = posixpath.join(directory, "_rels", name + ".rels")
+            rels = {}
+            if self.has_part(rels_name):
+                for element in self.parse(rels_name).iter(qn("pr:Relationship")):
+                    target = element.get("Target")
+                    is_external = element.get("TargetMode") == "External"
+                    partname_of_target = None
+                    if not is_external:
+                        partname_of_target = posixpath.normpath(posixpath.join(directory, target))
+                        # internal targets are referred to relative to the part, as python-docx does
+                        target = posixpath.relpath(partname_of_target, directory)
+                    rels[element.get("Id")] = Relationship(element.get("Id"), element.get("Type"), target,
+                                                           is_external, partname_of_target)
+            self.rels_cache[partname] = rels
+        return self.rels_cache[partname]
+
+    def main_part(self) -> Optional[str]:
+        """The partname of the package's main document, e.g. '/word/document.xml'."""
+        for rel in self.rels("/").values():
+            if rel.reltype.endswith("/officeDocument") and not rel.is_external:
+                return rel.partname
+        return None
+
+    def image_ext(self, partname: str) -> str:
+        """The image extension python-pptx would report, from the content type instead of the bytes."""
+        content_type = self.content_type(partname) or ""
+        return IMAGE_EXTENSIONS.get(content_type) or posixpath.splitext(partname)[1].lstrip(".").lower()
+
+    def close(self):
+        self.zip.close()
+
+
+def iter_children(stream, parent_tag: str, tags: List[str]) -> Iterator[Any]:
+    """
+    Incrementally parse an XML stream and yield the direct children of `parent_tag`
+    with one of `tags`, each fully built.
+
+    Every yielded element is freed once the caller moves on, so memory stays
+    bounded by the largest single element instead of the whole part.
+    """
+    for _, element in etree.iterparse(stream, events=("end",), tag=tags, huge_tree=True):
+        parent = element.getparent()
+        if parent is None or parent.tag != parent_tag:
+            continue
+        yield element
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def hyperlink_records(element, page_number, rels, seen_rels) -> List[Dict[str, Any]]:
+    """
+    Resolve the w:hyperlink elements under a DOCX element against a part's relationships.
+
+    Each relationship is reported once, at its first placement.
+    """
+    links = []
+    for hyperlink in element.iter(qn("w:hyperlink")):
+        rel_id = hyperlink.get(qn("r:id"))
+        if rel_id in rels and rel_id not in seen_rels and "hyperlink" in rels[rel_id].reltype:
+            seen_rels.add(rel_id)
+            links.append({
+                "linked_text": "".join(text.text or "" for text in hyperlink.iter(qn("w:t"))),
+                "url": rels[rel_id].target_ref,
+                "page_number": page_number
+            })
+    return links
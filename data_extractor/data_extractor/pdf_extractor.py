@@ -1,75 +1,170 @@
-from typing import Any, Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, Iterator, List
 import fitz
 import pdfplumber
+from data_extractor.data_extractor import pdf_parallel
+from data_extractor.data_extractor.document_session import DocumentSession
+from data_extractor.data_extractor.document_source import open_fitz, open_source, source_path
 from data_extractor.data_extractor.extractor import Extractor
+from data_extractor.data_extractor.image_index import load_pdf_image
+from data_extractor.data_extractor.structured_text import StructuredTables
+from data_extractor.data_extractor.table_detection import TableDetector
 
 class PDFExtractor(Extractor):
-    def __init__(self, loader):
+    def __init__(self, loader, workers=1, shard_size=pdf_parallel.DEFAULT_SHARD_SIZE,
+                 min_parallel_pages=pdf_parallel.MIN_PARALLEL_PAGES, table_engine="pdfplumber", table_screen="on"):
+        """
+        :param loader: The PDF loader used to open the file.
+        :param workers: Number of worker processes for images and tables; 1 keeps extraction serial.
+        :param shard_size: Number of pages handed to a worker at a time.
+        :param min_parallel_pages: Documents with fewer pages are always extracted serially.
+        :param table_engine: 'pdfplumber' (extract_tables) or 'pymupdf' (find_tables) detects the tables.
+        :param table_screen: 'on' skips table detection on pages without ruling lines, 'off' runs it on
+                             every page and 'verify' runs it on every page but counts what 'on' would miss.
+        """
         self.loader = loader
         self.file = None
         self.file_path = None
+        self.session = None
+        self.workers = workers
+        self.shard_size = shard_size
+        self.min_parallel_pages = min_parallel_pages
+        self.table_engine = table_engine
+        self.table_screen = table_screen
+        # the counters of the last table detection; also checks the engine and screen up front
+        self.table_detector = TableDetector(table_engine, table_screen)
         
     def load(self, file_path):
         """Load the file using the appropriate loader based on file type."""
-        self.file = self.loader.load_file(file_path)
+        self.close()
+        self.session = DocumentSession(file_path, self.loader)
+        self.file = self.session.document
         self.file_path = file_path 
+
+    def count_pages(self):
+        return len(self.file.pages)
+
+    def fitz_document(self):
+        """The PyMuPDF handle of the loaded PDF, opened once per session."""
+        return self.session.get("fitz", open_fitz, lambda doc: doc.close())
+
+    def plumber_document(self):
+        """The pdfplumber handle of the loaded PDF, opened once per session."""
+        return self.session.get("pdfplumber", lambda source: pdfplumber.open(open_source(source)),
+                                lambda doc: doc.close())
+
+    def use_parallel(self) -> bool:
+        """Whether images and tables should be extracted across the process pool."""
+        # workers open the file themselves, so in-memory documents stay serial
+        return (self.workers > 1 and len(self.file.pages) >= self.min_parallel_pages
+                and source_path(self.file_path) is not None)
+
+    def run_parallel(self, worker):
+        """Run a pdf_parallel shard worker over all pages of the loaded PDF."""
+        executor = self.session.get("pool", lambda _: ProcessPoolExecutor(max_workers=self.workers),
+                                    lambda pool: pool.shutdown())
+        return pdf_parallel.run_sharded(executor, worker, source_path(self.file_path), len(self.file.pages),
+                                        self.shard_size)
         
-    def extract_text(self):
+    def iter_text(self):
         # Extract text from PDF
-        reader = self.loader.load_file(self.file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
+        reader = self.session.document
+        for page_num, page in enumerate(reader.pages, start=1):
+            yield page_num, self.page_text(page)
+
+    def page_text(self, page) -> str:
+        """Extract the text of one page, ending in a newline so pages are not glued together."""
+        text = page.extract_text()
+        return text + "\n" if text and not text.endswith("\n") else text
 
     def extract_images(self):
+        if self.use_parallel():
+            return self.run_parallel(pdf_parallel.extract_images_shard)
+
         images = []
         # PDF image extraction
-        pdf_document = fitz.open(self.file_path)
+        pdf_document = self.fitz_document()
+        self.image_index(new_pass=True)
         for page_num in range(len(pdf_document)):
-            page = pdf_document.load_page(page_num)
-            image_list = page.get_images(full=True)
-            for img in image_list:
-                xref = img[0]
-                base_image = pdf_document.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                width, height = base_image["width"], base_image["height"]
-                images.append({
-                    "image_data": image_bytes,
-                    "ext": image_ext,
-                    "page": page_num + 1,
-                    "dimensions": (width, height)
-                })
-        pdf_document.close()
+            images.extend(self.page_images(pdf_document, page_num))
+        return images
+
+    def page_images(self, pdf_document, page_num) -> List[Dict[str, Any]]:
+        """Extract the images of one page, given its zero-based index."""
+        images = []
+        image_index = self.image_index()
+        page = pdf_document.load_page(page_num)
+        image_list = page.get_images(full=True)
+        for img in image_list:
+            xref = img[0]
+            # every xref is decoded once, however many pages it appears on
+            images.append(image_index.placement(xref, lambda: load_pdf_image(pdf_document, xref),
+                                                page=page_num + 1, xref=xref))
         return images
 
     def extract_urls(self) -> List[Dict[str, Any]]:
         """Extract hyperlinks from a PDF file."""
         extracted_links = []
         for page_num, page in enumerate(self.file.pages, start=1):
-            # Extract annotations from the page
-            if '/Annots' in page:
-                annotations = page['/Annots']
-                for annot in annotations:
-                    annot_obj = annot.get_object()  # Get the annotation object
-                    # Check if the annotation object has the expected structure
-                    if '/A' in annot_obj and '/URI' in annot_obj['/A']:
-                        link = annot_obj['/A']['/URI']
-                        extracted_links.append({                            
-                            "linked_text": link,  # You can also extract the text if needed
-                            "url": link,
-                            "page_number": page_num
-                        })
+            extracted_links.extend(self.page_urls(page, page_num))
+        return extracted_links
+
+    def page_urls(self, page, page_num) -> List[Dict[str, Any]]:
+        """Extract the hyperlinks of one PyPDF2 page."""
+        extracted_links = []
+        # Extract annotations from the page
+        if '/Annots' in page:
+            annotations = page['/Annots']
+            for annot in annotations:
+                annot_obj = annot.get_object()  # Get the annotation object
+                # Check if the annotation object has the expected structure
+                if '/A' in annot_obj and '/URI' in annot_obj['/A']:
+                    link = annot_obj['/A']['/URI']
+                    extracted_links.append({                            
+                        "linked_text": link,  # You can also extract the text if needed
+                        "url": link,
+                        "page_number": page_num
+                    })
         return extracted_links
 
+    def new_table_detector(self) -> TableDetector:
+        self.table_detector = TableDetector(self.table_engine, self.table_screen, self.metrics)
+        return self.table_detector
+
+    def page_tables(self, detector, page_num) -> List[List[List[str]]]:
+        """Detect the tables of one page, given its zero-based index; each table is a list of lists."""
+        return detector.page_tables(lambda: self.fitz_document().load_page(page_num),
+                                    lambda: self.plumber_document().pages[page_num])
+
     def extract_tables(self):
-        tables = []
-        # Extract tables from PDF
-        with pdfplumber.open(self.file_path) as pdf:
-            for page in pdf.pages:
-                # Extract tables from each page
-                page_tables = page.extract_tables()
-                for table in page_tables:
-                    tables.append(table)  # Each table is a list of lists
-        return tables
\ No newline at end of file
+        detector = self.new_table_detector()
+        if self.use_parallel():
+            segments = []
+            # every shard returns the tables of its pages with the counters of its detector
+            for shard in self.run_parallel(partial(pdf_parallel.extract_tables_shard, engine=self.table_engine,
+                                                   screen=self.table_screen)):
+                segments.extend(shard["segments"])
+                detector.merge(shard["stats"])
+            return StructuredTables.from_segments(segments)
+
+        # Extract tables from PDF, skipping the pages the pre-screen rules out
+        return StructuredTables.from_segments((page_num + 1, self.page_tables(detector, page_num))
+                                              for page_num in range(len(self.file.pages)))
+
+    def iter_units(self) -> Iterator[Dict[str, Any]]:
+        """Yield one record per selected page with its selected artifacts."""
+        spec = self.spec
+        # backends of skipped artifacts are never opened
+        pdf_document = self.fitz_document() if spec.wants("images") else None
+        self.image_index(new_pass=True)
+        detector = self.new_table_detector() if spec.wants("tables") else None
+        for page_num in spec.page_numbers(len(self.file.pages)):
+            page = self.file.pages[page_num - 1]
+            unit = {
+                "page": page_num,
+                "text": self.page_text(page) if spec.wants("text") else "",
+                "images": self.page_images(pdf_document, page_num - 1) if pdf_document else [],
+                "urls": self.page_urls(page, page_num) if spec.wants("urls") else [],
+                "tables": self.page_tables(detector, page_num - 1) if detector else []}
+            yield unit
@@ -0,0 +1,70 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+import fitz
+import pdfplumber
+from data_extractor.data_extractor.image_index import ImageIndex, load_pdf_image
+from data_extractor.data_extractor.table_detection import TableDetector
+
+# Documents with fewer pages than this are always extracted serially,
+# since starting the worker processes would cost more than it saves.
+MIN_PARALLEL_PAGES = 32
+DEFAULT_SHARD_SIZE = 16
+
+
+def page_shards(page_count: int, shard_size: int) -> List[Tuple[int, int]]:
+    """Split `page_count` pages into half-open (start, end) ranges of `shard_size` pages."""
+    if shard_size < 1:
+        raise ValueError("Shard size must be at least 1.")
+    return [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+
+
+def extract_images_shard(file_path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """Extract the images of pages [start, end) with a worker-owned fitz handle."""
+    images = []
+    image_index = ImageIndex()
+    with fitz.open(file_path) as pdf_document:
+        for page_num in range(start, end):
+            page = pdf_document.load_page(page_num)
+            for img in page.get_images(full=True):
+                xref = img[0]
+                images.append(image_index.placement(xref, lambda: load_pdf_image(pdf_document, xref),
+                                                    page=page_num + 1, xref=xref))
+    return images
+
+
+def extract_tables_shard(file_path: str, start: int, end: int, engine: str = "pdfplumber",
+                         screen: str = "on") -> List[Dict[str, Any]]:
+    """
+    Extract the tables of pages [start, end) with worker-owned fitz/pdfplumber handles.
+
+    Returns a single {'segments', 'stats'} entry: the (page, tables) of every
+    page, with the counters of the worker's TableDetector.
+    """
+    segments = []
+    detector = TableDetector(engine, screen)
+    with fitz.open(file_path) as pdf_document, \
+            pdfplumber.open(file_path, pages=list(range(start + 1, end + 1))) as pdf:
+        for page_num in range(start, end):
+            segments.append((page_num + 1, detector.page_tables(lambda: pdf_document.load_page(page_num),
+                                                                lambda: pdf.pages[page_num - start])))
+    return [{"segments": segments, "stats": detector.stats}]
+
+
+def run_sharded(executor: ProcessPoolExecutor, worker: Callable[[str, int, int], List[Any]],
+                file_path: str, page_count: int, shard_size: int) -> List[Any]:
+    """
+    Run `worker` over every page shard of a PDF and merge the results in page order.
+
+    :param executor: Process pool the shards are submitted to.
+    :param worker: Module-level shard function, e.g. extract_tables_shard.
+    :param file_path: Path of the PDF; every worker opens its own handle.
+    :param page_count: Number of pages in the PDF.
+    :param shard_size: Number of pages per shard.
+    """
+    futures = [executor.submit(worker, file_path, start, end)
+               for start, end in page_shards(page_count, shard_size)]
+    merged = []
+    # Futures are collected in submission order, which is page order
+    for future in futures:
+        merged.extend(future.result())
+    return merged
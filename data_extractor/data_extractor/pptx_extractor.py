@@ -1,87 +1,182 @@
-from typing import Any, Dict, List
-import fitz
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List
+import pptx
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+from data_extractor.data_extractor import pdf_parallel
+from data_extractor.data_extractor.document_session import DocumentSession
+from data_extractor.data_extractor.document_source import source_path
+from data_extractor.data_extractor.extraction_spec import FULL_SPEC, ExtractionSpec
 from data_extractor.data_extractor.extractor import Extractor
+from data_extractor.data_extractor.image_index import ImageIndex
+from data_extractor.data_extractor.structured_text import StructuredTables, StructuredText
+
+# Decks with fewer slides than this are always extracted serially,
+# since starting the worker processes would cost more than it saves.
+MIN_PARALLEL_SLIDES = 64
+
+
+def iter_shapes(shapes) -> Iterator[Any]:
+    """Yield every shape of a shape tree in document order, descending into group shapes."""
+    for shape in shapes:
+        if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+            yield from iter_shapes(shape.shapes)
+        else:
+            yield shape
+
+
+def slide_unit(slide, slide_num: int, image_index: ImageIndex, spec: ExtractionSpec = FULL_SPEC) -> Dict[str, Any]:
+    """
+    Visit every shape of one slide once and collect its text, images, urls and tables.
+
+    :param slide: The python-pptx slide.
+    :param slide_num: One-based slide number, reported as the 'page' of every artifact.
+    :param image_index: Index decoding pictures reused across slides once.
+    :param spec: The artifacts to collect; the others are left empty.
+    """
+    lines = []
+    images = []
+    urls = []
+    tables = []
+    wants_text = spec.wants("text")
+    for shape in iter_shapes(slide.shapes):
+        if wants_text and hasattr(shape, "text"):
+            lines.append(shape.text + "\n")
+
+        # Hyperlinks of the text runs
+        if spec.wants("urls") and hasattr(shape, "text_frame") and shape.text_frame is not None:
+            for paragraph in shape.text_frame.paragraphs:
+                for run in paragraph.runs:
+                    if run.hyperlink and run.hyperlink.address:
+                        urls.append({
+                            "linked_text": run.text,
+                            "url": run.hyperlink.address,
+                            "page_number": slide_num
+                        })
+
+        # Tables add their rows to the text as well
+        if (wants_text or spec.wants("tables")) and shape.has_table:
+            table_content = [[cell.text_frame.text.strip() if cell.text_frame else '' for cell in row.cells]
+                             for row in shape.table.rows]
+            if wants_text:
+                lines.extend("\t".join(row) + "\n" for row in table_content)
+            if spec.wants("tables"):
+                tables.append(table_content)
+
+        if spec.wants("images") and shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
+            image_part = shape.part.related_part(shape._element.blip_rId)
+            # a picture reused on many slides shares one image part, hashed once
+            images.append(image_index.placement(
+                image_part.partname,
+                lambda: (shape.image.blob, shape.image.ext, None),
+                page=slide_num))
+
+    return {"page": slide_num, "text": "".join(lines), "images": images, "urls": urls, "tables": tables}
+
+
+def extract_slides_shard(file_path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """Extract the units of slides [start, end) with a worker-owned presentation."""
+    presentation = pptx.Presentation(file_path)
+    slides = presentation.slides
+    image_index = ImageIndex()
+    return [slide_unit(slides[index], index + 1, image_index) for index in range(start, end)]
+
 
 class PPTXExtractor(Extractor):
-    def __init__(self, loader):
+    """
+    PPTX extractor that visits every shape of every slide once.
+
+    Text, images, hyperlinks and tables are all collected in the same
+    traversal, group shapes included, and the extract_* methods read from
+    its cached result.
+    """
+
+    def __init__(self, loader, workers=1, shard_size=pdf_parallel.DEFAULT_SHARD_SIZE,
+                 min_parallel_slides=MIN_PARALLEL_SLIDES):
+        """
+        :param loader: The PPT loader used to open the file.
+        :param workers: Number of worker processes slides are spread over; 1 keeps extraction serial.
+        :param shard_size: Number of slides handed to a worker at a time.
+        :param min_parallel_slides: Decks with fewer slides are always extracted serially.
+        """
         self.loader = loader
         self.file = None
         self.file_path = None
-        
+        self.session = None
+        self.extracted = None
+        self.workers = workers
+        self.shard_size = shard_size
+        self.min_parallel_slides = min_parallel_slides
+
     def load(self, file_path):
         """Load the file using the appropriate loader based on file type."""
-        self.file = self.loader.load_file(file_path)
-        self.file_path = file_path 
+        self.close()
+        self.session = DocumentSession(file_path, self.loader)
+        self.file = self.session.document
+        self.file_path = file_path
+        self.extracted = None
 
-    def extract_text(self):
-        # Extract text from PPTX
-        ppt = self.loader.load_file(self.file_path)
-        text = ""
+    def count_pages(self):
+        return len(self.file.slides)
+
+    def use_parallel(self) -> bool:
+        """Whether the slides should be extracted across the process pool."""
+        # workers open the file themselves, so in-memory documents stay serial; they
+        # also extract whole decks, so selective requests stay serial too
+        return (self.workers > 1 and len(self.file.slides) >= self.min_parallel_slides
+                and source_path(self.file_path) is not None and self.spec.is_full)
 
-        # Extract text from shapes
-        for slide in ppt.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
+    def walk(self) -> Dict[str, Any]:
+        """Visit every slide once and collect all artifacts, caching the result."""
+        if self.extracted is not None:
+            return self.extracted
 
-                # Extract text from tables within shapes
-                if shape.has_table:
-                    for row in shape.table.rows:
-                        row_text = "\t".join(cell.text.strip() for cell in row.cells)
-                        text += row_text + "\n"
+        # the single pass over the document, whichever extract_* call triggers it
+        with self.metrics.span("walk"):
+            if self.use_parallel():
+                executor = self.session.get("pool", lambda _: ProcessPoolExecutor(max_workers=self.workers),
+                                            lambda pool: pool.shutdown())
+                units = pdf_parallel.run_sharded(executor, extract_slides_shard, source_path(self.file_path),
+                                                 len(self.file.slides), self.shard_size)
+            else:
+                units = self.iter_units()
 
-        return text
+            text_segments = []
+            images = []
+            urls = []
+            table_segments = []
+            for unit in units:
+                text_segments.append((unit["page"], unit["text"]))
+                images.extend(unit["images"])
+                urls.extend(unit["urls"])
+                table_segments.append((unit["page"], unit["tables"]))
+
+            self.extracted = {
+                "text": StructuredText.from_segments(text_segments),
+                "images": images,
+                "urls": urls,
+                "tables": StructuredTables.from_segments(table_segments)}
+        return self.extracted
+
+    def iter_text(self):
+        for segment in self.walk()["text"].segments():
+            yield segment["page"], segment["text"]
+
+    def extract_text(self):
+        return self.walk()["text"]
 
     def extract_images(self):
-        images = []
-        # PPTX image extraction
-        ppt = self.loader.load_file(self.file_path)
-        # Extract images
-        for slide_num, slide in enumerate(ppt.slides):
-            for shape in slide.shapes:
-                if shape.shape_type == 13:  # Picture type
-                    image_stream = shape.image.blob
-                    image_ext = shape.image.ext
-                    images.append({
-                        "image_data": image_stream,
-                        "ext": image_ext,
-                        "page": slide_num + 1,
-                    })
-        return images
+        return self.walk()["images"]
 
     def extract_urls(self) -> List[Dict[str, Any]]:
         """Extract hyperlinks from a PPTX file."""
-        extracted_links = []
-        # Loop through each slide in the presentation
-        for slide_num, slide in enumerate(self.file.slides, start=1):
-            # Loop through each shape in the slide
-            for shape in slide.shapes:
-                # Check if the shape has a text frame and it is not None
-                if hasattr(shape, "text_frame") and shape.text_frame is not None:
-                    # Loop through each paragraph in the text frame
-                    for paragraph in shape.text_frame.paragraphs:
-                        # Loop through each run in the paragraph
-                        for run in paragraph.runs:
-                            # Check if the run has a hyperlink and get the link address
-                            if run.hyperlink and run.hyperlink.address:
-                                extracted_links.append({
-                                    "linked_text": run.text,  # Get the text of the hyperlink
-                                    "url": run.hyperlink.address,  # Get the hyperlink address
-                                    "page_number": slide_num  # Get the slide number
-                                })
-        return extracted_links
+        return self.walk()["urls"]
 
     def extract_tables(self):
-        tables=[]
-        # Extract tables from PPTX (typically tables are part of shapes)
-        ppt = self.loader.load_file(self.file_path)
-        for slide in ppt.slides:
-            for shape in slide.shapes:
-                if shape.has_table:  # Check if the shape contains a table
-                    table_content = []
-                    table = shape.table
-                    for row in table.rows:
-                        row_data = [cell.text_frame.text.strip() if cell.text_frame else '' for cell in row.cells]
-                        table_content.append(row_data)
-                    tables.append(table_content)
-        return tables
\ No newline at end of file
+        return self.walk()["tables"]
+
+    def iter_units(self) -> Iterator[Dict[str, Any]]:
+        """Yield one record per selected slide with its selected artifacts."""
+        image_index = self.image_index(new_pass=True)
+        slides = self.file.slides
+        for slide_num in self.spec.page_numbers(len(slides)):
+            yield slide_unit(slides[slide_num - 1], slide_num, image_index, self.spec)
@@ -0,0 +1,118 @@
+from typing import Any, Dict, Iterator, List
+import fitz
+from data_extractor.data_extractor.document_session import DocumentSession
+from data_extractor.data_extractor.extractor import Extractor
+from data_extractor.data_extractor.image_index import load_pdf_image
+from data_extractor.data_extractor.structured_text import StructuredTables, StructuredText
+from data_extractor.data_extractor.table_detection import TableDetector
+
+class PyMuPDFExtractor(Extractor):
+    """
+    PDF extractor that walks the document once through PyMuPDF.
+
+    Every page is loaded a single time and text, images, links and table
+    candidates are all read from that page object. The extract_* methods
+    return the same shapes as PDFExtractor.
+    """
+
+    def __init__(self, loader, table_screen="on"):
+        """
+        :param loader: The PyMuPDF loader used to open the file.
+        :param table_screen: 'on' skips find_tables() on pages without ruling lines, 'off' runs it on
+                             every page and 'verify' runs it on every page but counts what 'on' would miss.
+        """
+        self.loader = loader
+        self.file = None
+        self.file_path = None
+        self.session = None
+        self.extracted = None
+        self.table_screen = table_screen
+        # the counters of the last table detection; also checks the screen up front
+        self.table_detector = TableDetector("pymupdf", table_screen)
+
+    def load(self, file_path):
+        """Load the file using the appropriate loader based on file type."""
+        self.close()
+        self.session = DocumentSession(file_path, self.loader)
+        self.file = self.session.document
+        self.file_path = file_path
+        self.extracted = None
+
+    def count_pages(self):
+        return self.file.page_count
+
+    def walk(self) -> Dict[str, Any]:
+        """Walk every page once and collect all artifacts, caching the result."""
+        if self.extracted is not None:
+            return self.extracted
+
+        # the single pass over the document, whichever extract_* call triggers it
+        with self.metrics.span("walk"):
+            text_segments = []
+            images = []
+            urls = []
+            table_segments = []
+            for unit in self.iter_units():
+                text_segments.append((unit["page"], unit["text"]))
+                images.extend(unit["images"])
+                urls.extend(unit["urls"])
+                table_segments.append((unit["page"], unit["tables"]))
+
+            self.extracted = {
+                "text": StructuredText.from_segments(text_segments),
+                "images": images,
+                "urls": urls,
+                "tables": StructuredTables.from_segments(table_segments)}
+        return self.extracted
+
+    def iter_units(self) -> Iterator[Dict[str, Any]]:
+        """Yield one record per selected page, reading every selected artifact from the same page object."""
+        spec = self.spec
+        image_index = self.image_index(new_pass=True)
+        if spec.wants("tables"):
+            self.table_detector = TableDetector("pymupdf", self.table_screen, self.metrics)
+        for page_num in spec.page_numbers(self.file.page_count):
+            page = self.file.load_page(page_num - 1)
+            images = []
+            if spec.wants("images"):
+                for img in page.get_images(full=True):
+                    xref = img[0]
+                    images.append(image_index.placement(xref, lambda: load_pdf_image(self.file, xref),
+                                                        page=page_num, xref=xref))
+
+            urls = []
+            if spec.wants("urls"):
+                for link in page.get_links():
+                    if link.get("kind") == fitz.LINK_URI and link.get("uri"):
+                        urls.append({
+                            "linked_text": link["uri"],
+                            "url": link["uri"],
+                            "page_number": page_num
+                        })
+
+            yield {
+                "page": page_num,
+                "text": page.get_text() if spec.wants("text") else "",
+                "images": images,
+                "urls": urls,
+                # Each table is a list of lists; table detection is the costliest step, so it only runs when asked for
+                # and on pages that pass the pre-screen
+                "tables": self.table_detector.page_tables(lambda: page, None) if spec.wants("tables") else []}
+
+    def iter_text(self):
+        text = self.walk()["text"]
+        for segment in text.segments():
+            yield segment["page"], segment["text"]
+
+    def extract_text(self):
+        return self.walk()["text"]
+
+    def extract_images(self):
+        return self.walk()["images"]
+
+    def extract_urls(self) -> List[Dict[str, Any]]:
+        """Extract hyperlinks from a PDF file."""
+        return self.walk()["urls"]
+
+    def extract_tables(self):
+        return self.walk()["tables"]
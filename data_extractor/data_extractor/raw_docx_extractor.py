@@ -0,0 +1,247 @@
+from typing import Any, Dict, Iterator, List
+from data_extractor.data_extractor.docx_extractor import NOTE_PART_TYPES
+from data_extractor.data_extractor.document_session import DocumentSession
+from data_extractor.data_extractor.extractor import Extractor
+from data_extractor.data_extractor.ooxml import hyperlink_records, iter_children, qn
+from data_extractor.data_extractor.structured_text import StructuredTables, StructuredText
+
+W_BODY = qn("w:body")
+W_P = qn("w:p")
+W_TBL = qn("w:tbl")
+W_SECTPR = qn("w:sectPr")
+# text equivalents of the run content python-docx reads, other than w:t and w:br
+RUN_TEXT = {qn("w:tab"): "\t", qn("w:ptab"): "\t", qn("w:cr"): "\n", qn("w:noBreakHyphen"): "-"}
+
+
+def run_text(run) -> str:
+    """The text of a w:r element, as python-docx's Run.text computes it."""
+    parts = []
+    for child in run:
+        if child.tag == qn("w:t"):
+            parts.append(child.text or "")
+        elif child.tag == qn("w:br"):
+            # line breaks are newlines, page and column breaks are dropped
+            parts.append("\n" if child.get(qn("w:type"), "textWrapping") == "textWrapping" else "")
+        else:
+            parts.append(RUN_TEXT.get(child.tag, ""))
+    return "".join(parts)
+
+
+def paragraph_text(paragraph) -> str:
+    """The text of a w:p element: its runs, including the runs of its hyperlinks."""
+    parts = []
+    for child in paragraph:
+        if child.tag == qn("w:r"):
+            parts.append(run_text(child))
+        elif child.tag == qn("w:hyperlink"):
+            parts.extend(run_text(run) for run in child.iterchildren(qn("w:r")))
+    return "".join(parts)
+
+
+def cell_text(cell) -> str:
+    return "\n".join(paragraph_text(paragraph) for paragraph in cell.iterchildren(W_P))
+
+
+def table_rows(table) -> List[List[str]]:
+    """
+    The stripped cell texts of every row of a w:tbl, as python-docx's row.cells gives them.
+
+    A cell spanning several grid columns is repeated once per column, and a
+    vertically merged cell repeats the text of the cell it continues.
+    """
+    rows = []
+    above = {}
+    for row in table.iterchildren(qn("w:tr")):
+        grid_before = row.find(f"{qn('w:trPr')}/{qn('w:gridBefore')}")
+        offset = int(grid_before.get(qn("w:val"))) if grid_before is not None else 0
+        cells = []
+        current = {}
+        for cell in row.iterchildren(qn("w:tc")):
+            properties = cell.find(qn("w:tcPr"))
+            span = 1
+            merge = None
+            if properties is not None:
+                grid_span = properties.find(qn("w:gridSpan"))
+                span = int(grid_span.get(qn("w:val"))) if grid_span is not None else 1
+                vertical_merge = properties.find(qn("w:vMerge"))
+                if vertical_merge is not None:
+                    merge = vertical_merge.get(qn("w:val"), "continue")
+            text = above[offset] if merge == "continue" and offset in above else cell_text(cell).strip()
+            cells.extend([text] * span)
+            current[offset] = text
+            offset += span
+        above = current
+        rows.append(cells)
+    return rows
+
+
+class RawDOCXExtractor(Extractor):
+    """
+    DOCX extractor that reads word/document.xml straight from the zip.
+
+    The body is parsed incrementally, one top-level paragraph or table at a
+    time, and media parts are read without being decoded, so no python-docx
+    object model is built. Results have the same shape as DOCXExtractor's.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.file = None
+        self.file_path = None
+        self.session = None
+        self.extracted = None
+
+    def load(self, file_path):
+        """Load the file using the appropriate loader based on file type."""
+        self.close()
+        self.session = DocumentSession(file_path, self.loader)
+        self.file = self.session.document
+        self.file_path = file_path
+        self.extracted = None
+
+    def count_pages(self):
+        # DOCX files carry no page layout, so sections are counted instead
+        sections = 0
+        with self.file.open(self.file.main_partname) as stream:
+            for element in iter_children(stream, W_BODY, [W_P, W_SECTPR]):
+                if element.tag == W_SECTPR or element.find(f"{qn('w:pPr')}/{W_SECTPR}") is not None:
+                    sections += 1
+        return sections
+
+    def walk(self) -> Dict[str, Any]:
+        """Read the body once and collect text, urls and tables, caching the result."""
+        if self.extracted is not None:
+            return self.extracted
+
+        # the single pass over the document, whichever extract_* call triggers it
+        with self.metrics.span("walk"):
+            text_segments = []
+            urls = []
+            table_segments = []
+            for unit in self.iter_units():
+                text_segments.append((unit["page"], unit["text"]))
+                urls.extend(unit["urls"])
+                table_segments.append((unit["page"], unit["tables"]))
+
+            self.extracted = {
+                "text": StructuredText.from_segments(text_segments),
+                "urls": urls,
+                "tables": StructuredTables.from_segments(table_segments)}
+        return self.extracted
+
+    def iter_text(self):
+        for segment in self.walk()["text"].segments():
+            yield segment["page"], segment["text"]
+
+    def extract_text(self):
+        return self.walk()["text"]
+
+    def extract_images(self):
+        self.image_index(new_pass=True)
+        # every image relationship of the document, in relationship order
+        return [self.image_record(rel) for rel in self.file.rels(self.file.main_partname).values()
+                if not rel.is_external and "image" in rel.target_ref and self.file.has_part(rel.partname)]
+
+    def extract_urls(self) -> List[Dict[str, Any]]:
+        """Extract hyperlinks from a DOCX file."""
+        return self.walk()["urls"]
+
+    def extract_tables(self):
+        return self.walk()["tables"]
+
+    def iter_units(self) -> Iterator[Dict[str, Any]]:
+        """Yield one record per selected section with its selected artifacts."""
+        package = self.file
+        spec = self.spec
+        rels = package.rels(package.main_partname)
+        self.image_index(new_pass=True)
+        # sections are only counted (an extra pass over the body) when some are skipped
+        selected = None if spec.all_pages else spec.page_numbers(self.count_pages())
+        seen_rels = set()
+        paragraph_index = 0
+        section_num = 1
+        unit = {"page": section_num, "text": "", "images": [], "urls": [], "tables": []}
+        paragraph_lines = []
+        table_lines = []
+        with package.open(package.main_partname) as stream:
+            for element in iter_children(stream, W_BODY, [W_P, W_TBL]):
+                if selected is not None and (not selected or section_num > selected[-1]):
+                    return
+                page_number = None
+                if selected is not None and section_num not in selected:
+                    # skipped sections still number their paragraphs and place their relationships
+                    paragraph_index += element.tag == W_P
+                    seen_rels.update(blip.get(qn("r:embed")) for blip in element.iter(qn("a:blip")))
+                    seen_rels.update(link.get(qn("r:id")) for link in element.iter(qn("w:hyperlink")))
+                elif element.tag == W_P:
+                    paragraph_index += 1
+                    page_number = paragraph_index
+                    if spec.wants("text"):
+                        paragraph_lines.append(paragraph_text(element) + "\n")
+                elif spec.wants("text") or spec.wants("tables"):
+                    table_content = table_rows(element)
+                    if spec.wants("tables"):
+                        unit["tables"].append(table_content)
+                    if spec.wants("text"):
+                        table_lines.extend("\t".join(row) + "\n" for row in table_content)
+
+                # Images and hyperlinks placed in this block
+                if selected is None or section_num in selected:
+                    if spec.wants("images"):
+                        for blip in element.iter(qn("a:blip")):
+                            rel_id = blip.get(qn("r:embed"))
+                            if rel_id in rels and rel_id not in seen_rels and "image" in rels[rel_id].target_ref:
+                                seen_rels.add(rel_id)
+                                unit["images"].append(self.image_record(rels[rel_id]))
+                    if spec.wants("urls"):
+                        unit["urls"].extend(hyperlink_records(element, page_number, rels, seen_rels))
+
+                # a paragraph holding a sectPr closes the current section
+                if element.tag == W_P and element.find(f"{qn('w:pPr')}/{W_SECTPR}") is not None:
+                    unit["text"] = "".join(paragraph_lines) + "".join(table_lines)
+                    if selected is None or section_num in selected:
+                        yield unit
+                    section_num += 1
+                    unit = {"page": section_num, "text": "", "images": [], "urls": [], "tables": []}
+                    paragraph_lines = []
+                    table_lines = []
+
+        if selected is not None and section_num not in selected:
+            return
+
+        # Text of a section lists paragraphs first, then table rows
+        unit["text"] = "".join(paragraph_lines) + "".join(table_lines)
+
+        # Relationships not placed in the body (headers, footers, unused) go to the last section
+        if spec.wants("images"):
+            for rel_id, rel in rels.items():
+                if (rel_id not in seen_rels and not rel.is_external and "image" in rel.target_ref
+                        and package.has_part(rel.partname)):
+                    unit["images"].append(self.image_record(rel))
+        if spec.wants("urls"):
+            unit["urls"].extend({"linked_text": "", "url": rel.target_ref, "page_number": None}
+                                for rel_id, rel in rels.items()
+                                if rel_id not in seen_rels and "hyperlink" in rel.reltype)
+            unit["urls"].extend(self.part_links())
+        yield unit
+
+    def part_links(self) -> List[Dict[str, Any]]:
+        """Extract the hyperlinks of the headers, footers, footnotes and endnotes."""
+        package = self.file
+        links = []
+        seen_parts = set()
+        for rel in package.rels(package.main_partname).values():
+            if rel.is_external or rel.reltype not in NOTE_PART_TYPES or rel.partname in seen_parts:
+                continue
+            seen_parts.add(rel.partname)
+            if package.has_part(rel.partname):
+                links.extend(hyperlink_records(package.parse(rel.partname), None, package.rels(rel.partname), set()))
+        return links
+
+    def image_record(self, rel) -> Dict[str, Any]:
+        """Build the image dict of an image relationship, reading the media part undecoded."""
+        package = self.file
+        return self.image_index().placement(
+            rel.partname,
+            lambda: (package.read(rel.partname), (package.content_type(rel.partname) or "/").split('/')[1], None),
+            page=rel.target_ref)
@@ -0,0 +1,205 @@
+from typing import Any, Dict, Iterator, List
+from data_extractor.data_extractor.document_session import DocumentSession
+from data_extractor.data_extractor.extractor import Extractor
+from data_extractor.data_extractor.ooxml import qn
+from data_extractor.data_extractor.structured_text import StructuredTables, StructuredText
+
+# the shape elements python-pptx lists in slide.shapes
+SHAPE_TAGS = {qn("p:sp"), qn("p:grpSp"), qn("p:graphicFrame"), qn("p:cxnSp"), qn("p:pic"), qn("p:contentPart")}
+TABLE_URI = "http://schemas.openxmlformats.org/drawingml/2006/table"
+
+
+def paragraph_text(paragraph) -> str:
+    """The text of an a:p element, with a vertical tab for every line break as python-pptx gives it."""
+    parts = []
+    for child in paragraph:
+        if child.tag in (qn("a:r"), qn("a:fld")):
+            text = child.find(qn("a:t"))
+            parts.append(text.text or "" if text is not None else "")
+        elif child.tag == qn("a:br"):
+            parts.append("\v")
+    return "".join(parts)
+
+
+def text_body_text(element) -> str:
+    """The text of the p:txBody/a:txBody of a shape or table cell; '' when it has none."""
+    text_body = element.find(qn("p:txBody"))
+    if text_body is None:
+        text_body = element.find(qn("a:txBody"))
+    if text_body is None:
+        return ""
+    return "\n".join(paragraph_text(paragraph) for paragraph in text_body.iterchildren(qn("a:p")))
+
+
+def shape_table(shape):
+    """The a:tbl of a graphic frame holding a table, or None."""
+    graphic_data = shape.find(f"{qn('a:graphic')}/{qn('a:graphicData')}")
+    if graphic_data is None or graphic_data.get("uri") != TABLE_URI:
+        return None
+    return graphic_data.find(qn("a:tbl"))
+
+
+def iter_shapes(shape_tree) -> Iterator[Any]:
+    """Yield the shape elements of a p:spTree/p:grpSp in document order, descending into groups."""
+    for shape in shape_tree:
+        if shape.tag == qn("p:grpSp"):
+            yield from iter_shapes(shape)
+        elif shape.tag in SHAPE_TAGS:
+            yield shape
+
+
+def table_rows(table) -> List[List[str]]:
+    return [[text_body_text(cell).strip() for cell in row.iterchildren(qn("a:tc"))]
+            for row in table.iterchildren(qn("a:tr"))]
+
+
+class RawPPTXExtractor(Extractor):
+    """
+    PPTX extractor that reads ppt/slides/slideN.xml straight from the zip.
+
+    Each slide part is parsed on its own with lxml and media parts are read
+    without being decoded, so no python-pptx object model is built. Results
+    have the same shape as PPTXExtractor's.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.file = None
+        self.file_path = None
+        self.session = None
+        self.extracted = None
+
+    def load(self, file_path):
+        """Load the file using the appropriate loader based on file type."""
+        self.close()
+        self.session = DocumentSession(file_path, self.loader)
+        self.file = self.session.document
+        self.file_path = file_path
+        self.extracted = None
+
+    def slide_partnames(self) -> List[str]:
+        """The partnames of the slides, in presentation order."""
+        package = self.file
+        rels = package.rels(package.main_partname)
+        presentation = package.parse(package.main_partname)
+        slide_ids = presentation.find(qn("p:sldIdLst"))
+        if slide_ids is None:
+            return []
+        return [rels[slide_id.get(qn("r:id"))].partname
+                for slide_id in slide_ids.iterchildren(qn("p:sldId"))
+                if slide_id.get(qn("r:id")) in rels]
+
+    def count_pages(self):
+        return len(self.slide_partnames())
+
+    def walk(self) -> Dict[str, Any]:
+        """Read every slide once and collect all artifacts, caching the result."""
+        if self.extracted is not None:
+            return self.extracted
+
+        # the single pass over the document, whichever extract_* call triggers it
+        with self.metrics.span("walk"):
+            text_segments = []
+            images = []
+            urls = []
+            table_segments = []
+            for unit in self.iter_units():
+                text_segments.append((unit["page"], unit["text"]))
+                images.extend(unit["images"])
+                urls.extend(unit["urls"])
+                table_segments.append((unit["page"], unit["tables"]))
+
+            self.extracted = {
+                "text": StructuredText.from_segments(text_segments),
+                "images": images,
+                "urls": urls,
+                "tables": StructuredTables.from_segments(table_segments)}
+        return self.extracted
+
+    def iter_text(self):
+        for segment in self.walk()["text"].segments():
+            yield segment["page"], segment["text"]
+
+    def extract_text(self):
+        return self.walk()["text"]
+
+    def extract_images(self):
+        return self.walk()["images"]
+
+    def extract_urls(self) -> List[Dict[str, Any]]:
+        """Extract hyperlinks from a PPTX file."""
+        return self.walk()["urls"]
+
+    def extract_tables(self):
+        return self.walk()["tables"]
+
+    def iter_units(self) -> Iterator[Dict[str, Any]]:
+        """Yield one record per selected slide with its selected artifacts."""
+        package = self.file
+        spec = self.spec
+        partnames = self.slide_partnames()
+        self.image_index(new_pass=True)
+        for slide_num in spec.page_numbers(len(partnames)):
+            partname = partnames[slide_num - 1]
+            slide = package.parse(partname)
+            rels = package.rels(partname)
+            shape_tree = slide.find(f"{qn('p:cSld')}/{qn('p:spTree')}")
+            shapes = iter_shapes(shape_tree) if shape_tree is not None else []
+            unit = {"page": slide_num, "text": "", "images": [], "urls": [], "tables": []}
+            lines = []
+            for shape in shapes:
+                if shape.tag == qn("p:sp"):
+                    if spec.wants("text"):
+                        lines.append(text_body_text(shape) + "\n")
+                    if spec.wants("urls"):
+                        unit["urls"].extend(self.shape_urls(shape, rels, slide_num))
+                elif shape.tag == qn("p:graphicFrame") and (spec.wants("text") or spec.wants("tables")):
+                    table = shape_table(shape)
+                    if table is not None:
+                        table_content = table_rows(table)
+                        if spec.wants("text"):
+                            lines.extend("\t".join(row) + "\n" for row in table_content)
+                        if spec.wants("tables"):
+                            unit["tables"].append(table_content)
+                elif shape.tag == qn("p:pic") and spec.wants("images"):
+                    image = self.picture_image(shape, rels, slide_num)
+                    if image is not None:
+                        unit["images"].append(image)
+            unit["text"] = "".join(lines)
+            yield unit
+
+    def shape_urls(self, shape, rels, slide_num) -> List[Dict[str, Any]]:
+        """The hyperlinks of the text runs of a shape."""
+        links = []
+        text_body = shape.find(qn("p:txBody"))
+        if text_body is None:
+            return links
+        for run in text_body.iter(qn("a:r")):
+            link = run.find(f"{qn('a:rPr')}/{qn('a:hlinkClick')}")
+            rel_id = link.get(qn("r:id")) if link is not None else None
+            if rel_id and rel_id in rels and rels[rel_id].target_ref:
+                text = run.find(qn("a:t"))
+                links.append({
+                    "linked_text": text.text or "" if text is not None else "",
+                    "url": rels[rel_id].target_ref,
+                    "page_number": slide_num
+                })
+        return links
+
+    def picture_image(self, shape, rels, slide_num):
+        """The image dict of a picture shape; placeholders and videos are skipped like python-pptx does."""
+        if shape.find(f"*/{qn('p:nvPr')}/{qn('p:ph')}") is not None:
+            return None
+        if shape.find(f"{qn('p:nvPicPr')}/{qn('p:nvPr')}/{qn('a:videoFile')}") is not None:
+            return None
+        blip = shape.find(f"{qn('p:blipFill')}/{qn('a:blip')}")
+        rel_id = blip.get(qn("r:embed")) if blip is not None else None
+        if rel_id not in rels or rels[rel_id].is_external:
+            return None
+        partname = rels[rel_id].partname
+        package = self.file
+        # a picture reused on many slides shares one image part, read once
+        return self.image_index().placement(
+            partname,
+            lambda: (package.read(partname), package.image_ext(partname), None),
+            page=slide_num)
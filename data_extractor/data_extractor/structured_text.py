@@ -0,0 +1,100 @@
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class StructuredText(str):
+    """
+    The text of a document together with its page/slide/section boundaries.
+
+    It is the flat text (so it can be written, compared and cached like any
+    string) plus an offset index: the text of page N, or the page holding a
+    character offset, is found without re-splitting the document.
+    """
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Tuple[Any, str]]) -> "StructuredText":
+        """
+        Assemble the text of (page, text) segments in one join, in linear time.
+
+        :param segments: The text of every page/slide/section, in document order.
+        """
+        pages = []
+        offsets = []
+        parts = []
+        offset = 0
+        for page, text in segments:
+            text = text or ""
+            pages.append(page)
+            offsets.append(offset)
+            parts.append(text)
+            offset += len(text)
+
+        structured = cls("".join(parts))
+        structured.pages = pages
+        # start offset of every segment; segment i is text[offsets[i]:offsets[i + 1]]
+        structured.offsets = offsets
+        structured.page_index = {page: index for index, page in enumerate(pages)}
+        return structured
+
+    def segment_range(self, index: int) -> Tuple[int, int]:
+        """Return the (start, end) character range of the segment at `index`."""
+        end = self.offsets[index + 1] if index + 1 < len(self.offsets) else len(self)
+        return self.offsets[index], end
+
+    def page_range(self, page) -> Tuple[int, int]:
+        """Return the (start, end) character range of a page."""
+        return self.segment_range(self.page_index[page])
+
+    def page_text(self, page) -> str:
+        """Return the text of one page/slide/section."""
+        start, end = self.page_range(page)
+        return str(self[start:end])
+
+    def page_at(self, offset: int) -> Optional[Any]:
+        """Return the page holding the character at `offset`, or None if it is out of range."""
+        if not 0 <= offset < len(self):
+            return None
+        # empty segments share their start offset with the next one; the last of them wins
+        return self.pages[bisect_right(self.offsets, offset) - 1]
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """Return the segments as [{'page', 'text'}] in document order."""
+        segments = []
+        for index, page in enumerate(self.pages):
+            start, end = self.segment_range(index)
+            segments.append({"page": page, "text": str(self[start:end])})
+        return segments
+
+
+class StructuredTables(list):
+    """
+    The tables of a document together with the page/slide/section each is on.
+
+    It is the plain list of tables, each a list of rows (so it can be
+    written, compared and cached like any list), plus `pages`: the page of
+    the table at the same index.
+    """
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Tuple[Any, List[Any]]]) -> "StructuredTables":
+        """
+        Assemble the tables of (page, tables) segments.
+
+        :param segments: The tables of every page/slide/section, in document order.
+        """
+        structured = cls()
+        structured.pages = []
+        for page, tables in segments:
+            structured.extend(tables)
+            structured.pages.extend([page] * len(tables))
+        return structured
+
+    def segments(self) -> List[Tuple[Any, List[Any]]]:
+        """Return (page, tables) for every run of tables on the same page, in document order."""
+        segments = []
+        for page, table in zip(self.pages, self):
+            if segments and segments[-1][0] == page:
+                segments[-1][1].append(table)
+            else:
+                segments.append((page, [table]))
+        return segments
@@ -0,0 +1,144 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from data_extractor.data_extractor.instrumentation import NULL_METRICS
+
+# Engines that can detect the tables of a PDF page
+TABLE_ENGINES = ("pdfplumber", "pymupdf")
+
+# How pages are pre-screened before table detection. The screen only looks
+# for ruling lines, since both engines run with their default 'lines'
+# strategy and find no table without them; should an engine ever use a text
+# (alignment) strategy, which finds borderless tables, it needs 'verify' or 'off'.
+# on      detection only runs on pages with ruling lines
+# off     detection runs on every page
+# verify  detection runs on every page, and pages with tables the screen
+#         would have skipped are counted as table_pages_missed
+TABLE_SCREENS = ("on", "off", "verify")
+
+# Counters of a TableDetector, also recorded in the document's metrics
+TABLE_STATS = ("table_pages_screened", "table_pages_skipped", "table_pages_missed", "table_pages_with_tables")
+
+# Lines whose ends are at most this many points apart across are horizontal/vertical
+ORIENTATION_TOLERANCE = 1.0
+
+# Both engines build cells from ruling lines, so a table needs two of each direction
+MIN_RULINGS = 2
+
+
+def count_rulings(fitz_page) -> Tuple[int, int]:
+    """
+    Count the horizontal and vertical ruling lines drawn on a PyMuPDF page.
+
+    Only the page's vector drawings are read, which takes a fraction of a
+    millisecond. Rectangles count as two lines of each direction and curves
+    as one of each, since the engines turn them into cell edges too. Text
+    alignment is not looked at: borderless tables are invisible to the
+    engines' 'lines' strategy anyway.
+    """
+    horizontal = vertical = 0
+    for path in fitz_page.get_cdrawings(extended=False):
+        for item in path["items"]:
+            if item[0] == "l":
+                (x0, y0), (x1, y1) = item[1], item[2]
+                if abs(y1 - y0) <= ORIENTATION_TOLERANCE:
+                    horizontal += 1
+                elif abs(x1 - x0) <= ORIENTATION_TOLERANCE:
+                    vertical += 1
+            elif item[0] in ("re", "qu"):
+                horizontal += 2
+                vertical += 2
+            else:
+                horizontal += 1
+                vertical += 1
+        if horizontal >= MIN_RULINGS and vertical >= MIN_RULINGS:
+            break
+    return horizontal, vertical
+
+
+def is_table_candidate(fitz_page) -> bool:
+    """
+    Whether a page has enough ruling lines for either engine to find a table on it.
+
+    A borderless table whose columns are only aligned text is not a candidate.
+    """
+    horizontal, vertical = count_rulings(fitz_page)
+    return horizontal >= MIN_RULINGS and vertical >= MIN_RULINGS
+
+
+def plumber_page_tables(plumber_page) -> List[List[List[Optional[str]]]]:
+    """Detect the tables of a pdfplumber page; each table is a list of rows."""
+    tables = plumber_page.extract_tables()
+    # drop pdfplumber's cached layout objects before moving on
+    plumber_page.close()
+    return tables
+
+
+def pymupdf_page_tables(fitz_page) -> List[List[List[Optional[str]]]]:
+    """Detect the tables of a PyMuPDF page with find_tables(); each table is a list of rows."""
+    return [table.extract() for table in fitz_page.find_tables().tables]
+
+
+class TableDetector():
+    """
+    Detects the tables of PDF pages with one engine, after a cheap pre-screen.
+
+    Table detection is the costliest step of PDF extraction and, with the
+    engines' default 'lines' strategy, finds nothing on pages without ruling
+    lines, so those pages are skipped unless the screen is 'off'. The counts
+    of screened, skipped and (with 'verify') missed pages are kept in `stats`.
+    """
+
+    def __init__(self, engine: str = "pdfplumber", screen: str = "on", metrics=NULL_METRICS):
+        """
+        :param engine: One of TABLE_ENGINES.
+        :param screen: One of TABLE_SCREENS.
+        :param metrics: A DocumentMetrics the counters are also recorded in.
+        """
+        if engine not in TABLE_ENGINES:
+            raise ValueError(f"Unsupported table engine. Use one of: {', '.join(TABLE_ENGINES)}.")
+        if screen not in TABLE_SCREENS:
+            raise ValueError(f"Unsupported table screen. Use one of: {', '.join(TABLE_SCREENS)}.")
+        self.engine = engine
+        self.screen = screen
+        self.metrics = metrics
+        self.stats: Dict[str, int] = {name: 0 for name in TABLE_STATS}
+
+    @property
+    def needs_fitz(self) -> bool:
+        """Whether page_tables() reads the PyMuPDF page."""
+        return self.screen != "off" or self.engine == "pymupdf"
+
+    def record(self, name: str):
+        self.stats[name] += 1
+        self.metrics.count(name)
+
+    def page_tables(self, fitz_page: Callable[[], Any],
+                    plumber_page: Optional[Callable[[], Any]]) -> List[List[List[Optional[str]]]]:
+        """
+        Detect the tables of one page.
+
+        :param fitz_page: Callable returning the page as a PyMuPDF page.
+        :param plumber_page: Callable returning the page as a pdfplumber page; only called by that engine.
+        """
+        candidate = True
+        page = fitz_page() if self.needs_fitz else None
+        if self.screen != "off":
+            candidate = is_table_candidate(page)
+            self.record("table_pages_screened")
+            if not candidate:
+                self.record("table_pages_skipped")
+                if self.screen == "on":
+                    return []
+
+        if self.engine == "pymupdf":
+            tables = pymupdf_page_tables(page)
+        else:
+            tables = plumber_page_tables(plumber_page())
+        if tables:
+            self.record("table_pages_with_tables" if candidate else "table_pages_missed")
+        return tables
+
+    def merge(self, stats: Dict[str, int]):
+        """Add the counters of a detector that ran elsewhere, e.g. in a worker process."""
+        for name, value in stats.items():
+            self.stats[name] += value
+            self.metrics.count(name, value)
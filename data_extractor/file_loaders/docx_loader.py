@@ -1,4 +1,6 @@
 import docx
+from data_extractor.data_extractor.document_source import open_source
+from data_extractor.data_extractor.format_detection import detect_format, require_format
 from data_extractor.file_loaders.file_loader import FileLoader
 
 class DOCXLoader(FileLoader):
@@ -7,14 +9,14 @@ class DOCXLoader(FileLoader):
     #     self.file = None
 
     def validate_file(self, file_path: str) -> bool:
-        return file_path.lower().endswith('.docx')
+        return detect_format(file_path).is_valid("docx")
 
     def load_file(self, file_path: str) -> docx.Document:
-        if not self.validate_file(file_path):
-            raise ValueError("Invalid DOCX file.")
+        # reject corrupt, encrypted and mislabeled files before parsing them
+        require_format(file_path, "docx")
         try:
-            # Attempt to open the DOCX file
-            return docx.Document(file_path)
+            # Attempt to open the DOCX file (a path, or a stream over a DocumentSource)
+            return docx.Document(open_source(file_path))
         except Exception:
             # Catch any exception that occurs and raise a ValueError
             raise ValueError("Invalid DOCX file.")
@@ -10,4 +10,8 @@ class FileLoader(ABC):
     @abstractmethod
     def load_file(self, file_path: str) -> Any:
         """Load and return the file object."""
-        pass
\ No newline at end of file
+        pass
+
+    def close_file(self, file: Any) -> None:
+        """Release the file object returned by load_file()."""
+        pass
@@ -0,0 +1,42 @@
+from data_extractor.data_extractor.document_source import open_source
+from data_extractor.data_extractor.format_detection import detect_format, require_format
+from data_extractor.data_extractor.ooxml import OOXMLPackage
+from data_extractor.file_loaders.file_loader import FileLoader
+
+# extension -> (part of the main document's content type, error raised for invalid files)
+OOXML_FORMATS = {
+    ".docx": ("wordprocessingml", "Invalid DOCX file."),
+    ".pptx": ("presentationml", "Invalid PPT file."),
+}
+
+class OOXMLLoader(FileLoader):
+    """Opens a DOCX or PPTX file as a raw zip package for the 'raw' OOXML engine."""
+
+    def __init__(self, extension: str):
+        self.extension = extension
+        self.content_type, self.error = OOXML_FORMATS[extension]
+
+    def validate_file(self, file_path: str) -> bool:
+        return detect_format(file_path).is_valid(self.extension[1:])
+
+    def load_file(self, file_path: str) -> OOXMLPackage:
+        # reject corrupt, encrypted and mislabeled files before parsing them
+        require_format(file_path, self.extension[1:], self.error)
+
+        try:
+            # Attempt to open the file (a path, or a stream over a DocumentSource) as an OOXML zip package
+            package = OOXMLPackage(open_source(file_path))
+        except Exception:
+            # Encrypted files are OLE containers, not zips, and fail here too
+            raise ValueError(self.error)
+
+        # The main document must exist and be of the expected kind
+        main_partname = package.main_partname
+        if (main_partname is None or not package.has_part(main_partname)
+                or self.content_type not in (package.content_type(main_partname) or "")):
+            package.close()
+            raise ValueError(self.error)
+        return package
+
+    def close_file(self, file: OOXMLPackage) -> None:
+        file.close()
@@ -1,5 +1,7 @@
 import os
 from PyPDF2 import PdfReader
+from data_extractor.data_extractor.document_source import open_source
+from data_extractor.data_extractor.format_detection import detect_format, require_format
 from data_extractor.file_loaders.file_loader import FileLoader
 
 class PDFLoader(FileLoader):
@@ -13,15 +15,15 @@ class PDFLoader(FileLoader):
     #     self.file = None
 
     def validate_file(self, file_path: str) -> bool:
-        return file_path.lower().endswith('.pdf')
+        return detect_format(file_path).is_valid("pdf")
 
     def load_file(self, file_path: str) -> PdfReader:
-        if not self.validate_file(file_path):
-            raise ValueError("Invalid PDF file.")
+        # reject corrupt, encrypted and mislabeled files before parsing them
+        require_format(file_path, "pdf")
         
         try:
-            # Attempt to open the PDF file
-            pdf = PdfReader(file_path)
+            # Attempt to open the PDF file (a path, or a stream over a DocumentSource)
+            pdf = PdfReader(open_source(file_path))
             # Check if the PDF is encrypted (password-protected)
             if pdf.is_encrypted:
                 raise ValueError("Invalid PDF file.")
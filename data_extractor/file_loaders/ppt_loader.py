@@ -1,17 +1,19 @@
 import pptx
+from data_extractor.data_extractor.document_source import open_source
+from data_extractor.data_extractor.format_detection import detect_format, require_format
 from data_extractor.file_loaders.file_loader import FileLoader
 
 class PPTLoader(FileLoader):
     def validate_file(self, file_path: str) -> bool:
-        return file_path.lower().endswith('.pptx') or file_path.lower().endswith('.ppt')
+        return detect_format(file_path).is_valid("pptx")
 
     def load_file(self, file_path: str) -> pptx.Presentation:
-        if not self.validate_file(file_path):
-            raise ValueError("Invalid PPT file.")
+        # reject corrupt, encrypted and mislabeled files before parsing them
+        require_format(file_path, "pptx")
         
         try:
-            # Attempt to load the PPTX file
-            return pptx.Presentation(file_path)
+            # Attempt to load the PPTX file (a path, or a stream over a DocumentSource)
+            return pptx.Presentation(open_source(file_path))
         except Exception:
             # Catch any exception related to loading the file and raise the expected error
             raise ValueError("Invalid PPT file.")
\ No newline at end of file
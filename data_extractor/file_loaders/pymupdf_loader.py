@@ -0,0 +1,28 @@
+import fitz
+from data_extractor.data_extractor.document_source import open_fitz
+from data_extractor.data_extractor.format_detection import detect_format, require_format
+from data_extractor.file_loaders.file_loader import FileLoader
+
+class PyMuPDFLoader(FileLoader):
+    def validate_file(self, file_path: str) -> bool:
+        return detect_format(file_path).is_valid("pdf")
+
+    def load_file(self, file_path: str) -> fitz.Document:
+        # reject corrupt, encrypted and mislabeled files before parsing them
+        require_format(file_path, "pdf")
+
+        try:
+            # Attempt to open the PDF file (a path, or the buffer of a DocumentSource)
+            pdf = open_fitz(file_path)
+        except Exception:
+            # Catch any exception raised while opening and raise the expected ValueError
+            raise ValueError("Invalid PDF file.")
+
+        # Check if the PDF is encrypted (password-protected)
+        if pdf.needs_pass or not pdf.is_pdf:
+            pdf.close()
+            raise ValueError("Invalid PDF file.")
+        return pdf
+
+    def close_file(self, file: fitz.Document) -> None:
+        file.close()
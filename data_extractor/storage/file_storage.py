@@ -1,130 +1,399 @@
 import os
 import json
+import threading
+import time
 import pandas as pd  # For saving tables as CSV
+from concurrent.futures import ThreadPoolExecutor, wait
 from io import BytesIO
 from PIL import Image as PILImage
+from data_extractor.data_extractor.image_index import hash_image
+from data_extractor.data_extractor.instrumentation import NULL_METRICS
 from data_extractor.storage.storage import Storage  # For handling PPTX images
+from data_extractor.storage.table_cells import table_csv
+
+# How text is written: one .txt file, or one file per page/slide/section
+TEXT_LAYOUTS = ("flat", "pages")
+
+# Number of threads writing files; 1 writes every file in the calling thread
+DEFAULT_WRITERS = 4
 
 class FileStorage(Storage):
-    def __init__(self, output_dir: str):
+    def __init__(self, output_dir: str, text_layout: str = "flat", writers: int = DEFAULT_WRITERS,
+                 metrics=NULL_METRICS):
+        """
+        :param output_dir: Directory the document's files are written to.
+        :param text_layout: 'flat' for one .txt file, 'pages' for one file per page/slide/section.
+        :param writers: Number of threads writing files concurrently; 1 keeps writes in the calling thread.
+        :param metrics: A DocumentMetrics counting the files and bytes written.
+        """
+        if text_layout not in TEXT_LAYOUTS:
+            raise ValueError(f"Unsupported text layout. Use one of: {', '.join(TEXT_LAYOUTS)}.")
+        if writers < 1:
+            raise ValueError("Number of writers must be at least 1.")
         self.output_dir = output_dir
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        self.text_layout = text_layout
+        self.stream = None
+        # content hash -> file name of every image written to this output directory
+        self.image_files = {}
+        self.writers = writers
+        self.executor = None
+        # writes submitted but not finished, and the errors of finished ones
+        self.pending = set()
+        self.errors = []
+        # at most this many writes (and the bytes they hold) wait for a writer thread
+        self.slots = threading.BoundedSemaphore(writers * 4)
+        self.lock = threading.Lock()
+        # files and bytes written, and when the first and last write happened
+        self.stats = {"files": 0, "bytes": 0, "started": None, "finished": None}
+        # directories known to exist, so each is created at most once
+        self.dirs = set()
+        self.metrics = metrics
+        self.make_dir("")
 
     def store(self, data, filename: str, data_type: str):
         """Save data based on type: 'text', 'image', 'url', or 'table'."""
-        if data_type == 'text':
-            self.save_text(data, filename)
-        elif data_type == 'image':
-            return self.save_images(data, filename)
-        elif data_type == 'url':
-            self.save_urls(data, filename)
-        elif data_type == 'data_table':
-            self.save_tables(data, filename)
-        else:
-            raise ValueError("Unsupported data type. Use 'text', 'image', 'url', or 'data_table'.")
+        with self.metrics.span("file_storage"):
+            if data_type == 'text':
+                self.save_text(data, filename)
+            elif data_type == 'image':
+                return self.save_images(data, filename)
+            elif data_type == 'url':
+                self.save_urls(data, filename)
+            elif data_type == 'data_table':
+                self.save_tables(data, filename)
+            else:
+                raise ValueError("Unsupported data type. Use 'text', 'image', 'url', or 'data_table'.")
 
     def save_text(self, data, filename: str):
-        """Save text data as a .txt file."""
+        """
+        Save text data as a .txt file, or with the 'pages' layout as one file per
+        page/slide/section when the text carries its page boundaries.
+        """
+        if self.text_layout == "pages" and hasattr(data, "segments"):
+            metadata = [self.write_page_text(segment["page"], segment["text"], start)
+                        for segment, start in zip(data.segments(), data.offsets)]
+            self.write_page_metadata(metadata)
+            return
+
         txt_filename = os.path.splitext(filename)[0] + ".txt"
-        output_path = os.path.join(self.output_dir, txt_filename)
-        with open(output_path, 'w') as f:
-            f.write(data)
+        self.write_file(os.path.join(self.output_dir, txt_filename), data)
+        self.flush()
+
+    def write_page_text(self, page, text: str, start: int):
+        """Write the text of one page as text/page_<page>.txt and return its metadata entry."""
+        page_filename = f"page_{page}.txt"
+        self.write_file(os.path.join(self.make_dir("text"), page_filename), text)
+        # offsets locate the page in the flat text of the document
+        return {"page_number": page, "file_name": page_filename, "start": start, "end": start + len(text)}
+
+    def write_page_metadata(self, metadata):
+        self.write_json(os.path.join(self.make_dir("text"), "metadata.json"), metadata)
+        self.flush()
 
     def save_images(self, images, filename: str):
         """Save image data to image files and metadata."""
-        images_dir = os.path.join(self.output_dir, "images")
-        if not os.path.exists(images_dir):
-            os.makedirs(images_dir)
+        images_dir = self.make_dir("images")
 
         metadata = []
-        for idx, image in enumerate(images):
-            # Check if the image is a PIL Image object (PPTX case)
-            if isinstance(image, PILImage.Image):  
-                # Convert the image to bytes (PNG format)
-                image_bytes = BytesIO()
-                image.save(image_bytes, format='PNG')  # Save as PNG
-                image_bytes = image_bytes.getvalue()
-                image_filename = f"image_{idx + 1}.png"
-                image_ext = 'png'
-            # Otherwise, assume it's a dictionary (PDF/DOCX case)
-            elif isinstance(image, dict):
-                # Check if it's a dictionary and has the necessary keys
-                image_filename = f"image_{idx + 1}.{image.get('ext', 'jpg')}"
-                image_bytes = image.get('image_data', b"")
-                image_ext = image.get('ext', 'jpg')  # noqa: F841
-            else:
-                # If the image is neither a PIL Image nor a dictionary, skip it
-                continue
+        for image in images:
+            image_metadata = self.write_image(image, images_dir)
+            if image_metadata is not None:
+                metadata.append(image_metadata)
+
+        self.write_json(os.path.join(images_dir, 'metadata.json'), metadata)
+        self.flush()
+        return metadata
+
+    def write_image(self, image, images_dir: str):
+        """
+        Write one image placement and return its metadata entry.
+
+        Each distinct image (by content hash) is written once as image_<n>.<ext>;
+        further placements of it only add a metadata entry pointing at that file.
+        """
+        # Check if the image is a PIL Image object (PPTX case)
+        if isinstance(image, PILImage.Image):
+            # identified by its pixels; the PNG encoding happens on a writer thread
+            image_hash = hash_image(image.mode.encode() + str(image.size).encode() + image.tobytes())
+            image_content = lambda: encode_png(image)
+            image_ext = 'png'
+            details = {}
+        # Otherwise, assume it's a dictionary (PDF/DOCX case)
+        elif isinstance(image, dict):
+            # Check if it's a dictionary and has the necessary keys
+            image_content = image.get('image_data', b"")
+            image_ext = image.get('ext', 'jpg')
+            details = image
+            image_hash = details.get("hash") or hash_image(image_content)
+        else:
+            # If the image is neither a PIL Image nor a dictionary, skip it
+            return None
+
+        image_filename = self.image_files.get(image_hash)
+        if image_filename is None:
+            image_filename = f"image_{len(self.image_files) + 1}.{image_ext}"
+            self.image_files[image_hash] = image_filename
 
             # Save the image data to file
-            image_path = os.path.join(images_dir, image_filename)
-            with open(image_path, "wb") as img_file:
-                img_file.write(image_bytes)
+            self.write_file(os.path.join(images_dir, image_filename), image_content)
+
+        return {
+            "file_name": image_filename,
+            "page_number": details.get("page", "N/A"),
+            "dimensions": details.get("dimensions", "N/A"),
+            "hash": image_hash
+        }
 
+    def image_paths(self):
+        """Return {content hash: path} of every image written to this output directory."""
+        return {image_hash: self.image_path(image_hash) for image_hash in list(self.image_files)}
+
+    def image_path(self, image_hash):
+        """Return the path the image with this content hash was written to, or None."""
+        image_filename = self.image_files.get(image_hash)
+        if image_filename is None:
+            return None
+        return os.path.abspath(os.path.join(self.output_dir, "images", image_filename))
+
+    def save_urls(self, urls, filename: str):
+        urls_dir = self.make_dir("urls")
+        metadata = []
+        url_lines = []
+        for url_info in urls:
+            url_lines.append(f"{url_info['url']}\n")
             metadata.append({
-                "file_name": image_filename,
-                "page_number": image.get("page", "N/A"),
-                "dimensions": image.get("dimensions", "N/A")
+                "linked_text": url_info["linked_text"],
+                "url": url_info["url"],
+                "page_number": url_info["page_number"]
             })
 
-        metadata_file = os.path.join(images_dir, 'metadata.json')
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=4)
-        return metadata
+        self.write_file(os.path.join(urls_dir, "urls.txt"), "".join(url_lines))
+        self.write_json(os.path.join(urls_dir, "metadata.json"), metadata)
+        self.flush()
 
-    def save_urls(self, urls, filename: str):
-        urls_dir = os.path.join(self.output_dir, "urls")
-        if not os.path.exists(urls_dir):
-            os.makedirs(urls_dir)
+    def save_tables(self, tables, filename: str):
+        """Save extracted tables as CSV files and generate metadata."""
+        tables_dir = self.make_dir("tables")
 
-        url_filename = os.path.join(urls_dir, "urls.txt")
         metadata = []
+        for idx, table in enumerate(tables):
+            metadata.append(self.write_table(table, idx, tables_dir))
 
-        with open(url_filename, "w") as url_file:
-            for url_info in urls:
-                url_file.write(f"{url_info['url']}\n")
-                metadata.append({
+        # Save the metadata for all tables in a JSON file
+        self.write_json(os.path.join(tables_dir, "metadata.json"), metadata)
+        self.flush()
+                        
+    def write_table(self, table, idx: int, tables_dir: str):
+        """Write one table as table_<idx + 1>.csv and return its metadata entry."""
+        csv_filename = f"table_{idx + 1}.csv"
+        csv_path = os.path.join(tables_dir, csv_filename)
+        
+        # Save table data to CSV file; the CSV text is built on a writer thread
+        if isinstance(table, pd.DataFrame):
+            self.write_file(csv_path, lambda: table.to_csv(index=False))
+        elif isinstance(table, list):
+            self.write_file(csv_path, lambda: table_csv(table))
+        
+        # Add metadata for the current table; rows of extracted tables may differ in length
+        return {
+            "table_filename": csv_filename,
+            "row_count": len(table) if isinstance(table, list) else table.shape[0],
+            "column_count": max(map(len, table), default=0) if isinstance(table, list) else table.shape[1]
+        }
+
+    def begin_stream(self, filename: str):
+        """
+        Start writing a document record by record with store_unit().
+
+        Text is appended to the .txt file and every image and table is written
+        as soon as it arrives; only the small metadata lists are kept until
+        end_stream() writes them.
+        """
+        txt_filename = os.path.splitext(filename)[0] + ".txt"
+        text_path = os.path.join(self.output_dir, txt_filename)
+        self.stream = {
+            # with the 'pages' layout every record's text goes to its own file; the
+            # flat file is appended to under a temporary name and renamed at the end
+            "text_path": text_path,
+            "text_file": open(temporary_path(text_path), 'w') if self.text_layout == "flat" else None,
+            "pages": [],
+            "text_length": 0,
+            "images": [],
+            "urls": [],
+            "tables": [],
+        }
+
+    def store_unit(self, unit):
+        """Write one page/slide/section record produced by an extractor's iter_units()."""
+        with self.metrics.span("file_storage"):
+            stream = self.stream
+            text = unit.get("text") or ""
+            if stream["text_file"] is not None:
+                stream["text_file"].write(text)
+            else:
+                stream["pages"].append(self.write_page_text(unit.get("page"), text, stream["text_length"]))
+            stream["text_length"] += len(text)
+
+            if unit.get("images"):
+                images_dir = self.make_dir("images")
+                for image in unit["images"]:
+                    image_metadata = self.write_image(image, images_dir)
+                    if image_metadata is not None:
+                        stream["images"].append(image_metadata)
+
+            if unit.get("tables"):
+                tables_dir = self.make_dir("tables")
+                for table in unit["tables"]:
+                    stream["tables"].append(self.write_table(table, len(stream["tables"]), tables_dir))
+
+            for url_info in unit.get("urls") or []:
+                stream["urls"].append({
                     "linked_text": url_info["linked_text"],
                     "url": url_info["url"],
                     "page_number": url_info["page_number"]
                 })
 
-        metadata_file = os.path.join(urls_dir, "metadata.json")
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=4)
+    def end_stream(self):
+        """Close the streamed text file and write the collected metadata."""
+        stream = self.stream
+        self.stream = None
+        if stream["text_file"] is not None:
+            stream["text_file"].close()
+            self.count_written(os.path.getsize(temporary_path(stream["text_path"])))
+            os.replace(temporary_path(stream["text_path"]), stream["text_path"])
+        else:
+            self.write_page_metadata(stream["pages"])
 
-    def save_tables(self, tables, filename: str):
-        """Save extracted tables as CSV files and generate metadata."""
-        tables_dir = os.path.join(self.output_dir, "tables")
-        if not os.path.exists(tables_dir):
-            os.makedirs(tables_dir)
+        if stream["images"]:
+            self.write_json(os.path.join(self.make_dir("images"), 'metadata.json'), stream["images"])
+        if stream["urls"]:
+            self.save_urls(stream["urls"], "")
+        if stream["tables"]:
+            self.write_json(os.path.join(self.make_dir("tables"), "metadata.json"), stream["tables"])
+        self.flush()
 
-        metadata = []
-        for idx, table in enumerate(tables):
-            csv_filename = f"table_{idx + 1}.csv"
-            csv_path = os.path.join(tables_dir, csv_filename)
-            
-            # Save table data to CSV file
-            if isinstance(table, pd.DataFrame):
-                table.to_csv(csv_path, index=False)
-            elif isinstance(table, list):
-                with open(csv_path, 'w', newline='') as f:
-                    for row in table:
-                        f.write(",".join(row) + "\n")
-            
-            # Add metadata for the current table
-            metadata.append({
-                "table_filename": csv_filename,
-                "row_count": len(table) if isinstance(table, list) else table.shape[0],
-                "column_count": len(table[0]) if isinstance(table, list) and table else table.shape[1]
-            })
+    def abort_stream(self):
+        """Stop a failed stream without renaming its partial text file into place."""
+        stream = self.stream
+        self.stream = None
+        if stream["text_file"] is not None:
+            stream["text_file"].close()
+            os.remove(temporary_path(stream["text_path"]))
+
+    def make_dir(self, name: str) -> str:
+        """Create (if needed) and return a sub-directory of the output directory."""
+        path = os.path.join(self.output_dir, name)
+        if path not in self.dirs:
+            os.makedirs(path, exist_ok=True)
+            self.dirs.add(path)
+        return path
+
+    def write_file(self, path: str, content):
+        """
+        Write a file atomically, on a writer thread when there are several.
+
+        :param path: Destination path; its directory must exist.
+        :param content: The str/bytes to write, or a callable returning them, so
+                        encoding also happens on the writer thread.
+        """
+        # the throughput clock starts when the first write is submitted, not when it is done
+        with self.lock:
+            if self.stats["started"] is None:
+                self.stats["started"] = time.perf_counter()
+        if self.writers == 1:
+            self.write_atomic(path, content)
+            return
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.writers)
+        # blocks while too many writes are waiting, so their bytes stay bounded
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(self.write_atomic, path, content)
+        except Exception:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self.write_done)
+
+    def write_json(self, path: str, data):
+        self.write_file(path, lambda: json.dumps(data, indent=4))
+
+    def write_atomic(self, path: str, content):
+        """Write a temporary file next to `path` and rename it into place, so no partial file is ever seen."""
+        if callable(content):
+            content = content()
+        if isinstance(content, str):
+            content = content.encode()
+        tmp_path = temporary_path(path)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.count_written(len(content))
+
+    def count_written(self, size: int):
+        now = time.perf_counter()
+        with self.lock:
+            stats = self.stats
+            stats["files"] += 1
+            stats["bytes"] += size
+            stats["finished"] = now
+        self.metrics.count("files_written")
+        self.metrics.count("bytes_written", size)
+
+    def write_done(self, future):
+        with self.lock:
+            self.pending.discard(future)
+            if future.exception() is not None:
+                self.errors.append(future.exception())
+        self.slots.release()
+
+    def flush(self):
+        """Wait until every submitted write is on disk; raise the first write error, if any."""
+        with self.lock:
+            pending = list(self.pending)
+        with self.metrics.span("file_flush"):
+            wait(pending)
+        with self.lock:
+            errors = self.errors
+            self.errors = []
+        if errors:
+            raise errors[0]
+
+    def write_stats(self):
+        """Return the files and bytes written so far and the write throughput in bytes/sec."""
+        with self.lock:
+            stats = dict(self.stats)
+        started, finished = stats.pop("started"), stats.pop("finished")
+        stats["seconds"] = finished - started if finished is not None else 0.0
+        stats["bytes_per_second"] = stats["bytes"] / stats["seconds"] if stats["seconds"] else 0.0
+        return stats
 
-        # Save the metadata for all tables in a JSON file
-        metadata_file = os.path.join(tables_dir, "metadata.json")
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=4)
-                        
     def close(self):
-        pass
+        """Wait for pending writes and stop the writer threads."""
+        try:
+            self.flush()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+
+def temporary_path(path: str) -> str:
+    """The name a file is written under before it is renamed to `path`."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.tmp")
+
+
+def encode_png(image) -> bytes:
+    """Encode a PIL image as PNG bytes."""
+    image_bytes = BytesIO()
+    image.save(image_bytes, format='PNG')
+    return image_bytes.getvalue()
 
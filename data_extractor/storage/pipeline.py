@@ -0,0 +1,110 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+# Number of records a stage may fall behind the one before it; this bounds
+# how much extracted data is held in memory at once.
+DEFAULT_QUEUE_SIZE = 8
+
+# Marks the end of the records on a queue
+END = object()
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage of the pipeline failed."""
+
+
+def put(stage_queue: queue.Queue, item: Any, stop: threading.Event):
+    """Put `item` on a bounded queue, blocking while it is full unless the pipeline stops."""
+    while not stop.is_set():
+        try:
+            stage_queue.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+    raise PipelineAborted()
+
+
+def stage_input(inbox: queue.Queue, outbox: Optional[queue.Queue], stop: threading.Event) -> Iterator[Any]:
+    """
+    Yield the records of a stage's queue.
+
+    A record is handed to the next stage once the stage asks for the one
+    after it, i.e. once the stage is done with it.
+    """
+    while True:
+        try:
+            item = inbox.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                raise PipelineAborted()
+            continue
+        if stop.is_set():
+            raise PipelineAborted()
+        if item is END:
+            return
+        yield item
+        if outbox is not None:
+            put(outbox, item, stop)
+
+
+def run_pipeline(records: Iterable[Any], stages: List[Callable[[Iterator[Any]], None]],
+                 queue_size: int = DEFAULT_QUEUE_SIZE) -> int:
+    """
+    Produce `records` in this thread while every stage consumes them in its own thread.
+
+    Stages are chained: a record reaches a stage after every stage before it
+    is done with it, so a later stage may rely on an earlier one's output
+    (e.g. the image files a database stage references). Each queue holds at
+    most `queue_size` records, so a slow stage holds back the producer
+    instead of letting records pile up in memory.
+
+    If the producer or any stage raises, every other stage is stopped with
+    PipelineAborted and the first error is raised here.
+
+    :param records: Iterable of records, e.g. an extractor's iter_units().
+    :param stages: Functions each consuming an iterator of records, in order.
+    :param queue_size: Maximum number of records waiting in front of a stage.
+    :return: The number of records produced.
+    """
+    if queue_size < 1:
+        raise ValueError("Queue size must be at least 1.")
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    errors = []
+
+    def run_stage(index, stage):
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+        try:
+            stage(stage_input(queues[index], outbox, stop))
+            if outbox is not None:
+                put(outbox, END, stop)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=run_stage, args=(index, stage), daemon=True)
+               for index, stage in enumerate(stages)]
+    for thread in threads:
+        thread.start()
+
+    record_count = 0
+    try:
+        for record in records:
+            put(queues[0], record, stop)
+            record_count += 1
+        put(queues[0], END, stop)
+    except PipelineAborted:
+        pass
+    except BaseException as e:
+        errors.insert(0, e)
+        stop.set()
+    finally:
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return record_count
@@ -1,72 +1,250 @@
 import os
-from data_extractor.storage.file_storage import FileStorage
+from contextlib import contextmanager
+from data_extractor.data_extractor.extraction_cache import hash_file
+from data_extractor.data_extractor.extraction_spec import FULL_SPEC
+from data_extractor.data_extractor.instrumentation import NULL_METRICS
+from data_extractor.storage.file_storage import DEFAULT_WRITERS, FileStorage
+from data_extractor.storage.pipeline import DEFAULT_QUEUE_SIZE, run_pipeline
 from data_extractor.storage.sql_storage import SQLStorage
 from dotenv import load_dotenv
 load_dotenv()
 
 class SaveData():
-    def __init__(self, dataToBeSaved, file_path):
+    def __init__(self, dataToBeSaved, file_path, sql_storage=None, output_root="extracted_data", page_count=None,
+                 metrics=NULL_METRICS, spec=FULL_SPEC, content_hash=None, file_format=None, file_size=None):
+        """
+        :param dataToBeSaved: The dictionary returned by ExtractData.extractData().
+        :param file_path: Path of the file the data was extracted from.
+        :param sql_storage: Optional open SQLStorage to reuse; it is left open after saving.
+        :param output_root: Directory under which the local output folder is created.
+        :param page_count: Number of pages/slides/sections, recorded in the documents table.
+        :param metrics: A DocumentMetrics recording the storage timings and counters of the document.
+        :param spec: The ExtractionSpec the data was extracted with; artifacts it skipped are not saved.
+        :param content_hash: SHA-256 of the file, e.g. ExtractData.content_hash; hashed from disk when not given.
+        :param file_format: The format detected from the file's content, e.g. ExtractData.file_format;
+                            the extension tells it when not given.
+        :param file_size: Size of the file in bytes, e.g. ExtractData.file_size.
+        """
         self.file_path = file_path
         self.fileName = os.path.basename(file_path) 
-        self.database_name = os.getenv("DATABASE_NAME")
+        self.sql_storage = sql_storage
+        self.output_root = output_root
+        self.page_count = page_count
+        self.metrics = metrics
+        self.content_hash = content_hash
+        self.file_format = file_format
+        self.file_size = file_size
+        self.database_name = os.getenv("DATABASE_NAME", "database")
+        # 'blob' stores image bytes in the database, 'reference' points at the saved image files
+        self.image_storage = os.getenv("IMAGE_STORAGE", "blob")
+        # content hash -> path of every image written by saveToLocal()
+        self.image_paths = {}
+        # 'flat' writes one .txt file, 'pages' one file per page/slide/section
+        self.text_layout = os.getenv("TEXT_LAYOUT", "flat")
+        # number of threads writing the local files
+        self.file_writers = int(os.getenv("FILE_WRITERS", str(DEFAULT_WRITERS)))
         # self.database_name = 'assignment4.db'
-        self.table_name_text = os.getenv("TABLE_NAME_TEXT")
+        # the table names are used for the local output files; the SQL database
+        # uses the normalized tables of schema.py
+        self.table_name_text = os.getenv("TABLE_NAME_TEXT", "text")
         # self.table_name_text = 'text'
-        self.table_name_image = os.getenv("TABLE_NAME_IMAGE")
+        self.table_name_image = os.getenv("TABLE_NAME_IMAGE", "image")
         # self.table_name_image = 'image'
-        self.table_name_url = os.getenv("TABLE_NAME_URL")
+        self.table_name_url = os.getenv("TABLE_NAME_URL", "url")
         # self.table_name_url = 'url'
-        self.table_name_data_table = os.getenv("TABLE_NAME_DATA_TABLE")
+        self.table_name_data_table = os.getenv("TABLE_NAME_DATA_TABLE", "data_table")
         # self.table_name_data_table = "data_table"
         
         # this will be used to store the extracted data and handle the errors
-        self.extracted_text = dataToBeSaved.get("text", None)
-        self.extracted_images = dataToBeSaved.get("images", None)
-        self.extracted_urls = dataToBeSaved.get("urls", None)
-        self.extracted_tables = dataToBeSaved.get("tables", None)
+        self.extracted_text = dataToBeSaved.get("text", None) if spec.wants("text") else None
+        self.extracted_images = dataToBeSaved.get("images", None) if spec.wants("images") else None
+        self.extracted_urls = dataToBeSaved.get("urls", None) if spec.wants("urls") else None
+        self.extracted_tables = dataToBeSaved.get("tables", None) if spec.wants("tables") else None
         
     def saveToLocal(self):
         # Create a folder for storing the extracted data
         base_name = os.path.splitext(os.path.basename(self.file_path))[0]
-        output_dir = os.path.join("extracted_data", base_name)
-        file_storage = FileStorage(output_dir)
-        
-        # Save the extracted text
-        file_storage.store(self.extracted_text, os.path.basename(self.file_path), self.table_name_text)
+        output_dir = os.path.join(self.output_root, base_name)
+        file_storage = FileStorage(output_dir, self.text_layout, self.file_writers, self.metrics)
+
+        try:
+            # Save the extracted text (unless it was not extracted)
+            if self.extracted_text is not None:
+                file_storage.store(self.extracted_text, os.path.basename(self.file_path), self.table_name_text)
 
-        # Save the extracted images
-        if self.extracted_images:
-            file_storage.store(self.extracted_images, os.path.basename(self.file_path), self.table_name_image)
+            # Save the extracted images
+            if self.extracted_images:
+                file_storage.store(self.extracted_images, os.path.basename(self.file_path), self.table_name_image)
+                self.image_paths = file_storage.image_paths()
 
-        # Save the extracted URLs (if any)
-        if self.extracted_urls:
-            file_storage.store(self.extracted_urls, os.path.basename(self.file_path), self.table_name_url)
+            # Save the extracted URLs (if any)
+            if self.extracted_urls:
+                file_storage.store(self.extracted_urls, os.path.basename(self.file_path), self.table_name_url)
 
-        # Save the extracted tables (if any)
-        if self.extracted_tables:
-            file_storage.store(self.extracted_tables, os.path.basename(self.file_path), self.table_name_data_table)
+            # Save the extracted tables (if any)
+            if self.extracted_tables:
+                file_storage.store(self.extracted_tables, os.path.basename(self.file_path), self.table_name_data_table)
+        finally:
+            file_storage.close()
 
         print(f"Extracted data saved to: {output_dir}")
+        self.printWriteStats(file_storage)
         
     def saveToSQLDatabase(self):
-        # Create an instance of SQLStorage
-        sql_storage = SQLStorage(self.database_name)
+        """Store the extracted data as one document and return its id."""
+        # Create an instance of SQLStorage unless a shared one was given
+        sql_storage = self.sql_storage or SQLStorage(self.database_name, self.image_storage, self.metrics)
+        sql_storage.register_image_paths(self.image_paths)
+
+        try:
+            # the whole document is written in one transaction (a single commit)
+            with self.recordMetrics(sql_storage), sql_storage.transaction():
+                document_id = sql_storage.begin_document(self.fileName, **self.documentDetails())
 
-        # Store the extracted text in the SQL database
-        sql_storage.store(self.table_name_text, self.extracted_text, self.fileName)
+                # Store the extracted text in the SQL database page by page; text
+                # without page boundaries is stored and indexed paragraph by paragraph
+                if self.extracted_text is None:
+                    pass
+                elif hasattr(self.extracted_text, "segments"):
+                    sql_storage.store_pages(document_id, [(segment["page"], segment["text"])
+                                                          for segment in self.extracted_text.segments()])
+                else:
+                    sql_storage.store_text(document_id, self.extracted_text)
 
-        # Store the extracted images in the SQL database
-        if self.extracted_images:
-            sql_storage.store(self.table_name_image, self.extracted_images, self.fileName)
+                # Store the extracted images in the SQL database
+                if self.extracted_images:
+                    sql_storage.store_images(document_id, self.extracted_images)
 
-        # Store the extracted URLs in the SQL database
-        if self.extracted_urls:
-            sql_storage.store(self.table_name_url, self.extracted_urls, self.fileName)
+                # Store the extracted URLs in the SQL database
+                if self.extracted_urls:
+                    sql_storage.store_links(document_id, self.extracted_urls)
 
-        # Store the extracted tables in the SQL database
-        if self.extracted_tables:
-            for table in self.extracted_tables:
-                sql_storage.store(self.table_name_data_table, table, self.fileName)
+                # Store the extracted tables in the SQL database, one row per cell,
+                # with the page of every table when the extractor tells it
+                if not self.extracted_tables:
+                    pass
+                elif hasattr(self.extracted_tables, "segments"):
+                    for page, tables in self.extracted_tables.segments():
+                        sql_storage.store_tables(document_id, tables, page)
+                else:
+                    sql_storage.store_tables(document_id, self.extracted_tables)
+                sql_storage.end_document()
+        finally:
+            if self.sql_storage is None:
+                sql_storage.close()
 
         print("Data stored in SQL database")
-        sql_storage.close()
\ No newline at end of file
+        return document_id
+
+    def saveUnits(self, units):
+        """
+        Save the records of an extractor's iter_units() to local files and the
+        SQL database as they arrive, so only one page/slide/section is in memory.
+        """
+        base_name = os.path.splitext(os.path.basename(self.file_path))[0]
+        output_dir = os.path.join(self.output_root, base_name)
+        file_storage = FileStorage(output_dir, self.text_layout, self.file_writers, self.metrics)
+        sql_storage = self.sql_storage or SQLStorage(self.database_name, self.image_storage, self.metrics)
+
+        file_storage.begin_stream(self.fileName)
+        try:
+            # the whole document is written in one transaction (a single commit)
+            with self.recordMetrics(sql_storage), sql_storage.transaction():
+                sql_storage.begin_document(self.fileName, **self.documentDetails())
+                unit_count = 0
+                for unit in units:
+                    file_storage.store_unit(unit)
+                    if unit.get("images"):
+                        sql_storage.register_image_paths(file_storage.image_paths())
+                    sql_storage.store_unit(unit)
+                    unit_count += 1
+                # every file is on disk before the rows referencing it are committed
+                file_storage.end_stream()
+                sql_storage.end_document(page_count=unit_count)
+        finally:
+            if file_storage.stream is not None:
+                file_storage.abort_stream()
+            file_storage.close()
+            if self.sql_storage is None:
+                sql_storage.close()
+
+        print(f"Extracted data saved to: {output_dir}")
+        self.printWriteStats(file_storage)
+        print("Data stored in SQL database")
+
+    def savePipelined(self, units, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Save the records of an extractor's iter_units() while extraction goes on.
+
+        Extraction runs in this thread and feeds a bounded queue; local files
+        and the SQL database are written by their own writer threads, so
+        parsing, disk writes and database inserts overlap. At most
+        `queue_size` records wait in front of each writer.
+        """
+        base_name = os.path.splitext(os.path.basename(self.file_path))[0]
+        output_dir = os.path.join(self.output_root, base_name)
+        file_storage = FileStorage(output_dir, self.text_layout, self.file_writers, self.metrics)
+        sql_storage = self.sql_storage or SQLStorage(self.database_name, self.image_storage, self.metrics)
+
+        def writeLocal(units):
+            file_storage.begin_stream(self.fileName)
+            try:
+                for unit in units:
+                    file_storage.store_unit(unit)
+            except BaseException:
+                file_storage.abort_stream()
+                raise
+            file_storage.end_stream()
+
+        def writeSQLDatabase(units):
+            # the whole document is written in one transaction (a single commit)
+            with self.recordMetrics(sql_storage), sql_storage.transaction():
+                sql_storage.begin_document(self.fileName, **self.documentDetails())
+                unit_count = 0
+                for unit in units:
+                    # units arrive after their images were given file names; writeLocal
+                    # has flushed every file before this transaction commits
+                    if unit.get("images"):
+                        sql_storage.register_image_paths({image["hash"]: file_storage.image_path(image["hash"])
+                                                          for image in unit["images"] if image.get("hash")})
+                    sql_storage.store_unit(unit)
+                    unit_count += 1
+                sql_storage.end_document(page_count=unit_count)
+
+        try:
+            run_pipeline(units, [writeLocal, writeSQLDatabase], queue_size)
+        finally:
+            file_storage.close()
+            if self.sql_storage is None:
+                sql_storage.close()
+
+        print(f"Extracted data saved to: {output_dir}")
+        self.printWriteStats(file_storage)
+        print("Data stored in SQL database")
+
+    @contextmanager
+    def recordMetrics(self, sql_storage):
+        """Time the block as the 'sql_storage' stage, with a shared connection counting into this document's metrics."""
+        previous = sql_storage.metrics
+        sql_storage.metrics = self.metrics
+        try:
+            with self.metrics.span("sql_storage"):
+                yield
+        finally:
+            sql_storage.metrics = previous
+
+    def printWriteStats(self, file_storage):
+        stats = file_storage.write_stats()
+        print(f"Wrote {stats['files']} files ({stats['bytes'] / 1e6:.2f} MB) "
+              f"at {stats['bytes_per_second'] / 1e6:.2f} MB/s")
+
+    def documentDetails(self):
+        """Return the hash, size, format and page count of the saved file for the documents table."""
+        details = {"page_count": self.page_count, "content_hash": self.content_hash, "size": self.file_size,
+                   "file_format": self.file_format}
+        # the data may have been extracted from a file that is no longer on disk
+        if self.content_hash is None and os.path.isfile(self.file_path):
+            details["content_hash"] = hash_file(self.file_path)
+        if self.file_size is None and os.path.isfile(self.file_path):
+            details["size"] = os.path.getsize(self.file_path)
+        return details
@@ -0,0 +1,245 @@
+import ast
+import os
+import sys
+import sqlite3
+from data_extractor.data_extractor.image_index import hash_image
+from data_extractor.storage.table_cells import cell_number, cell_rows
+
+# Stored in PRAGMA user_version once the normalized schema is in place
+SCHEMA_VERSION = 4
+
+# The tables every artifact used to land in, as (id, filename, data TEXT)
+LEGACY_TABLES = ("text", "image", "url", "data_table")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    content_hash TEXT,
+    size INTEGER,
+    page_count INTEGER,
+    format TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documents_filename ON documents (filename);
+CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash);
+
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    page_number INTEGER,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pages_document_page ON pages (document_id, page_number);
+
+CREATE TABLE IF NOT EXISTS links (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    page_number INTEGER,
+    url TEXT,
+    linked_text TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_links_document_page ON links (document_id, page_number);
+CREATE INDEX IF NOT EXISTS idx_links_url ON links (url);
+
+CREATE TABLE IF NOT EXISTS image_content (
+    hash TEXT PRIMARY KEY,
+    ext TEXT,
+    size INTEGER,
+    path TEXT,
+    data BLOB
+);
+
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    page_number INTEGER,
+    location TEXT,
+    hash TEXT REFERENCES image_content (hash),
+    width INTEGER,
+    height INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_images_document_page ON images (document_id, page_number);
+CREATE INDEX IF NOT EXISTS idx_images_hash ON images (hash);
+
+CREATE TABLE IF NOT EXISTS table_cells (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    page_number INTEGER,
+    table_index INTEGER NOT NULL,
+    row_index INTEGER NOT NULL,
+    column_index INTEGER NOT NULL,
+    value TEXT,
+    number REAL
+);
+CREATE INDEX IF NOT EXISTS idx_table_cells_document_page ON table_cells (document_id, page_number);
+CREATE INDEX IF NOT EXISTS idx_table_cells_document_table ON table_cells (document_id, table_index);
+
+CREATE TABLE IF NOT EXISTS manifest (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    content_hash TEXT,
+    document_id INTEGER REFERENCES documents (id) ON DELETE SET NULL,
+    synced_at REAL
+);
+"""
+
+# Full-text index over pages.text. It stores no copy of the text (external
+# content) and the triggers keep it up to date row by row, so documents
+# become searchable as they are saved without ever rebuilding the index.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS page_search USING fts5 (
+    text,
+    content='pages',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS pages_search_insert AFTER INSERT ON pages BEGIN
+    INSERT INTO page_search (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_search_delete AFTER DELETE ON pages BEGIN
+    INSERT INTO page_search (page_search, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_search_update AFTER UPDATE OF text ON pages BEGIN
+    INSERT INTO page_search (page_search, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO page_search (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+
+def create_schema(conn: sqlite3.Connection):
+    """Create the normalized tables, indexes and full-text index if they do not exist yet."""
+    conn.executescript(SCHEMA)
+    add_cell_numbers(conn)
+    has_search_index = bool(table_columns(conn, "page_search"))
+    conn.executescript(SEARCH_SCHEMA)
+    if not has_search_index:
+        # index the pages stored before the full-text index existed, once
+        conn.execute("INSERT INTO page_search (page_search) VALUES ('rebuild')")
+        conn.commit()
+
+
+def add_cell_numbers(conn: sqlite3.Connection):
+    """Add the numeric column to a table_cells table from before typed cells, filling it in once."""
+    if "number" in table_columns(conn, "table_cells"):
+        return
+    conn.execute("ALTER TABLE table_cells ADD COLUMN number REAL")
+    conn.create_function("cell_number", 1, cell_number, deterministic=True)
+    with conn:
+        conn.execute("UPDATE table_cells SET number = cell_number(value) WHERE value IS NOT NULL")
+
+
+def format_of(filename: str):
+    """Return the lower-case extension of a file name without the dot, e.g. 'pdf'."""
+    return os.path.splitext(filename)[1].lstrip(".").lower() or None
+
+
+def table_columns(conn: sqlite3.Connection, table_name: str):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+
+
+def has_legacy_layout(conn: sqlite3.Connection) -> bool:
+    """Whether the database still holds (id, filename, data) tables to migrate."""
+    return any({"filename", "data"} <= set(table_columns(conn, table_name)) for table_name in LEGACY_TABLES)
+
+
+def migrate_legacy(conn: sqlite3.Connection) -> int:
+    """
+    Move the rows of the legacy text/image/url/data_table tables into the
+    normalized schema, then rename those tables to legacy_<name>.
+
+    Lists and tables that were stored as repr strings are parsed once here,
+    so they never have to be parsed again. Running it on an already migrated
+    database does nothing.
+
+    :return: The number of documents created.
+    """
+    if not has_legacy_layout(conn):
+        return 0
+
+    create_schema(conn)
+    document_ids = {}
+
+    def document_id(filename):
+        if filename not in document_ids:
+            cursor = conn.execute("INSERT INTO documents (filename, format) VALUES (?, ?)",
+                                  (filename, format_of(filename or "")))
+            document_ids[filename] = cursor.lastrowid
+        return document_ids[filename]
+
+    with conn:
+        legacy = {table_name: table_columns(conn, table_name) for table_name in LEGACY_TABLES}
+
+        if "data" in legacy["text"]:
+            for filename, text in conn.execute('SELECT filename, data FROM "text" ORDER BY id').fetchall():
+                conn.execute("INSERT INTO pages (document_id, page_number, text) VALUES (?, NULL, ?)",
+                             (document_id(filename), text))
+
+        if "data" in legacy["url"]:
+            for filename, data in conn.execute('SELECT filename, data FROM "url" ORDER BY id').fetchall():
+                for link in parse_repr(data) or []:
+                    conn.execute("INSERT INTO links (document_id, page_number, url, linked_text) VALUES (?, ?, ?, ?)",
+                                 (document_id(filename), as_page_number(link.get("page_number")),
+                                  link.get("url"), link.get("linked_text")))
+
+        if "data" in legacy["data_table"]:
+            table_counts = {}
+            for filename, data in conn.execute('SELECT filename, data FROM "data_table" ORDER BY id').fetchall():
+                table_index = table_counts.get(filename, 0)
+                table_counts[filename] = table_index + 1
+                conn.executemany(
+                    "INSERT INTO table_cells (document_id, page_number, table_index, row_index, column_index, value, "
+                    "number) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    cell_rows(document_id(filename), [parse_repr(data) or []], table_index))
+
+        if "data" in legacy["image"]:
+            migrate_legacy_images(conn, legacy["image"], document_id)
+
+        for table_name, columns in legacy.items():
+            if columns:
+                conn.execute(f'ALTER TABLE "{table_name}" RENAME TO "legacy_{table_name}"')
+
+    return len(document_ids)
+
+
+def migrate_legacy_images(conn: sqlite3.Connection, columns, document_id):
+    """Move legacy image rows, whose bytes were stored as their repr, into images/image_content."""
+    select_hash = "hash" if "hash" in columns else "NULL"
+    rows = conn.execute(f'SELECT filename, page_number, data, {select_hash} FROM "image" ORDER BY id').fetchall()
+    for filename, page, data, image_hash in rows:
+        image_bytes = parse_repr(data) if data else None
+        if isinstance(image_bytes, bytes):
+            image_hash = hash_image(image_bytes)
+            conn.execute("INSERT OR IGNORE INTO image_content (hash, ext, size, data) VALUES (?, ?, ?, ?)",
+                         (image_hash, os.path.splitext(str(page))[1].lstrip(".") or None,
+                          len(image_bytes), image_bytes))
+        page_number = as_page_number(page)
+        conn.execute("INSERT INTO images (document_id, page_number, location, hash) VALUES (?, ?, ?, ?)",
+                     (document_id(filename), page_number, None if page_number is not None else page, image_hash))
+
+
+def parse_repr(data):
+    """Parse a value that was stored as its Python repr; returns None if it cannot be parsed."""
+    try:
+        return ast.literal_eval(data)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return None
+
+
+def as_page_number(value):
+    """Return value as an int page number, or None for locations such as 'media/image1.png'."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+if __name__ == "__main__":
+    # python3 -m data_extractor.storage.schema [database]
+    database = sys.argv[1] if len(sys.argv) > 1 else os.getenv("DATABASE_NAME", "database")
+    connection = sqlite3.connect(database)
+    migrated = migrate_legacy(connection)
+    create_schema(connection)
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    connection.close()
+    print(f"Migrated {migrated} documents in {database}")
@@ -0,0 +1,63 @@
+import sqlite3
+from typing import Any, Dict, List
+
+# Text without page information is indexed in blocks of whole lines of about
+# this many characters, so a hit still points close to where the term is.
+BLOCK_SIZE = 2000
+
+
+def text_blocks(text: str, block_size: int = BLOCK_SIZE) -> List[str]:
+    """
+    Split text into blocks of whole lines (paragraphs) of at least `block_size` characters.
+
+    Joining the blocks gives back the text exactly.
+    """
+    blocks = []
+    block = []
+    length = 0
+    for line in text.splitlines(keepends=True):
+        block.append(line)
+        length += len(line)
+        if length >= block_size:
+            blocks.append("".join(block))
+            block = []
+            length = 0
+    if block:
+        blocks.append("".join(block))
+    return blocks
+
+
+def build_query(query: str) -> str:
+    """Turn plain search words into an FTS5 query matching pages that contain all of them."""
+    # every word is quoted, so characters such as '-' or ':' are not read as FTS5 syntax
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+
+
+def search(conn: sqlite3.Connection, query: str, limit: int = 10, raw: bool = False) -> List[Dict[str, Any]]:
+    """
+    Return the pages matching `query`, best match first.
+
+    :param conn: Connection to an extraction database.
+    :param query: Words that must all occur on the page, or an FTS5 query if `raw` is True.
+    :param limit: Maximum number of hits.
+    :param raw: Pass `query` to FTS5 unchanged, e.g. for phrases, OR and prefix* queries.
+    :return: Dicts with the document id, filename, page number, snippet and bm25 score.
+    """
+    match = query if raw else build_query(query)
+    if not match.strip():
+        return []
+    try:
+        rows = conn.execute("""
+            SELECT pages.document_id, documents.filename, pages.page_number,
+                   snippet(page_search, 0, '[', ']', '...', 12), page_search.rank
+            FROM page_search
+            JOIN pages ON pages.id = page_search.rowid
+            JOIN documents ON documents.id = pages.document_id
+            WHERE page_search MATCH ?
+            ORDER BY page_search.rank
+            LIMIT ?""", (match, limit)).fetchall()
+    except sqlite3.OperationalError as e:
+        raise ValueError(f"Invalid search query: {e}") from e
+    return [{"document_id": document_id, "filename": filename, "page_number": page_number,
+             "snippet": snippet, "score": score}
+            for document_id, filename, page_number, snippet, score in rows]
@@ -1,47 +1,393 @@
+import os
+import time
+from contextlib import contextmanager
+from data_extractor.data_extractor.image_index import hash_image
+from data_extractor.data_extractor.instrumentation import NULL_METRICS
+from data_extractor.storage.schema import SCHEMA_VERSION, as_page_number, create_schema, format_of, migrate_legacy
+from data_extractor.storage.search import search, text_blocks
+from data_extractor.storage.table_cells import cell_rows, cells_to_frames, read_cells
 from data_extractor.storage.storage import Storage
 
+# How image bytes are kept: as BLOBs in the database, or as references to
+# the files FileStorage wrote (falling back to a BLOB when there is no file).
+IMAGE_MODES = ("blob", "reference")
+
 class SQLStorage(Storage):
-    def __init__(self, database):
+    def __init__(self, database, image_mode="blob", metrics=NULL_METRICS):
+        """
+        :param database: Path of the SQLite database.
+        :param image_mode: 'blob' or 'reference', see IMAGE_MODES.
+        :param metrics: A DocumentMetrics counting rows written and timing commits; SaveData
+                        sets the one of the document being saved on a shared connection.
+        """
+        if image_mode not in IMAGE_MODES:
+            raise ValueError(f"Unsupported image mode. Use one of: {', '.join(IMAGE_MODES)}.")
         super().__init__(database)
+        self.image_mode = image_mode
+        # content hash -> path of the image file written by FileStorage
+        self.image_paths = {}
+        # content hashes of the images already stored through this connection
+        self.stored_images = set()
+        # while True, store() leaves committing to the enclosing transaction()
+        self.in_transaction = False
+        self.metrics = metrics
+
+        # WAL lets readers run during ingestion and turns most commits into
+        # sequential appends; NORMAL sync is durable at checkpoints in WAL mode.
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        self.cursor.execute("PRAGMA cache_size=-20000")  # 20 MB page cache
+        self.cursor.execute("PRAGMA temp_store=MEMORY")
+        self.cursor.execute("PRAGMA foreign_keys=ON")
+
+        # the document rows are written for: {'id', 'filename', 'tables'}
+        self.document = None
+        self.prepare_schema()
+
+    def prepare_schema(self):
+        """Migrate a database in the legacy (id, filename, data) layout and create the normalized tables."""
+        migrate_legacy(self.conn)
+        create_schema(self.conn)
+        # image_content tables from before reference mode lack these columns
+        self.add_missing_columns("image_content", {"size": "INT", "path": "TEXT"})
+        self.cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group every store() call made inside the block into one transaction.
+
+        The transaction is committed once when the block ends, or rolled back
+        if it raises, so a document is either stored completely or not at all.
+        A block inside another one is committed with the outer block, but is
+        rolled back on its own if it raises.
+        """
+        if self.in_transaction:
+            # already inside a transaction; a savepoint lets this block roll back alone
+            document = dict(self.document) if self.document is not None else None
+            self.cursor.execute("SAVEPOINT nested_transaction")
+            try:
+                yield self
+            except BaseException:
+                self.cursor.execute("ROLLBACK TO nested_transaction")
+                self.cursor.execute("RELEASE nested_transaction")
+                # images stored inside the block are gone again; the outer block's document is not
+                self.stored_images.clear()
+                self.document = document
+                raise
+            self.cursor.execute("RELEASE nested_transaction")
+            return
+
+        self.in_transaction = True
+        try:
+            # begin explicitly, so a savepoint taken before any write does not start (and commit) its own
+            if not self.conn.in_transaction:
+                self.cursor.execute("BEGIN")
+            yield self
+        except BaseException:
+            self.conn.rollback()
+            # nothing recorded during the rolled back transaction was written
+            self.stored_images.clear()
+            self.document = None
+            raise
+        finally:
+            self.in_transaction = False
+        with self.metrics.span("sql_commit"):
+            self.conn.commit()
+
+    def commit(self):
+        """Commit, unless a transaction() commits later."""
+        if not self.in_transaction:
+            with self.metrics.span("sql_commit"):
+                self.conn.commit()
+
+    def begin_document(self, filename, content_hash=None, size=None, page_count=None, file_format=None):
+        """
+        Add a row to the documents table; the rows stored next belong to it.
+
+        :param filename: The name of the file the data was extracted from.
+        :param content_hash: SHA-256 of the file bytes.
+        :param size: Size of the file in bytes.
+        :param page_count: Number of pages/slides/sections of the file.
+        :param file_format: File format, e.g. 'pdf'; defaults to the file extension.
+        :return: The id of the document.
+        """
+        self.cursor.execute(
+            "INSERT INTO documents (filename, content_hash, size, page_count, format) VALUES (?, ?, ?, ?, ?)",
+            (filename, content_hash, size, page_count, file_format or format_of(filename)))
+        self.document = {"id": self.cursor.lastrowid, "filename": filename, "tables": 0}
+        self.commit()
+        return self.document["id"]
+
+    def end_document(self, page_count=None):
+        """
+        Finish the current document; the next store() starts a new one.
+
+        :param page_count: Number of pages, when it was only known after storing them.
+        """
+        if page_count is not None and self.document is not None:
+            self.cursor.execute("UPDATE documents SET page_count = ? WHERE id = ?", (page_count, self.document["id"]))
+            self.commit()
+        self.document = None
+
+    def document_id(self, filename):
+        """Return the id of the current document, starting one for `filename` if there is none."""
+        if self.document is None or self.document["filename"] != filename:
+            self.begin_document(filename)
+        return self.document["id"]
 
     def store(self, table_name, data, filename):
         """
         Stores data and filename in a SQL database.
 
-        :param table_name: The name of the table to store the data in.
+        :param table_name: The kind of data: 'text', 'image', 'url' or 'data_table'.
         :param filename: The name of the file the data was extracted from.
         :param data: The data to be stored.
         """
-        self.table_name = table_name.replace(" ", "_").replace("-", "_")
+        document_id = self.document_id(filename)
+        if table_name == 'text':
+            self.store_text(document_id, data)
+        elif table_name == 'image':
+            self.store_images(document_id, data)
+        elif table_name == 'url':
+            self.store_links(document_id, data)
+        elif table_name == 'data_table':
+            self.store_tables(document_id, data)
+        else:
+            raise ValueError("Unsupported data type. Use 'text', 'image', 'url', or 'data_table'.")
 
-        # Create the table if it doesn't exist, with an additional 'filename' column
-        escaped_table_name = f'"{self.table_name}"'
+        # Commit the changes, unless a transaction() commits them later
+        self.commit()
 
-        if(table_name == 'image'):
-            self.cursor.execute(f"""CREATE TABLE IF NOT EXISTS {escaped_table_name} (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT,
-            page_number INT,
-            data TEXT
-            )""")
-        else:
-            self.cursor.execute(f"""CREATE TABLE IF NOT EXISTS {escaped_table_name} (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT,
-                data TEXT
-            )""")
-
-        # Insert the filename and data into the table
-        if(table_name == 'image'):
-            # print(data)
-            for i in range(len(data)):
-                self.cursor.execute(f"INSERT INTO {escaped_table_name} (filename, page_number, data) VALUES (?, ?, ?)", (filename, data[i]['page'], str(data[i]['image_data'])))
-            # self.cursor.execute(f"INSERT INTO {escaped_table_name} (filename, page_number, data) VALUES (?, ?, ?)", (filename, data['page_number'], str(data['data'])))
-        else:
-            self.cursor.execute(f"INSERT INTO {escaped_table_name} (filename, data) VALUES (?, ?)", (filename, str(data)))
+    def store_many(self, table_name, items, filename):
+        """
+        Store a list of items, e.g. the extracted tables, with bulk inserts.
 
-        # Commit the changes
-        self.conn.commit()
+        :param table_name: The kind of data: 'text', 'image', 'url' or 'data_table'.
+        :param items: The items to store.
+        :param filename: The name of the file the items were extracted from.
+        """
+        self.store(table_name, items, filename)
+
+    def store_pages(self, document_id, pages):
+        """Insert (page_number, text) rows; page_number is None for text without page information."""
+        rows = [(document_id, page_number, text) for page_number, text in pages]
+        self.cursor.executemany("INSERT INTO pages (document_id, page_number, text) VALUES (?, ?, ?)", rows)
+        self.metrics.count("rows_written", len(rows))
+
+    def store_text(self, document_id, text):
+        """Store text without page information as paragraph blocks, so search hits stay specific."""
+        self.store_pages(document_id, [(None, block) for block in text_blocks(text or "")])
+
+    def store_links(self, document_id, urls):
+        """Insert the url dicts returned by an extractor into the links table."""
+        rows = [(document_id, as_page_number(url.get("page_number")), url.get("url"), url.get("linked_text"))
+                for url in urls]
+        self.cursor.executemany(
+            "INSERT INTO links (document_id, page_number, url, linked_text) VALUES (?, ?, ?, ?)", rows)
+        self.metrics.count("rows_written", len(rows))
+
+    def store_tables(self, document_id, tables, page_number=None):
+        """Insert every cell of `tables` into table_cells, numbering the tables per document."""
+        first_index = self.document["tables"] if self.document else 0
+        cells = cell_rows(document_id, tables, first_index, page_number)
+        self.cursor.executemany(
+            "INSERT INTO table_cells (document_id, page_number, table_index, row_index, column_index, value, number) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", cells)
+        self.metrics.count("rows_written", len(cells))
+        if self.document:
+            self.document["tables"] += len(tables)
+
+    def store_images(self, document_id, images):
+        """Insert image placements, and the bytes of images not stored before, in bulk."""
+        contents = []
+        placements = []
+        for image in images:
+            image_hash = image.get('hash') or hash_image(image['image_data'])
+            # Store the bytes once per content hash, across all documents; placements
+            # after an image's first carry no bytes, which were stored with the first
+            if image_hash not in self.stored_images and "image_data" in image:
+                image_bytes = image['image_data']
+                path = self.image_paths.get(image_hash) if self.image_mode == "reference" else None
+                # in reference mode only the path to FileStorage's copy is kept
+                data = None if path else image_bytes
+                contents.append((image_hash, image.get('ext'), len(image_bytes), path, data))
+                self.stored_images.add(image_hash)
+            width, height = image.get('dimensions') or (None, None)
+            # DOCX images have no page, only the location of their media part
+            page_number = as_page_number(image.get('page'))
+            location = None if page_number is not None else image.get('page')
+            placements.append((document_id, page_number, location, image_hash, width, height))
+
+        self.cursor.executemany("INSERT OR IGNORE INTO image_content (hash, ext, size, path, data) VALUES (?, ?, ?, ?, ?)", contents)
+        self.cursor.executemany("INSERT INTO images (document_id, page_number, location, hash, width, height) VALUES (?, ?, ?, ?, ?, ?)", placements)
+        self.metrics.count("rows_written", len(contents) + len(placements))
+
+    def delete_document(self, document_id):
+        """
+        Delete a document with its pages, links, images and table cells.
+
+        Image bytes no other document places any more are deleted too.
+        """
+        # the other tables reference documents ON DELETE CASCADE, and the search index follows pages
+        self.cursor.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+        self.cursor.execute("DELETE FROM image_content WHERE hash NOT IN "
+                            "(SELECT hash FROM images WHERE hash IS NOT NULL)")
+        # the bytes of a re-added image must be written again
+        self.stored_images.clear()
+        self.commit()
+
+    def manifest_entries(self):
+        """Return the manifest as {path: {'size', 'mtime_ns', 'content_hash', 'document_id'}}."""
+        rows = self.cursor.execute("SELECT path, size, mtime_ns, content_hash, document_id FROM manifest")
+        return {path: {"size": size, "mtime_ns": mtime_ns, "content_hash": content_hash, "document_id": document_id}
+                for path, size, mtime_ns, content_hash, document_id in rows.fetchall()}
+
+    def record_manifest(self, path, size, mtime_ns, content_hash, document_id):
+        """Record the size, modification time and content hash `path` had when `document_id` was stored for it."""
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO manifest (path, size, mtime_ns, content_hash, document_id, synced_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", (path, size, mtime_ns, content_hash, document_id, time.time()))
+        self.commit()
+
+    def remove_manifest(self, path):
+        self.cursor.execute("DELETE FROM manifest WHERE path = ?", (path,))
+        self.commit()
+
+    def register_image_paths(self, image_paths):
+        """
+        Record where FileStorage wrote each image, for the 'reference' image mode.
+
+        :param image_paths: Dict mapping image content hashes to file paths.
+        """
+        self.image_paths.update(image_paths)
+
+    def open_image(self, image_hash):
+        """
+        Open a stored image for reading without loading it into memory.
+
+        BLOBs are read through SQLite's incremental blob I/O and referenced
+        images from their file, so large images can be read in chunks.
+
+        :param image_hash: Content hash of the image.
+        :return: A file-like object, to be closed by the caller.
+        """
+        row = self.cursor.execute('SELECT rowid, path, data IS NOT NULL FROM image_content WHERE hash = ?',
+                                  (image_hash,)).fetchone()
+        if row is None:
+            raise KeyError(image_hash)
+        rowid, path, has_blob = row
+        if has_blob:
+            return self.conn.blobopen("image_content", "data", rowid, readonly=True)
+        if path and os.path.exists(path):
+            return open(path, "rb")
+        raise FileNotFoundError(f"Image {image_hash} has no stored bytes.")
+
+    def iter_image_chunks(self, image_hash, chunk_size=64 * 1024):
+        """Yield a stored image's bytes in chunks of at most `chunk_size` bytes."""
+        with self.open_image(image_hash) as image_file:
+            for chunk in iter(lambda: image_file.read(chunk_size), b""):
+                yield chunk
+
+    def add_missing_columns(self, table_name, columns):
+        """Add the given {name: type} columns that an existing table does not have yet."""
+        existing = {row[1] for row in self.cursor.execute(f'PRAGMA table_info("{table_name}")')}
+        for column, column_type in columns.items():
+            if column not in existing:
+                self.cursor.execute(f'ALTER TABLE "{table_name}" ADD COLUMN {column} {column_type}')
+
+    def store_unit(self, unit):
+        """
+        Store one page/slide/section record produced by an extractor's iter_units()
+        under the current document, keeping its page number.
+
+        Call begin_document() first, inside transaction() so the whole
+        document is committed once.
+        """
+        document_id = self.document["id"]
+        if unit.get("text"):
+            self.store_pages(document_id, [(unit.get("page"), unit["text"])])
+        if unit.get("images"):
+            self.store_images(document_id, unit["images"])
+        if unit.get("tables"):
+            self.store_tables(document_id, unit["tables"], unit.get("page"))
+        if unit.get("urls"):
+            self.store_links(document_id, unit["urls"])
+        self.commit()
+
+    def search(self, query, limit=10, raw=False):
+        """
+        Full-text search over the stored pages, best match first.
+
+        :param query: Words that must all occur on the page, or an FTS5 query if `raw` is True.
+        :param limit: Maximum number of hits.
+        :return: Dicts with 'document_id', 'filename', 'page_number', 'snippet' and 'score'.
+        """
+        return search(self.conn, query, limit, raw)
+
+    def find_documents(self, filename):
+        """Return the ids of the documents stored for `filename`, oldest first."""
+        rows = self.cursor.execute("SELECT id FROM documents WHERE filename = ? ORDER BY id", (filename,))
+        return [row[0] for row in rows.fetchall()]
+
+    def get_text(self, document_id, page_number=None):
+        """Return the text of a document, or of one of its pages, in page order."""
+        query = "SELECT text FROM pages WHERE document_id = ?"
+        params = [document_id]
+        if page_number is not None:
+            query += " AND page_number = ?"
+            params.append(page_number)
+        rows = self.cursor.execute(query + " ORDER BY page_number, id", params).fetchall()
+        return "".join(row[0] or "" for row in rows)
+
+    def get_links(self, document_id, page_number=None):
+        """Return the links of a document, or of one of its pages, as the url dicts extractors produce."""
+        query = "SELECT linked_text, url, page_number FROM links WHERE document_id = ?"
+        params = [document_id]
+        if page_number is not None:
+            query += " AND page_number = ?"
+            params.append(page_number)
+        rows = self.cursor.execute(query + " ORDER BY id", params).fetchall()
+        return [{"linked_text": linked_text, "url": url, "page_number": page}
+                for linked_text, url, page in rows]
+
+    def get_tables(self, document_id, page_number=None):
+        """Return the tables of a document, or of one of its pages, as lists of rows."""
+        query = "SELECT table_index, row_index, value FROM table_cells WHERE document_id = ?"
+        params = [document_id]
+        if page_number is not None:
+            query += " AND page_number = ?"
+            params.append(page_number)
+        rows = self.cursor.execute(query + " ORDER BY table_index, row_index, column_index", params)
+        tables = {}
+        for table_index, row_index, value in rows:
+            table = tables.setdefault(table_index, [])
+            if len(table) <= row_index:
+                table.extend([] for _ in range(row_index + 1 - len(table)))
+            table[row_index].append(value)
+        return list(tables.values())
+
+    def read_table_cells(self, document_id=None, page_number=None):
+        """
+        Read the table cells of a document, or of the whole corpus, into one long-format DataFrame.
+
+        :param document_id: Id (or list of ids) of the documents to read; None reads every document.
+        :param page_number: Only read the tables of this page.
+        """
+        document_ids = [document_id] if isinstance(document_id, int) else document_id
+        return read_cells(self.conn, document_ids, page_number)
+
+    def read_tables(self, document_id=None, page_number=None, numeric=False):
+        """
+        Read the tables of a document, or of the whole corpus, as one DataFrame per table.
+
+        :param document_id: Id (or list of ids) of the documents to read; None reads every document.
+        :param page_number: Only read the tables of this page.
+        :param numeric: Return the numeric value of every cell (NaN for text cells) instead of its text.
+        :return: {(document_id, table_index): DataFrame}, in document and table order.
+        """
+        return cells_to_frames(self.read_table_cells(document_id, page_number), numeric)
 
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        self.conn.close()
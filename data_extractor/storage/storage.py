@@ -3,7 +3,9 @@ from abc import ABC, abstractmethod
 
 class Storage(ABC):
     def __init__(self, database):
-        self.conn = sqlite3.connect(database)
+        # a connection may be handed to a pipeline writer thread; it is only
+        # ever used by one thread at a time
+        self.conn = sqlite3.connect(database, check_same_thread=False)
         self.cursor = self.conn.cursor()
 
     @abstractmethod
@@ -0,0 +1,104 @@
+import csv
+import io
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import pandas as pd
+
+# Cells that read as numbers, with optional sign, thousands separators,
+# decimals, exponent and a trailing percent sign (kept as the plain number)
+NUMBER_PATTERN = re.compile(r"[+-]?(?:(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|\.\d+)(?:[eE][+-]?\d+)?%?")
+
+# Columns of the long-format frame read_cells() returns, one row per cell; `number`
+# is the value of cells that read as numbers (see cell_number), NaN for the others
+CELL_COLUMNS = ("document_id", "filename", "page_number", "table_index", "row_index", "column_index", "value",
+                "number")
+
+
+def cell_number(value: Optional[str]) -> Optional[float]:
+    """Return the numeric value of a table cell such as '1,234.5' or '12%', or None for other cells."""
+    if value is None:
+        return None
+    text = value.strip()
+    if NUMBER_PATTERN.fullmatch(text) is None:
+        return None
+    return float(text.rstrip("%").replace(",", ""))
+
+
+def cell_rows(document_id: int, tables: Iterable[Sequence[Sequence[Any]]], first_index: int = 0,
+              page_number: Optional[int] = None) -> List[Tuple[Any, ...]]:
+    """
+    Flatten tables into table_cells rows:
+    (document_id, page_number, table_index, row_index, column_index, value, number).
+
+    :param first_index: Index of the first table within its document.
+    """
+    rows = []
+    for table_index, table in enumerate(tables, start=first_index):
+        for row_index, row in enumerate(table):
+            for column_index, value in enumerate(row):
+                if value is not None and not isinstance(value, str):
+                    value = str(value)
+                rows.append((document_id, page_number, table_index, row_index, column_index, value,
+                             cell_number(value)))
+    return rows
+
+
+def table_csv(table: Sequence[Sequence[Any]]) -> str:
+    """Render a table as CSV text; None cells are empty, and cells with commas, quotes or newlines are quoted."""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(
+        ["" if value is None else value for value in row] for row in table)
+    return buffer.getvalue()
+
+
+def read_cells(conn: sqlite3.Connection, document_ids: Optional[Iterable[int]] = None,
+               page_number: Optional[int] = None) -> pd.DataFrame:
+    """
+    Read the stored table cells of some documents (or of the whole corpus) in one query.
+
+    :param conn: Connection to an extraction database.
+    :param document_ids: Ids of the documents to read; None reads every document.
+    :param page_number: Only read the tables of this page.
+    :return: A long-format DataFrame with the CELL_COLUMNS, in table, row and column order.
+    """
+    query = ("SELECT c.document_id, d.filename, c.page_number, c.table_index, c.row_index, c.column_index, "
+             "c.value, c.number FROM table_cells c JOIN documents d ON d.id = c.document_id")
+    conditions = []
+    params: List[Any] = []
+    if document_ids is not None:
+        document_ids = list(document_ids)
+        conditions.append(f"c.document_id IN ({', '.join('?' * len(document_ids))})")
+        params.extend(document_ids)
+    if page_number is not None:
+        conditions.append("c.page_number = ?")
+        params.append(page_number)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY c.document_id, c.table_index, c.row_index, c.column_index"
+    cells = pd.read_sql_query(query, conn, params=params)
+    return cells.astype({"value": "object", "number": "float64"})
+
+
+def cells_to_frames(cells: pd.DataFrame, numeric: bool = False) -> Dict[Tuple[int, int], pd.DataFrame]:
+    """
+    Turn long-format cells into one DataFrame per table, keyed by (document_id, table_index).
+
+    The cells are pivoted into rows and columns once for all tables; each
+    table's frame then keeps only its own columns. None cells and the
+    cells ragged rows lack are NaN.
+
+    :param numeric: Use the numeric value of the cells (NaN for text cells) instead of their text.
+    """
+    if cells.empty:
+        return {}
+    wide = cells.pivot(index=["document_id", "table_index", "row_index"], columns="column_index",
+                       values="number" if numeric else "value")
+    widths = cells.groupby(["document_id", "table_index"])["column_index"].max() + 1
+    frames = {}
+    for (document_id, table_index), table in wide.groupby(level=["document_id", "table_index"], sort=False):
+        frame = table.iloc[:, :widths[(document_id, table_index)]].droplevel(["document_id", "table_index"])
+        frame.columns.name = None
+        frame.index.name = None
+        frames[(int(document_id), int(table_index))] = frame
+    return frames
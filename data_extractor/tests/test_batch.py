@@ -0,0 +1,49 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import pytest
+from data_extractor.data_extractor import batch
+from data_extractor.data_extractor.batch import IN_FLIGHT_PER_WORKER, collect_files, iter_extracted, run_batch
+
+
+def test_collect_files_walks_directories_and_skips_unsupported_files():
+    paths = collect_files("files")
+    assert "files/demo.docx" in paths
+    assert "files/empty.py" not in paths
+
+def test_collect_files_accepts_glob():
+    assert collect_files("test_files/**/small.*") == [
+        "test_files/docx/small.docx", "test_files/pdf/small.pdf", "test_files/pptx/small.pptx"]
+
+def test_corrupt_file_is_recorded_without_stopping_the_batch(tmp_path):
+    database = str(tmp_path / "batch.db")
+    summary = run_batch(["test_files/docx/corrupt.docx", "test_files/docx/small.docx"],
+                        database=database, output_root=str(tmp_path / "out"))
+
+    statuses = {result["file_path"]: result["status"] for result in summary["results"]}
+    assert statuses == {"test_files/docx/corrupt.docx": "failed", "test_files/docx/small.docx": "ok"}
+    assert summary["succeeded"] == 1 and summary["failed"] == 1
+    assert summary["docs_per_second"] > 0
+
+    conn = sqlite3.connect(database)
+    filenames = [row[0] for row in conn.execute('SELECT filename FROM documents')]
+    conn.close()
+    assert filenames == ["small.docx"]
+
+def test_workers_only_run_a_few_files_ahead_of_saving():
+    submitted = []
+
+    class Executor(ThreadPoolExecutor):
+        def submit(self, function, path, *args):
+            submitted.append(path)
+            return super().submit(lambda: {"file_path": path})
+
+    paths = [f"file_{index}.pdf" for index in range(20)]
+    with patch.object(batch, "ProcessPoolExecutor", Executor):
+        results = iter_extracted(paths, 2, {})
+        assert next(results) == {"file_path": "file_0.pdf"}
+        assert len(submitted) == 2 * IN_FLIGHT_PER_WORKER + 1
+        assert [result["file_path"] for result in results] == paths[1:]
+
+if __name__ == "__main__":
+    pytest.main()
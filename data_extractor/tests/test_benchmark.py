@@ -0,0 +1,55 @@
+import copy
+import os
+import pytest
+from data_extractor.data_extractor.benchmark import EXTRACT_METHODS, case_path, compare, measure, run_benchmarks
+
+
+def test_measure_reports_the_fastest_run_and_peak_memory():
+    calls = []
+    metrics = measure(lambda state: calls.append(state) or bytearray(1_000_000), repeat=2, setup=lambda: "loaded")
+    # two timed runs and one traced run, each after its own setup
+    assert calls == ["loaded"] * 3
+    assert metrics["peak_bytes"] >= 1_000_000
+    assert 0 <= metrics["cpu_seconds"] and 0 <= metrics["wall_seconds"]
+
+def test_suite_covers_every_method_and_storage():
+    results = run_benchmarks(["test_files/pdf/sample.pdf"], repeat=1, engines=["default"], trace_memory=False)
+    stages = {case.split("::")[-1] for case in results["cases"]}
+    assert stages == {"load", "file_storage", "sql_storage", *EXTRACT_METHODS}
+    for metrics in results["cases"].values():
+        assert metrics["pages"] == 1
+        assert metrics["bytes_per_second"] > 0
+    assert results["skipped"] == {}
+
+def test_failing_files_are_skipped():
+    results = run_benchmarks(["test_files/pdf/password.pdf"], repeat=1, engines=["default"], trace_memory=False)
+    assert results["cases"] == {}
+    assert results["skipped"] == {"pdf/password.pdf::default": "Invalid PDF file."}
+
+@pytest.mark.parametrize("source", ["test_files", "test_files/", "test_files/**/*.pdf", "test_files/pdf/*.pdf"])
+def test_case_names_do_not_depend_on_the_working_directory(source):
+    path = "test_files/pdf/sample.pdf"
+    name = case_path(path, source)
+    assert name == case_path(os.path.abspath(path), os.path.abspath(source))
+    assert name == ("pdf/sample.pdf" if source.startswith("test_files/pdf") else "test_files/pdf/sample.pdf")
+
+def test_regressions_are_reported_against_the_baseline():
+    baseline = {"cases": {"a::default::extract_text": {"wall_seconds": 0.1, "peak_bytes": 1000},
+                          "b::default::extract_text": {"wall_seconds": 0.001, "peak_bytes": 1000}}}
+    results = copy.deepcopy(baseline)
+    assert compare(results, baseline) == []
+
+    results["cases"]["a::default::extract_text"]["wall_seconds"] = 0.2
+    # a tiny case slowing down by a fraction of a millisecond is timer noise
+    results["cases"]["b::default::extract_text"]["wall_seconds"] = 0.0015
+    regressions = compare(results, baseline)
+    assert [(regression["case"], regression["metric"]) for regression in regressions] == [
+        ("a::default::extract_text", "wall_seconds")]
+    assert regressions[0]["change"] == pytest.approx(1.0)
+
+def test_cases_missing_on_either_side_are_regressions():
+    baseline = {"cases": {"a::default::load": {"wall_seconds": 0.1, "peak_bytes": 1000}}}
+    results = {"cases": {"b::default::load": {"wall_seconds": 0.1, "peak_bytes": 1000}}}
+    regressions = compare(results, baseline)
+    assert [(regression["case"], regression["metric"]) for regression in regressions] == [
+        ("b::default::load", "missing"), ("a::default::load", "missing")]
@@ -0,0 +1,121 @@
+import os
+import shutil
+import sqlite3
+from unittest.mock import patch
+import pytest
+from data_extractor.data_extractor import corpus_sync
+from data_extractor.data_extractor.corpus_sync import sync_corpus, watch_corpus
+from data_extractor.storage.sql_storage import SQLStorage
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    source = tmp_path / "corpus"
+    (source / "slides").mkdir(parents=True)
+    shutil.copy("test_files/docx/small.docx", source / "report.docx")
+    shutil.copy("test_files/pptx/Networks 1.pptx", source / "slides" / "deck.pptx")
+    return source
+
+def sync(tmp_path, source, **options):
+    return sync_corpus(str(source), database=str(tmp_path / "corpus.db"), output_root=str(tmp_path / "out"), **options)
+
+def rows(tmp_path, query):
+    conn = sqlite3.connect(str(tmp_path / "corpus.db"))
+    try:
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+
+def extracted(summary):
+    return sorted(os.path.basename(result["file_path"]) for result in summary["results"])
+
+def test_only_new_and_changed_files_are_extracted(tmp_path, corpus):
+    summary = sync(tmp_path, corpus)
+    assert extracted(summary) == ["deck.pptx", "report.docx"]
+    assert summary["sync"]["new"] == 2
+    images = rows(tmp_path, "SELECT COUNT(*) FROM image_content")[0][0]
+    assert images > 0
+
+    # a second run reads nothing and stores nothing twice
+    summary = sync(tmp_path, corpus)
+    assert extracted(summary) == [] and summary["sync"]["unchanged"] == 2
+    assert rows(tmp_path, "SELECT filename FROM documents ORDER BY filename") == [("deck.pptx",), ("report.docx",)]
+
+    # a new modification time alone only updates the manifest
+    os.utime(corpus / "report.docx", ns=(0, 10 ** 18))
+    summary = sync(tmp_path, corpus)
+    assert extracted(summary) == [] and summary["sync"]["touched"] == 1
+
+    # replaced content is extracted again and its old rows are deleted
+    shutil.copy("test_files/docx/demo.docx", corpus / "report.docx")
+    summary = sync(tmp_path, corpus)
+    assert extracted(summary) == ["report.docx"] and summary["sync"]["changed"] == 1
+    documents = rows(tmp_path, "SELECT id FROM documents WHERE filename = 'report.docx'")
+    assert len(documents) == 1
+    assert rows(tmp_path, "SELECT document_id FROM manifest WHERE path LIKE '%report.docx'") == documents
+    assert rows(tmp_path, "SELECT DISTINCT document_id FROM pages WHERE document_id NOT IN "
+                          "(SELECT id FROM documents)") == []
+
+    # a deleted file takes its rows, and the image bytes only it used, with it
+    os.remove(corpus / "slides" / "deck.pptx")
+    summary = sync(tmp_path, corpus)
+    assert summary["sync"]["deleted"] == 1
+    assert rows(tmp_path, "SELECT filename FROM documents") == [("report.docx",)]
+    assert rows(tmp_path, "SELECT COUNT(*) FROM images WHERE document_id NOT IN (SELECT id FROM documents)") == [(0,)]
+    assert rows(tmp_path, "SELECT COUNT(*) FROM image_content")[0][0] < images
+    assert rows(tmp_path, "SELECT COUNT(*) FROM manifest") == [(1,)]
+
+def test_failed_file_is_tried_again_by_the_next_sync(tmp_path, corpus):
+    shutil.copy("test_files/docx/corrupt.docx", corpus / "broken.docx")
+    summary = sync(tmp_path, corpus)
+    assert summary["failed"] == 1
+    assert sync(tmp_path, corpus)["sync"]["new"] == 1
+
+def test_watch_ingests_new_arrivals(tmp_path, corpus):
+    summaries = []
+
+    def arrive(summary):
+        summaries.append(summary)
+        if len(summaries) == 1:
+            shutil.copy("test_files/pdf/small.pdf", corpus / "arrival.pdf")
+
+    watch_corpus(str(corpus), interval=0, settle=0, rounds=2, on_sync=arrive,
+                 database=str(tmp_path / "corpus.db"), output_root=str(tmp_path / "out"))
+    assert [extracted(summary) for summary in summaries] == [["deck.pptx", "report.docx"], ["arrival.pdf"]]
+
+def test_files_still_being_written_are_left_for_later(tmp_path, corpus):
+    summary = sync(tmp_path, corpus, settle=3600)
+    assert extracted(summary) == [] and summary["sync"]["pending"] == 2
+
+def test_document_is_only_stored_with_its_manifest_row(tmp_path, corpus):
+    # a crash after a document is saved but before its manifest row is written
+    with patch.object(SQLStorage, "record_manifest", side_effect=RuntimeError("crash")):
+        with pytest.raises(RuntimeError, match="crash"):
+            sync(tmp_path, corpus)
+    assert rows(tmp_path, "SELECT COUNT(*) FROM documents") == [(0,)]
+
+    sync(tmp_path, corpus)
+    assert rows(tmp_path, "SELECT filename FROM documents ORDER BY filename") == [("deck.pptx",), ("report.docx",)]
+
+def test_files_vanishing_during_the_scan_do_not_stop_the_sync(tmp_path, corpus):
+    sync(tmp_path, corpus)
+    shutil.copy("test_files/docx/demo.docx", corpus / "report.docx")
+    shutil.copy("test_files/pdf/small.pdf", corpus / "arrival.pdf")
+    os.remove(corpus / "slides" / "deck.pptx")
+    listed = [str(corpus / name) for name in ("arrival.pdf", "report.docx", "slides/deck.pptx")]
+
+    def hash_file(path):
+        raise FileNotFoundError(path)
+
+    # deck.pptx is listed but gone by its stat; report.docx and arrival.pdf are gone by their hash
+    with patch.object(corpus_sync, "collect_files", lambda source: listed), \
+            patch.object(corpus_sync, "hash_file", hash_file):
+        summary = sync(tmp_path, corpus)
+    assert extracted(summary) == []
+    assert summary["sync"]["deleted"] == 1 and summary["sync"]["pending"] == 2
+    # the old rows of report.docx are kept until it can be read again
+    assert rows(tmp_path, "SELECT filename FROM documents") == [("report.docx",)]
+    assert extracted(sync(tmp_path, corpus)) == ["arrival.pdf", "report.docx"]
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,80 @@
+import pytest
+from data_extractor.data_extractor import pdf_extractor
+from data_extractor.data_extractor.extraction_spec import ExtractionSpec, parse_pages
+from data_extractor.data_extractor.helper import ExtractData
+from data_extractor.storage.save_data import SaveData
+from data_extractor.storage.sql_storage import SQLStorage
+
+
+def test_text_only_request_never_opens_table_or_image_backends(monkeypatch):
+    def refuse(*args, **kwargs):
+        raise AssertionError("backend of a skipped artifact was opened")
+    monkeypatch.setattr(pdf_extractor.pdfplumber, "open", refuse)
+    monkeypatch.setattr(pdf_extractor.fitz, "open", refuse)
+
+    spec = ExtractionSpec(artifacts=["text"], pages=[1])
+    data = ExtractData("test_files/pdf/sample.pdf", spec=spec).extractData()
+    assert data["text"] and data["images"] is None and data["urls"] is None and data["tables"] is None
+
+@pytest.mark.parametrize("file_path, ooxml_engine", [
+    ("test_files/pdf/large.pdf", "default"),
+    ("test_files/pptx/large.pptx", "default"),
+    ("test_files/pptx/large.pptx", "raw"),
+    ("test_files/docx/large.docx", "default"),
+    ("test_files/docx/large.docx", "raw")])
+def test_page_selection_matches_the_units_of_those_pages(file_path, ooxml_engine):
+    units = {unit["page"]: unit for unit in ExtractData(file_path, ooxml_engine=ooxml_engine).iterUnits()}
+    pages = sorted(units)[-2:]
+
+    spec = ExtractionSpec(pages=pages)
+    data = ExtractData(file_path, ooxml_engine=ooxml_engine, spec=spec).extractData()
+    assert data["text"].segments() == [{"page": page, "text": units[page]["text"]} for page in pages]
+    assert data["tables"] == [table for page in pages for table in units[page]["tables"]]
+    assert [image["hash"] for image in data["images"]] == [image["hash"] for page in pages
+                                                           for image in units[page]["images"]]
+
+    # max_pages keeps the first of the selected pages
+    limited = ExtractData(file_path, ooxml_engine=ooxml_engine, spec=ExtractionSpec(max_pages=1)).extractData()
+    assert [segment["page"] for segment in limited["text"].segments()] == [sorted(units)[0]]
+
+def test_image_size_limit_and_skipped_artifacts_are_not_saved(tmp_path):
+    full = ExtractData("test_files/pdf/sample.pdf").extractData()
+    limit = min(len(image["image_data"]) for image in full["images"])
+    spec = ExtractionSpec(artifacts=["images", "urls"], max_image_bytes=limit)
+    data = ExtractData("test_files/pdf/sample.pdf", spec=spec).extractData()
+    assert data["images"] == [image for image in full["images"] if len(image["image_data"]) <= limit]
+    assert data["text"] is None
+
+    sql_storage = SQLStorage(str(tmp_path / "spec.db"))
+    try:
+        saveData = SaveData(data, "test_files/pdf/sample.pdf", sql_storage=sql_storage,
+                            output_root=str(tmp_path / "out"), spec=spec)
+        saveData.saveToLocal()
+        saveData.saveToSQLDatabase()
+        assert sql_storage.cursor.execute("SELECT COUNT(*) FROM pages").fetchone()[0] == 0
+    finally:
+        sql_storage.close()
+    assert not (tmp_path / "out" / "sample" / "sample.txt").exists()
+
+def test_cached_partial_extraction_is_kept_apart(tmp_path):
+    cache = str(tmp_path / "cache.db")
+    partial = ExtractData("test_files/docx/small.docx", cache=cache, spec=ExtractionSpec(artifacts=["urls"]))
+    assert partial.extractData()["text"] is None
+    full = ExtractData("test_files/docx/small.docx", cache=cache)
+    assert full.extractData()["text"] is not None and not full.cache_hit
+
+@pytest.mark.parametrize("pages", ["0", "3-1", "a,b", "1-"])
+def test_invalid_page_selection_is_rejected(pages):
+    with pytest.raises(ValueError, match="Invalid page selection"):
+        parse_pages(pages)
+
+def test_spec_from_strings():
+    spec = ExtractionSpec.from_strings("tables, text", "1-3,7,2", "2", None)
+    assert spec.artifacts == ("text", "tables")
+    assert spec.page_numbers(5) == [1, 2]
+    assert ExtractionSpec.from_strings().is_full and ExtractionSpec.from_strings().key() == ""
+    with pytest.raises(ValueError, match="Unsupported artifact"):
+        ExtractionSpec.from_strings("text,audio")
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,222 @@
+import os
+import pickle
+from unittest.mock import patch
+import docx
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+import fitz
+import pdfplumber
+import pptx
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader
+from data_extractor.data_extractor.helper import ExtractData
+from data_extractor.data_extractor.pdf_extractor import PDFExtractor
+from data_extractor.data_extractor.pdf_parallel import page_shards
+from data_extractor.data_extractor.pptx_extractor import PPTXExtractor
+from data_extractor.file_loaders.pdf_loader import PDFLoader
+from data_extractor.file_loaders.ppt_loader import PPTLoader
+
+
+def count_calls(target):
+    """Wrap `target` so the number of calls can be read from `.calls`."""
+    def wrapper(*args, **kwargs):
+        wrapper.calls += 1
+        return target(*args, **kwargs)
+    wrapper.calls = 0
+    return wrapper
+
+def test_docx_is_parsed_once_per_run():
+    parse = count_calls(docx.Document)
+    with patch("data_extractor.file_loaders.docx_loader.docx.Document", parse):
+        ExtractData("test_files/docx/large.docx").extractData()
+    assert parse.calls == 1
+
+def test_pptx_is_parsed_once_per_run():
+    parse = count_calls(pptx.Presentation)
+    with patch("data_extractor.file_loaders.ppt_loader.pptx.Presentation", parse):
+        ExtractData("test_files/pptx/large.pptx").extractData()
+    assert parse.calls == 1
+
+def test_pdf_backends_are_opened_once_per_run():
+    reader = count_calls(PdfReader)
+    fitz_open = count_calls(fitz.open)
+    plumber_open = count_calls(pdfplumber.open)
+    with patch("data_extractor.file_loaders.pdf_loader.PdfReader", reader), \
+            patch("data_extractor.data_extractor.pdf_extractor.fitz.open", fitz_open), \
+            patch("data_extractor.data_extractor.pdf_extractor.pdfplumber.open", plumber_open):
+        ExtractData("test_files/pdf/large.pdf").extractData()
+    assert (reader.calls, fitz_open.calls, plumber_open.calls) == (1, 1, 1)
+
+def test_session_handles_are_closed_after_run():
+    helper = ExtractData("test_files/pdf/sample.pdf")
+    extractor = helper.checkForExtension(helper.file_path)
+    extractor.load(helper.file_path)
+    pdf_document = extractor.session.get("fitz", fitz.open, lambda doc: doc.close())
+    extractor.close()
+    assert extractor.session is None
+    assert pdf_document.is_closed
+
+@pytest.mark.parametrize("pdf_path", ["test_files/pdf/large.pdf", "test_files/pdf/sample.pdf"])
+def test_pymupdf_engine_matches_default_engine(pdf_path):
+    default = ExtractData(pdf_path).extractData()
+    single_pass = ExtractData(pdf_path, pdf_engine="pymupdf").extractData()
+    assert single_pass.keys() == default.keys()
+    for key in ("images", "urls", "tables"):
+        assert len(single_pass[key]) == len(default[key])
+    assert [url["url"] for url in single_pass["urls"]] == [url["url"] for url in default["urls"]]
+    assert [image["page"] for image in single_pass["images"]] == [image["page"] for image in default["images"]]
+
+def test_pymupdf_engine_rejects_password_protected_pdf():
+    with pytest.raises(ValueError, match="Invalid PDF file."):
+        ExtractData("test_files/pdf/password.pdf", pdf_engine="pymupdf").extractData()
+
+def test_unknown_pdf_engine_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported PDF engine"):
+        ExtractData("test_files/pdf/sample.pdf", pdf_engine="camelot")
+
+def test_page_shards_cover_every_page_in_order():
+    assert page_shards(7, 3) == [(0, 3), (3, 6), (6, 7)]
+    assert page_shards(0, 3) == []
+
+def test_parallel_pdf_extraction_matches_serial():
+    serial = PDFExtractor(PDFLoader())
+    serial.load("test_files/pdf/large.pdf")
+    parallel = PDFExtractor(PDFLoader(), workers=2, shard_size=1, min_parallel_pages=1)
+    parallel.load("test_files/pdf/large.pdf")
+    try:
+        assert parallel.use_parallel()
+        assert parallel.extract_images() == serial.extract_images()
+        assert parallel.extract_tables() == serial.extract_tables()
+    finally:
+        serial.close()
+        parallel.close()
+
+def test_small_pdf_falls_back_to_serial_extraction():
+    extractor = PDFExtractor(PDFLoader(), workers=4)
+    extractor.load("test_files/pdf/large.pdf")
+    assert not extractor.use_parallel()
+    extractor.close()
+
+def test_parallel_pptx_extraction_matches_serial():
+    serial = PPTXExtractor(PPTLoader())
+    serial.load("test_files/pptx/large.pptx")
+    parallel = PPTXExtractor(PPTLoader(), workers=2, shard_size=2, min_parallel_slides=1)
+    parallel.load("test_files/pptx/large.pptx")
+    try:
+        assert parallel.use_parallel()
+        assert parallel.walk() == serial.walk()
+        assert parallel.extract_text().pages == serial.extract_text().pages
+    finally:
+        serial.close()
+        parallel.close()
+
+@pytest.mark.parametrize("ooxml_engine", ["default", "raw"])
+def test_pptx_group_shapes_are_extracted(tmp_path, ooxml_engine):
+    image_path = tmp_path / "dot.png"
+    Image.new("RGB", (4, 4), "red").save(image_path)
+    presentation = pptx.Presentation()
+    presentation.slides.add_slide(presentation.slide_layouts[6])
+    slide = presentation.slides.add_slide(presentation.slide_layouts[6])
+    group = slide.shapes.add_group_shape()
+    text_box = group.shapes.add_textbox(0, 0, 100, 100)
+    run = text_box.text_frame.paragraphs[0].add_run()
+    run.text = "grouped link"
+    run.hyperlink.address = "https://example.com/grouped"
+    group.shapes.add_picture(str(image_path), 0, 0)
+    file_path = str(tmp_path / "grouped.pptx")
+    presentation.save(file_path)
+
+    data = ExtractData(file_path, ooxml_engine=ooxml_engine).extractData()
+    assert data["text"].page_text(2) == "grouped link\n"
+    assert data["urls"] == [{"linked_text": "grouped link", "url": "https://example.com/grouped", "page_number": 2}]
+    assert [image["page"] for image in data["images"]] == [2]
+
+@pytest.mark.parametrize("file_path,options", [
+    ("test_files/pdf/large.pdf", {}), ("test_files/pdf/large.pdf", {"pdf_engine": "pymupdf"}),
+    ("test_files/docx/large.docx", {}), ("test_files/docx/large.docx", {"ooxml_engine": "raw"}),
+    ("test_files/pptx/large.pptx", {}), ("test_files/pptx/large.pptx", {"ooxml_engine": "raw"})])
+def test_uploaded_bytes_match_file_extraction(file_path, options):
+    extracted = ExtractData(file_path, **options).extractData()
+    with open(file_path, "rb") as f:
+        data = f.read()
+    # the upload's name only selects the extractor; nothing is read from disk
+    upload_name = "upload" + os.path.splitext(file_path)[1]
+    assert ExtractData(upload_name, data=data, **options).extractData() == extracted
+    with open(file_path, "rb") as f:
+        assert ExtractData(upload_name, data=f, **options).extractData() == extracted
+    assert ExtractData(file_path, use_mmap=True, **options).extractData() == extracted
+
+def test_pdf_is_read_from_disk_once():
+    real_open = open
+    opened = []
+
+    def counting_open(file, *args, **kwargs):
+        if file == "test_files/pdf/large.pdf":
+            opened.append(file)
+        return real_open(file, *args, **kwargs)
+
+    with patch("builtins.open", counting_open):
+        ExtractData("test_files/pdf/large.pdf").extractData()
+    assert len(opened) == 1
+
+@pytest.mark.parametrize("file_path", [
+    "test_files/pdf/large.pdf", "test_files/pptx/large.pptx", "test_files/docx/large.docx"])
+def test_text_is_indexed_by_page(file_path):
+    text = ExtractData(file_path).extractData()["text"]
+    units = list(ExtractData(file_path).iterUnits())
+    assert text == "".join(unit["text"] for unit in units)
+    for unit in units:
+        assert text.page_text(unit["page"]) == unit["text"]
+        start, end = text.page_range(unit["page"])
+        if end > start:
+            assert text.page_at(start) == text.page_at(end - 1) == unit["page"]
+    assert pickle.loads(pickle.dumps(text)).segments() == text.segments()
+
+def test_pdf_pages_are_separated_by_newlines():
+    text = ExtractData("test_files/pdf/large.pdf").extractData()["text"]
+    assert all(segment["text"].endswith("\n") for segment in text.segments() if segment["text"])
+
+def add_hyperlink(paragraph, url, text):
+    rel_id = paragraph.part.relate_to(url, RT.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), rel_id)
+    run = OxmlElement("w:r")
+    text_element = OxmlElement("w:t")
+    text_element.text = text
+    run.append(text_element)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+def test_docx_links_are_resolved_in_body_and_headers(tmp_path):
+    document = docx.Document()
+    document.add_paragraph("intro")
+    add_hyperlink(document.add_paragraph("see "), "https://example.com/body", "the body link")
+    add_hyperlink(document.sections[0].header.paragraphs[0], "https://example.com/header", "header link")
+    file_path = str(tmp_path / "links.docx")
+    document.save(file_path)
+
+    assert ExtractData(file_path).extractData()["urls"] == [
+        {"linked_text": "the body link", "url": "https://example.com/body", "page_number": 2},
+        {"linked_text": "header link", "url": "https://example.com/header", "page_number": None}]
+
+@pytest.mark.parametrize("file_path", [
+    "test_files/docx/large.docx", "test_files/docx/Sample_file2.docx", "files/demo.docx",
+    "test_files/pptx/large.pptx", "test_files/pptx/Networks 1.pptx"])
+def test_raw_ooxml_engine_matches_default(file_path):
+    default = ExtractData(file_path)
+    raw = ExtractData(file_path, ooxml_engine="raw")
+    assert raw.extractData() == default.extractData()
+    assert raw.page_count == default.page_count
+    assert list(ExtractData(file_path, ooxml_engine="raw").iterUnits()) == list(ExtractData(file_path).iterUnits())
+
+@pytest.mark.parametrize("file_path", [
+    "test_files/docx/corrupt.docx", "test_files/docx/password.docx",
+    "test_files/pptx/corrupt.pptx", "test_files/pptx/password.pptx"])
+def test_raw_ooxml_engine_rejects_invalid_files(file_path):
+    with pytest.raises(ValueError, match="Invalid"):
+        ExtractData(file_path, ooxml_engine="raw").extractData()
+
+if __name__ == "__main__":
+    pytest.main()
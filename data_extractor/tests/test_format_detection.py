@@ -0,0 +1,62 @@
+import shutil
+import pytest
+from data_extractor.data_extractor.format_detection import Detection, InvalidFileError, detect_format
+from data_extractor.data_extractor.helper import ExtractData
+from data_extractor.file_loaders.docx_loader import DOCXLoader
+from data_extractor.file_loaders.pdf_loader import PDFLoader
+
+
+@pytest.mark.parametrize("file_path, detection", [
+    ("test_files/pdf/small.pdf", Detection("pdf", None)),
+    ("test_files/pdf/unstandard_language.pdf", Detection("pdf", None)),
+    ("test_files/docx/large.docx", Detection("docx", None)),
+    ("test_files/pptx/large.pptx", Detection("pptx", None)),
+    ("test_files/pdf/password.pdf", Detection("pdf", "encrypted")),
+    ("test_files/pdf/sample-protected.pdf", Detection("pdf", "encrypted")),
+    ("test_files/docx/password.docx", Detection(None, "encrypted")),
+    ("test_files/pptx/password.pptx", Detection(None, "encrypted")),
+    ("test_files/pptx/sample_presentation.ppt", Detection("ppt", "unsupported")),
+    ("test_files/pdf/corrupt.pdf", Detection(None, "unrecognized")),
+    ("files/empty.py", Detection(None, "empty")),
+    ("test_files/pdf/missing.pdf", Detection(None, "unreadable"))])
+def test_format_is_detected_from_content(file_path, detection):
+    assert detect_format(file_path) == detection
+
+def test_truncated_pdf_is_rejected():
+    data = open("test_files/pdf/small.pdf", "rb").read()
+    assert ExtractData("upload.pdf", data=data).extractData()
+    with pytest.raises(InvalidFileError, match="Invalid PDF file.") as error:
+        ExtractData("upload.pdf", data=data[:len(data) // 2]).extractData()
+    assert error.value.reason == "truncated"
+
+def test_ole2_files_are_told_by_their_directory_alone(tmp_path):
+    data = open("test_files/pptx/sample_presentation.ppt", "rb").read()
+    # a stream name in the file's content is not a directory entry
+    fake = tmp_path / "fake.ppt"
+    fake.write_bytes(data[:8] + b"\0" * 504 + "EncryptedPackage".encode("utf-16-le"))
+    assert detect_format(str(fake)) == Detection(None, "corrupt")
+
+def test_mislabeled_files_are_routed_by_content(tmp_path):
+    mislabeled = tmp_path / "report.docx"
+    shutil.copy("test_files/pdf/sample.pdf", mislabeled)
+    helper = ExtractData(str(mislabeled))
+    assert helper.extractData() == ExtractData("test_files/pdf/sample.pdf").extractData()
+    assert helper.file_format == "pdf"
+
+    # a loader still only reads its own format, and says why it refused
+    with pytest.raises(InvalidFileError, match="Invalid DOCX file.") as error:
+        DOCXLoader().load_file(str(mislabeled))
+    assert error.value.reason == "wrong_format"
+    assert PDFLoader().validate_file(str(mislabeled))
+
+@pytest.mark.parametrize("file_path, message, reason", [
+    ("test_files/pptx/sample_presentation.ppt", "Invalid PPT file.", "unsupported"),
+    ("test_files/docx/password.docx", "Invalid DOCX file.", "encrypted"),
+    ("test_files/pdf/password.pdf", "Invalid PDF file.", "encrypted")])
+def test_invalid_files_are_rejected_before_parsing(file_path, message, reason):
+    with pytest.raises(InvalidFileError, match=message) as error:
+        ExtractData(file_path).extractData()
+    assert error.value.reason == reason
+
+if __name__ == "__main__":
+    pytest.main()
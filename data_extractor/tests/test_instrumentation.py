@@ -0,0 +1,77 @@
+import json
+import pytest
+from data_extractor.data_extractor.batch import run_batch
+from data_extractor.data_extractor.helper import ExtractData
+from data_extractor.data_extractor.instrumentation import (NULL_METRICS, CallbackSink, DocumentMetrics,
+                                                           JSONLineSink, PrometheusTextfileSink, sinks_from_spec)
+from data_extractor.storage.save_data import SaveData
+from data_extractor.storage.sql_storage import SQLStorage
+
+
+def test_stages_and_counters_of_one_document(tmp_path):
+    reports = []
+    metrics = DocumentMetrics("test_files/pdf/sample.pdf", [CallbackSink(reports.append)])
+    helper = ExtractData("test_files/pdf/sample.pdf", metrics=metrics)
+    data = helper.extractData()
+
+    sql_storage = SQLStorage(str(tmp_path / "metrics.db"))
+    try:
+        saveData = SaveData(data, "test_files/pdf/sample.pdf", sql_storage=sql_storage,
+                            output_root=str(tmp_path / "out"), page_count=helper.page_count, metrics=metrics)
+        saveData.saveToLocal()
+        saveData.saveToSQLDatabase()
+        rows = sum(sql_storage.cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                   for table in ("pages", "images", "image_content", "links", "table_cells"))
+    finally:
+        sql_storage.close()
+    # the shared connection stops counting into the document once it is saved
+    assert sql_storage.metrics is NULL_METRICS
+
+    report = metrics.report()
+    assert reports == [report]
+    assert report["status"] == "ok"
+    assert {"load", "text", "images", "urls", "tables", "file_storage", "sql_storage", "sql_commit"} <= set(report["spans"])
+    counters = report["counters"]
+    assert counters["pages"] == helper.page_count
+    assert counters["images"] == len(data["images"])
+    assert counters["image_bytes"] == sum(len(image["image_data"]) for image in
+                                          {image["hash"]: image for image in data["images"]}.values())
+    assert counters["tables"] == len(data["tables"])
+    assert counters["links"] == len(data["urls"])
+    assert counters["rows_written"] == rows
+    assert counters["files_written"] > 0 and counters["bytes_written"] > 0
+
+def test_instrumentation_is_off_by_default():
+    helper = ExtractData("test_files/docx/small.docx")
+    assert helper.metrics is NULL_METRICS
+    assert helper.checkForExtension("small.docx").metrics is NULL_METRICS
+    helper.extractData()
+
+def test_batch_reports_every_file_to_the_sinks(tmp_path):
+    log_path = tmp_path / "metrics.log"
+    prometheus_path = tmp_path / "extractor.prom"
+    sinks = sinks_from_spec(f"json:{log_path},prometheus:{prometheus_path}")
+    assert [type(sink) for sink in sinks] == [JSONLineSink, PrometheusTextfileSink]
+
+    run_batch(["test_files/docx/corrupt.docx", "test_files/pptx/small.pptx"], database=str(tmp_path / "batch.db"),
+              output_root=str(tmp_path / "out"), metrics_sinks=sinks)
+
+    reports = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [(report["document"], report["status"]) for report in reports] == [
+        ("test_files/docx/corrupt.docx", "failed"), ("test_files/pptx/small.pptx", "ok")]
+    # the extraction spans recorded in the worker are merged with the storage spans
+    assert {"text", "sql_storage"} <= set(reports[1]["spans"])
+    assert reports[1]["counters"]["pages"] > 0
+
+    textfile = prometheus_path.read_text()
+    assert 'data_extractor_documents_total{status="failed"} 1' in textfile
+    assert 'data_extractor_documents_total{status="ok"} 1' in textfile
+    assert f'data_extractor_pages_total {reports[1]["counters"]["pages"]}' in textfile
+
+def test_unknown_sink_is_rejected():
+    assert sinks_from_spec(None) == []
+    with pytest.raises(ValueError, match="Unsupported metrics sink"):
+        sinks_from_spec("statsd:localhost")
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,350 @@
+import ast
+import json
+import os
+import shutil
+import sqlite3
+from unittest.mock import patch
+import pytest
+from data_extractor.data_extractor.extraction_cache import ExtractionCache, hash_file
+from data_extractor.data_extractor.helper import ExtractData
+from data_extractor.storage.file_storage import FileStorage
+from data_extractor.storage.pipeline import run_pipeline
+from data_extractor.storage.save_data import SaveData
+from data_extractor.storage.schema import SCHEMA_VERSION
+from data_extractor.storage.sql_storage import SQLStorage
+
+
+@pytest.fixture
+def sql_storage(tmp_path):
+    storage = SQLStorage(str(tmp_path / "test.db"))
+    yield storage
+    storage.close()
+
+@pytest.mark.parametrize("file_path", [
+    "test_files/pdf/large.pdf", "test_files/pptx/large.pptx", "test_files/docx/large.docx"])
+def test_streamed_save_matches_in_memory_extraction(tmp_path, sql_storage, file_path):
+    extracted = ExtractData(file_path).extractData()
+    helper = ExtractData(file_path)
+    SaveData({}, file_path, sql_storage=sql_storage, output_root=str(tmp_path)).saveUnits(helper.iterUnits())
+
+    output_dir = tmp_path / os.path.splitext(os.path.basename(file_path))[0]
+    assert (output_dir / "large.txt").read_text() == extracted["text"]
+    assert len(json.loads((output_dir / "images" / "metadata.json").read_text())) == len(extracted["images"])
+    assert len(json.loads((output_dir / "tables" / "metadata.json").read_text())) == len(extracted["tables"])
+
+    document_id = sql_storage.find_documents(os.path.basename(file_path))[0]
+    assert sql_storage.get_text(document_id) == extracted["text"]
+    assert sql_storage.get_tables(document_id) == extracted["tables"]
+    assert sql_storage.get_links(document_id) == extracted["urls"]
+
+@pytest.mark.parametrize("file_path", ["test_files/pdf/large.pdf", "test_files/pptx/Networks 1.pptx"])
+def test_pipelined_save_matches_in_memory_extraction(tmp_path, file_path):
+    extracted = ExtractData(file_path).extractData()
+    storage = SQLStorage(str(tmp_path / "test.db"), image_mode="reference")
+    saveData = SaveData({}, file_path, sql_storage=storage, output_root=str(tmp_path))
+    saveData.savePipelined(ExtractData(file_path).iterUnits(), queue_size=1)
+
+    document_id = storage.find_documents(os.path.basename(file_path))[0]
+    assert storage.get_text(document_id) == extracted["text"]
+    assert storage.get_tables(document_id) == extracted["tables"]
+    assert storage.get_links(document_id) == extracted["urls"]
+    # every image was written to a file before the database referenced it
+    paths = [row[0] for row in storage.conn.execute('SELECT path FROM image_content')]
+    assert len(paths) == len({image["hash"] for image in extracted["images"]})
+    assert all(path and os.path.exists(path) for path in paths)
+    storage.close()
+
+def test_pipeline_holds_back_the_producer():
+    produced = []
+    waiting = []
+
+    def records():
+        for index in range(20):
+            produced.append(index)
+            yield index
+
+    def slow_stage(units):
+        for index in units:
+            # records produced but not yet consumed by this stage
+            waiting.append(len(produced) - index - 1)
+
+    assert run_pipeline(records(), [slow_stage], queue_size=2) == 20
+    assert max(waiting) <= 3
+
+def test_failed_pipeline_stage_rolls_the_document_back(tmp_path, sql_storage):
+    saveData = SaveData({}, "test_files/pdf/large.pdf", sql_storage=sql_storage, output_root=str(tmp_path))
+    units = ExtractData("test_files/pdf/large.pdf").iterUnits()
+    with patch.object(FileStorage, "store_unit", side_effect=OSError("disk full")):
+        with pytest.raises(OSError, match="disk full"):
+            saveData.savePipelined(units)
+    assert sql_storage.conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0] == 0
+
+def test_nested_transaction_rolls_back_on_its_own(sql_storage):
+    with sql_storage.transaction():
+        sql_storage.begin_document("kept.pdf")
+        with pytest.raises(OSError):
+            with sql_storage.transaction():
+                sql_storage.begin_document("dropped.pdf")
+                raise OSError("disk full")
+    filenames = sql_storage.conn.execute("SELECT filename FROM documents").fetchall()
+    assert filenames == [("kept.pdf",)]
+
+def test_nested_rollback_keeps_the_outer_document(sql_storage):
+    with sql_storage.transaction():
+        document_id = sql_storage.begin_document("outer.pdf")
+        with pytest.raises(OSError):
+            with sql_storage.transaction():
+                sql_storage.store_tables(document_id, [[["dropped"]]])
+                raise OSError("disk full")
+        sql_storage.store_tables(document_id, [[["kept"]]])
+        sql_storage.end_document(page_count=3)
+    assert sql_storage.get_tables(document_id) == [[["kept"]]]
+    page_count = sql_storage.conn.execute("SELECT page_count FROM documents").fetchone()[0]
+    assert page_count == 3
+    rows = sql_storage.conn.execute("SELECT table_index FROM table_cells").fetchall()
+    assert rows == [(0,)]
+
+def test_concurrent_writers_match_serial_writes(tmp_path, networks_images):
+    tables = ExtractData("test_files/pdf/large.pdf").extractData()["tables"]
+    outputs = {}
+    for writers in (1, 4):
+        file_storage = FileStorage(str(tmp_path / str(writers)), writers=writers)
+        file_storage.save_images(networks_images, "Networks 1.pptx")
+        file_storage.save_tables(tables, "large.pdf")
+        file_storage.close()
+        outputs[writers] = {path.relative_to(tmp_path / str(writers)): path.read_bytes()
+                            for path in (tmp_path / str(writers)).rglob("*") if path.is_file()}
+        stats = file_storage.write_stats()
+        assert stats["files"] == len(outputs[writers])
+        assert stats["bytes"] == sum(len(data) for data in outputs[writers].values())
+    assert outputs[1] == outputs[4]
+
+def test_single_write_has_a_throughput(tmp_path):
+    file_storage = FileStorage(str(tmp_path))
+    file_storage.write_file(str(tmp_path / "table_1.csv"), "a,b\n")
+    file_storage.close()
+    stats = file_storage.write_stats()
+    assert stats["files"] == 1 and stats["bytes"] == 4
+    assert stats["seconds"] > 0 and stats["bytes_per_second"] > 0
+
+def test_failed_write_leaves_no_partial_file(tmp_path):
+    file_storage = FileStorage(str(tmp_path))
+    with patch("os.replace", side_effect=OSError("disk full")):
+        file_storage.write_file(str(tmp_path / "table_1.csv"), "a,b\n")
+        with pytest.raises(OSError, match="disk full"):
+            file_storage.flush()
+    file_storage.close()
+    assert list(tmp_path.iterdir()) == []
+
+def test_text_can_be_saved_one_file_per_page(tmp_path):
+    text = ExtractData("test_files/pptx/large.pptx").extractData()["text"]
+    FileStorage(str(tmp_path), text_layout="pages").save_text(text, "large.pptx")
+    metadata = json.loads((tmp_path / "text" / "metadata.json").read_text())
+    assert [entry["page_number"] for entry in metadata] == text.pages
+    for entry in metadata:
+        page_text = (tmp_path / "text" / entry["file_name"]).read_text()
+        assert page_text == text[entry["start"]:entry["end"]] == text.page_text(entry["page_number"])
+
+def test_iter_units_yields_one_record_per_page():
+    helper = ExtractData("test_files/pdf/large.pdf")
+    pages = [unit["page"] for unit in helper.iterUnits()]
+    assert pages == list(range(1, helper.page_count + 1))
+
+def test_identical_files_are_served_from_the_cache(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.db"))
+    first = ExtractData("files/demo.docx", cache=cache)
+    extracted = first.extractData()
+    # the same bytes under another name
+    second = ExtractData("test_files/docx/demo.docx", cache=cache)
+    assert second.extractData() == extracted
+    assert (first.cache_hit, second.cache_hit) == (False, True)
+    assert second.page_count == first.page_count
+    cache.close()
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.db"), max_bytes=3000)
+    cache.put("old", {"text": "a" * 1000})
+    cache.put("new", {"text": "b" * 1000})
+    cache.get("old")
+    cache.put("newest", {"text": "c" * 1000})
+    assert cache.get("new") is None
+    assert cache.get("old") is not None and cache.get("newest") is not None
+    cache.close()
+
+def test_cache_entries_of_other_versions_are_invalidated(tmp_path):
+    database = str(tmp_path / "cache.db")
+    old_cache = ExtractionCache(database, version="0")
+    old_cache.put("hash", {"text": "stale"})
+    old_cache.close()
+
+    cache = ExtractionCache(database)
+    assert cache.get("hash") is None
+    cache.invalidate_stale()
+    assert cache.total_size() == 0
+    cache.close()
+
+@pytest.fixture(scope="module")
+def networks_images():
+    return ExtractData("test_files/pptx/Networks 1.pptx").extractData()["images"]
+
+def test_repeated_images_carry_their_bytes_once(networks_images):
+    hashes = {image["hash"] for image in networks_images}
+    assert len(hashes) < len(networks_images)
+    with_bytes = [image for image in networks_images if "image_data" in image]
+    assert sorted(image["hash"] for image in with_bytes) == sorted(hashes)
+    assert all(image["size"] == len(image["image_data"]) for image in with_bytes)
+
+def test_streamed_images_are_not_held_after_their_slide():
+    file_path = "test_files/pptx/Networks 1.pptx"
+    extractor = ExtractData(file_path).checkForExtension(file_path)
+    extractor.load(file_path)
+    sizes = {}
+    handed_out = 0
+    for unit in extractor.iter_units():
+        for image in unit["images"]:
+            sizes[image["hash"]] = image["size"]
+            handed_out += len(image.get("image_data", b""))
+    # every distinct image's bytes were handed out exactly once, and the index kept none
+    assert handed_out == sum(sizes.values())
+    assert all("image_data" not in image for image in extractor.image_index().images.values())
+    extractor.close()
+
+def test_file_storage_writes_each_distinct_image_once(tmp_path, networks_images):
+    metadata = FileStorage(str(tmp_path)).save_images(networks_images, "Networks 1.pptx")
+    written = [name for name in os.listdir(tmp_path / "images") if name != "metadata.json"]
+    assert len(metadata) == len(networks_images)
+    assert len(written) == len({image["hash"] for image in networks_images})
+
+def test_sql_storage_stores_image_bytes_once_across_documents(sql_storage, networks_images):
+    sql_storage.store("image", networks_images, "Networks 1.pptx")
+    sql_storage.store("image", networks_images, "copy of Networks 1.pptx")
+    placements = sql_storage.conn.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+    contents = sql_storage.conn.execute('SELECT COUNT(*) FROM "image_content"').fetchone()[0]
+    assert placements == 2 * len(networks_images)
+    assert contents == len({image["hash"] for image in networks_images})
+
+def test_sql_storage_uses_wal_journal(sql_storage):
+    assert sql_storage.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_document_is_stored_in_one_transaction(sql_storage):
+    tables = [[["cell", str(idx)]] for idx in range(200)]
+    with sql_storage.transaction():
+        sql_storage.store("text", "some text", "doc.pdf")
+        sql_storage.store_many("data_table", tables, "doc.pdf")
+        # nothing is committed until the transaction ends
+        assert sql_storage.conn.in_transaction
+    assert not sql_storage.conn.in_transaction
+    assert sql_storage.conn.execute('SELECT COUNT(*) FROM table_cells').fetchone()[0] == 400
+
+def test_failed_document_is_rolled_back(sql_storage):
+    with pytest.raises(RuntimeError):
+        with sql_storage.transaction():
+            sql_storage.store("text", "partial text", "broken.pdf")
+            raise RuntimeError("extraction failed")
+    assert sql_storage.conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0] == 0
+    assert sql_storage.conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0] == 0
+
+def test_images_are_stored_as_blobs_and_read_back_in_chunks(sql_storage, networks_images):
+    sql_storage.store("image", networks_images, "Networks 1.pptx")
+    image = networks_images[0]
+    stored_type = sql_storage.conn.execute('SELECT typeof(data) FROM "image_content" WHERE hash = ?',
+                                           (image["hash"],)).fetchone()[0]
+    assert stored_type == "blob"
+    chunks = list(sql_storage.iter_image_chunks(image["hash"], chunk_size=1024))
+    assert b"".join(chunks) == image["image_data"]
+    assert max(len(chunk) for chunk in chunks) <= 1024
+
+def test_reference_mode_points_at_the_saved_image_file(tmp_path, networks_images):
+    storage = SQLStorage(str(tmp_path / "test.db"), image_mode="reference")
+    saveData = SaveData({"text": "", "images": networks_images}, "Networks 1.pptx",
+                        sql_storage=storage, output_root=str(tmp_path))
+    saveData.saveToLocal()
+    saveData.saveToSQLDatabase()
+
+    image = networks_images[0]
+    path, data = storage.conn.execute('SELECT path, data FROM "image_content" WHERE hash = ?',
+                                      (image["hash"],)).fetchone()
+    assert data is None and os.path.dirname(path) == str(tmp_path / "Networks 1" / "images")
+    with storage.open_image(image["hash"]) as image_file:
+        assert image_file.read() == image["image_data"]
+    storage.close()
+
+def test_saved_document_is_queryable_by_page(tmp_path, sql_storage):
+    file_path = "test_files/pdf/large.pdf"
+    helper = ExtractData(file_path)
+    SaveData({}, file_path, sql_storage=sql_storage, output_root=str(tmp_path)).saveUnits(helper.iterUnits())
+
+    document_id = sql_storage.find_documents("large.pdf")[0]
+    content_hash, page_count, file_format = sql_storage.conn.execute(
+        "SELECT content_hash, page_count, format FROM documents WHERE id = ?", (document_id,)).fetchone()
+    assert (page_count, file_format) == (helper.page_count, "pdf")
+    assert content_hash == hash_file(file_path)
+    page = next(unit for unit in ExtractData(file_path).iterUnits() if unit["tables"])
+    assert sql_storage.get_tables(document_id, page["page"]) == page["tables"]
+    assert sql_storage.get_text(document_id, page["page"]) == page["text"]
+
+def test_document_details_come_from_the_extraction(tmp_path, sql_storage):
+    mislabeled = tmp_path / "report.docx"
+    shutil.copy("test_files/pdf/small.pdf", mislabeled)
+    helper = ExtractData(str(mislabeled))
+    data = helper.extractData()
+    saveData = SaveData(data, str(mislabeled), sql_storage=sql_storage, output_root=str(tmp_path),
+                        content_hash=helper.content_hash, file_format=helper.file_format, file_size=helper.file_size)
+    # the file is neither opened nor hashed again
+    with patch("data_extractor.storage.save_data.hash_file", side_effect=AssertionError("hashed again")):
+        document_id = saveData.saveToSQLDatabase()
+    details = sql_storage.conn.execute("SELECT content_hash, size, format FROM documents WHERE id = ?",
+                                       (document_id,)).fetchone()
+    assert details == (hash_file(str(mislabeled)), os.path.getsize(mislabeled), "pdf")
+
+def test_legacy_database_is_migrated(tmp_path):
+    database = tmp_path / "database"
+    shutil.copy("database", database)
+    legacy = sqlite3.connect(database)
+    legacy_rows = {table_name: legacy.execute(f'SELECT filename, data FROM "{table_name}"').fetchall()
+                   for table_name in ("text", "url", "data_table")}
+    legacy_images = legacy.execute('SELECT COUNT(*) FROM "image"').fetchone()[0]
+    legacy.close()
+
+    storage = SQLStorage(str(database))
+    (filename, text), = legacy_rows["text"]
+    document_id, = storage.find_documents(filename)
+    assert storage.get_text(document_id) == text
+    assert storage.get_links(document_id) == ast.literal_eval(legacy_rows["url"][0][1])
+    assert storage.get_tables(document_id) == [ast.literal_eval(data) for _, data in legacy_rows["data_table"]]
+    assert storage.conn.execute("SELECT COUNT(*) FROM images").fetchone()[0] == legacy_images
+    # the migrated text is indexed for search
+    assert storage.search(text.split()[0])[0]["filename"] == filename
+    storage.close()
+
+    # opening the migrated database again leaves it as it is
+    storage = SQLStorage(str(database))
+    assert storage.find_documents(filename) == [document_id]
+    assert storage.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    storage.close()
+
+def test_search_returns_ranked_pages_with_snippets(tmp_path, sql_storage):
+    file_path = "test_files/pdf/large.pdf"
+    SaveData({}, file_path, sql_storage=sql_storage, output_root=str(tmp_path)).saveUnits(
+        ExtractData(file_path).iterUnits())
+    page = next(unit for unit in ExtractData(file_path).iterUnits() if len(unit["text"].split()) > 5)
+    word = max(page["text"].split(), key=len).strip(".,;:()")
+
+    hits = sql_storage.search(word)
+    assert hits and all(hit["filename"] == "large.pdf" for hit in hits)
+    assert page["page"] in [hit["page_number"] for hit in hits]
+    assert "[" in hits[0]["snippet"]
+    assert [hit["score"] for hit in hits] == sorted(hit["score"] for hit in hits)
+
+def test_search_index_is_updated_as_documents_are_saved(tmp_path, sql_storage):
+    assert sql_storage.search("zyxwvut") == []
+    SaveData({"text": "first line\nthe zyxwvut term\n"}, "new.docx", sql_storage=sql_storage,
+             output_root=str(tmp_path)).saveToSQLDatabase()
+    hits = sql_storage.search("ZYXWVUT")
+    assert [hit["filename"] for hit in hits] == ["new.docx"]
+    assert sql_storage.search("zyxw*", raw=True) == hits
+    with pytest.raises(ValueError):
+        sql_storage.search('"unbalanced', raw=True)
+
+if __name__ == "__main__":
+    pytest.main()
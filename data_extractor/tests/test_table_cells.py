@@ -0,0 +1,99 @@
+import csv
+import io
+import math
+import sqlite3
+import pytest
+from data_extractor.data_extractor.helper import ExtractData
+from data_extractor.storage.file_storage import FileStorage
+from data_extractor.storage.save_data import SaveData
+from data_extractor.storage.sql_storage import SQLStorage
+from data_extractor.storage.table_cells import cell_number, table_csv
+
+TABLES = [
+    [["Item", "Price, USD", "Share"], ["Tea", "1,250.50", "12%"], ["Coffee", None, "-3"]],
+    [["Name"], ["a \"quoted\"\nline", "extra"]],
+]
+
+
+@pytest.fixture
+def sql_storage(tmp_path):
+    storage = SQLStorage(str(tmp_path / "tables.db"))
+    yield storage
+    storage.close()
+
+@pytest.mark.parametrize("value, number", [
+    ("1,250.50", 1250.5), ("12%", 12.0), ("-3", -3.0), (" .5 ", 0.5), ("2e3", 2000.0),
+    ("Tea", None), ("1,25", None), ("2024-01-01", None), ("", None), (None, None)])
+def test_cell_number(value, number):
+    assert cell_number(value) == number
+
+def test_csv_keeps_commas_quotes_and_none_cells():
+    rows = list(csv.reader(io.StringIO(table_csv(TABLES[0] + TABLES[1]))))
+    assert rows[1] == ["Tea", "1,250.50", "12%"]
+    assert rows[2] == ["Coffee", "", "-3"]
+    assert rows[4] == ["a \"quoted\"\nline", "extra"]
+
+def test_file_storage_writes_tables_with_none_cells(tmp_path):
+    file_storage = FileStorage(str(tmp_path))
+    file_storage.store(TABLES, "document.pdf", "data_table")
+    file_storage.close()
+    assert (tmp_path / "tables" / "table_1.csv").read_text() == table_csv(TABLES[0])
+    metadata = (tmp_path / "tables" / "metadata.json").read_text()
+    assert '"column_count": 2' in metadata
+
+def test_tables_are_read_back_as_dataframes(sql_storage):
+    with sql_storage.transaction():
+        sql_storage.store("data_table", TABLES, "first.pdf")
+    with sql_storage.transaction():
+        sql_storage.store("data_table", TABLES[:1], "second.pdf")
+    first, second = sql_storage.find_documents("first.pdf")[0], sql_storage.find_documents("second.pdf")[0]
+
+    frames = sql_storage.read_tables(first)
+    assert list(frames) == [(first, 0), (first, 1)]
+    frame = frames[(first, 0)]
+    assert frame.astype(object).where(frame.notna(), None).values.tolist() == TABLES[0]
+    # the cell a ragged row lacks is missing, not empty
+    assert frames[(first, 1)].shape == (2, 2) and frames[(first, 1)].isna().iloc[0, 1]
+
+    numbers = sql_storage.read_tables(first, numeric=True)[(first, 0)]
+    assert numbers.iloc[1].tolist()[1:] == [1250.5, 12.0]
+    assert math.isnan(numbers.iloc[0, 0])
+
+    # the whole corpus in one read
+    cells = sql_storage.read_table_cells()
+    assert set(cells["filename"]) == {"first.pdf", "second.pdf"}
+    assert list(sql_storage.read_tables()) == [(first, 0), (first, 1), (second, 0)]
+    assert sql_storage.get_tables(first) == TABLES
+
+def test_cells_of_older_databases_get_their_numbers(tmp_path):
+    database = str(tmp_path / "old.db")
+    SQLStorage(database).close()
+    conn = sqlite3.connect(database)
+    conn.executescript("ALTER TABLE table_cells DROP COLUMN number;"
+                       "INSERT INTO documents (filename) VALUES ('old.pdf');"
+                       "INSERT INTO table_cells VALUES (1, 1, 0, 0, 0, '42'), (1, 1, 0, 0, 1, 'n/a');")
+    conn.close()
+
+    storage = SQLStorage(database)
+    try:
+        assert storage.read_table_cells(1)["number"].tolist()[0] == 42.0
+        assert math.isnan(storage.read_table_cells(1)["number"].tolist()[1])
+    finally:
+        storage.close()
+
+@pytest.mark.parametrize("file_path, options", [
+    ("test_files/pdf/large.pdf", {}), ("test_files/pdf/large.pdf", {"pdf_engine": "pymupdf"}),
+    ("test_files/pdf/large.pdf", {"pdf_workers": 2, "pdf_shard_size": 1}),
+    ("test_files/pptx/large.pptx", {}), ("test_files/pptx/large.pptx", {"ooxml_engine": "raw"}),
+    ("test_files/docx/large.docx", {}), ("test_files/docx/large.docx", {"ooxml_engine": "raw"})])
+def test_whole_document_tables_keep_their_pages(tmp_path, sql_storage, file_path, options):
+    data = ExtractData(file_path, **options).extractData()
+    document_id = SaveData(data, file_path, sql_storage=sql_storage, output_root=str(tmp_path)).saveToSQLDatabase()
+    streamed = [unit["page"] for unit in ExtractData(file_path).iterUnits() for table in unit["tables"]]
+    assert data["tables"].pages == streamed
+    pages = sql_storage.conn.execute("SELECT DISTINCT table_index, page_number FROM table_cells "
+                                     "WHERE document_id = ? ORDER BY table_index", (document_id,)).fetchall()
+    assert [page for _, page in pages] == streamed
+
+if __name__ == "__main__":
+    pytest.main()
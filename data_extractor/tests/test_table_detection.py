@@ -0,0 +1,90 @@
+import io
+import fitz
+import pdfplumber
+import pytest
+from data_extractor.data_extractor.extraction_cache import ExtractionCache
+from data_extractor.data_extractor.helper import ExtractData
+from data_extractor.data_extractor.instrumentation import DocumentMetrics
+from data_extractor.data_extractor.pdf_extractor import PDFExtractor
+from data_extractor.data_extractor.table_detection import TableDetector, is_table_candidate
+from data_extractor.file_loaders.pdf_loader import PDFLoader
+
+
+@pytest.mark.parametrize("file_path", ["test_files/pdf/chinese.pdf", "test_files/pdf/Sample_file.pdf",
+                                       "test_files/pdf/Aman_resume.pdf"])
+def test_screen_skips_pages_without_losing_tables(file_path):
+    unscreened = ExtractData(file_path, table_screen="off").extractData()["tables"]
+    metrics = DocumentMetrics(file_path)
+    assert ExtractData(file_path, metrics=metrics).extractData()["tables"] == unscreened
+
+    counters = metrics.snapshot()["counters"]
+    assert counters["table_pages_screened"] == len(fitz.open(file_path))
+    assert counters["table_pages_skipped"] > 0
+    assert counters["table_pages_missed"] == 0
+
+def test_verify_counts_what_the_screen_would_miss():
+    extractor = PDFExtractor(PDFLoader(), table_screen="verify")
+    extractor.load("test_files/pdf/Sample_file.pdf")
+    try:
+        tables = extractor.extract_tables()
+    finally:
+        extractor.close()
+    stats = extractor.table_detector.stats
+    assert stats["table_pages_screened"] == 3 and stats["table_pages_skipped"] == 1
+    assert stats["table_pages_missed"] == 0 and stats["table_pages_with_tables"] == 1
+    assert tables == ExtractData("test_files/pdf/Sample_file.pdf", table_screen="off").extractData()["tables"]
+
+def test_screen_settings_do_not_share_cache_entries(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.db"))
+    file_path = "test_files/pdf/Sample_file.pdf"
+    screened = ExtractData(file_path, cache=cache)
+    screened.extractData()
+    unscreened = ExtractData(file_path, cache=cache, table_screen="off")
+    unscreened.extractData()
+    assert not unscreened.cache_hit
+
+    # 'verify' always runs detection, so the pages the screen misses are counted every time
+    for _ in range(2):
+        metrics = DocumentMetrics(file_path)
+        verified = ExtractData(file_path, cache=cache, table_screen="verify", metrics=metrics)
+        verified.extractData()
+        assert not verified.cache_hit
+        assert metrics.snapshot()["counters"]["table_pages_screened"] == 3
+    cache.close()
+
+def test_parallel_shards_screen_and_report_their_pages():
+    extractor = PDFExtractor(PDFLoader(), workers=2, shard_size=1, min_parallel_pages=1)
+    extractor.load("test_files/pdf/Sample_file.pdf")
+    try:
+        tables = extractor.extract_tables()
+    finally:
+        extractor.close()
+    assert tables == ExtractData("test_files/pdf/Sample_file.pdf").extractData()["tables"]
+    assert extractor.table_detector.stats["table_pages_screened"] == 3
+    assert extractor.table_detector.stats["table_pages_skipped"] == 1
+
+def test_pymupdf_table_engine():
+    tables = ExtractData("test_files/pdf/large.pdf", table_engine="pymupdf").extractData()["tables"]
+    assert tables == ExtractData("test_files/pdf/large.pdf", pdf_engine="pymupdf").extractData()["tables"]
+    assert tables and all(isinstance(row, list) for table in tables for row in table)
+
+def test_pages_without_ruling_lines_are_not_candidates():
+    with fitz.open() as document:
+        page = document.new_page()
+        page.insert_text((72, 72), "Name    Amount\nTea     2\nCoffee  3")
+        assert not is_table_candidate(page)
+        # the aligned text is no table to either engine, so skipping the page loses nothing
+        assert TableDetector("pymupdf", "off").page_tables(lambda: page, None) == []
+        with pdfplumber.open(io.BytesIO(document.tobytes())) as pdf:
+            assert TableDetector("pdfplumber", "off").page_tables(None, lambda: pdf.pages[0]) == []
+        page.draw_rect(fitz.Rect(50, 50, 300, 120))
+        assert is_table_candidate(page)
+
+def test_unknown_table_engine_or_screen_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported table engine"):
+        TableDetector("camelot")
+    with pytest.raises(ValueError, match="Unsupported table screen"):
+        ExtractData("test_files/pdf/small.pdf", table_screen="sometimes").extractData()
+
+if __name__ == "__main__":
+    pytest.main()
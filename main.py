@@ -1,5 +1,8 @@
+from data_extractor.data_extractor.extraction_spec import ExtractionSpec
 from data_extractor.data_extractor.helper import ExtractData
+from data_extractor.data_extractor.instrumentation import metrics_for, sinks_from_spec
 from data_extractor.storage.save_data import SaveData
+import os
 
 def main():
     # Get configuration from environment variables
@@ -8,13 +11,50 @@ def main():
     # validate if the file path is given
     if not file_path:
         raise ValueError("FILE_PATH is not given.")
-    
+
+    # METRICS_SINK (e.g. 'json', 'json:metrics.log' or 'prometheus:extractor.prom') turns instrumentation on
+    metrics = metrics_for(file_path, sinks_from_spec(os.getenv("METRICS_SINK")))
+    try:
+        extract_and_save(file_path, metrics)
+    except Exception as e:
+        metrics.report("failed", str(e) or type(e).__name__)
+        raise
+    metrics.report()
+
+def extract_and_save(file_path, metrics):
+    # EXTRACT_ARTIFACTS (e.g. 'text,tables'), EXTRACT_PAGES (e.g. '1-3,7'), MAX_PAGES and
+    # MAX_IMAGE_BYTES restrict what is extracted and saved
+    spec = ExtractionSpec.from_strings(os.getenv("EXTRACT_ARTIFACTS"), os.getenv("EXTRACT_PAGES"),
+                                       os.getenv("MAX_PAGES"), os.getenv("MAX_IMAGE_BYTES"))
+    helper = ExtractData(file_path, os.getenv("PDF_ENGINE", "default"),
+                         pdf_workers=int(os.getenv("PDF_WORKERS", "1")),
+                         pdf_shard_size=int(os.getenv("PDF_SHARD_SIZE", "16")),
+                         cache=os.getenv("EXTRACTION_CACHE"),
+                         pptx_workers=int(os.getenv("PPTX_WORKERS", "1")),
+                         ooxml_engine=os.getenv("OOXML_ENGINE", "default"),
+                         use_mmap=os.getenv("INPUT_MMAP") == "1",
+                         table_engine=os.getenv("TABLE_ENGINE", "pdfplumber"),
+                         table_screen=os.getenv("TABLE_SCREEN", "on"),
+                         metrics=metrics,
+                         spec=spec)
+
+    # STREAMING=pipeline writes files and database rows in their own threads while extraction goes on
+    if os.getenv("STREAMING") == "pipeline":
+        SaveData({}, file_path, metrics=metrics, spec=spec).savePipelined(
+            helper.iterUnits(), queue_size=int(os.getenv("PIPELINE_QUEUE_SIZE", "8")))
+        return
+
+    # STREAMING=1 saves every page/slide/section as soon as it is extracted
+    if os.getenv("STREAMING") == "1":
+        SaveData({}, file_path, metrics=metrics, spec=spec).saveUnits(helper.iterUnits())
+        return
+
     # a dictionary object is returned
-    helper = ExtractData(file_path)
     extracted_data = helper.extractData()
 
     # this function will save data to local and database
-    saveData = SaveData(extracted_data, file_path)
+    saveData = SaveData(extracted_data, file_path, page_count=helper.page_count, metrics=metrics, spec=spec,
+                        content_hash=helper.content_hash, file_format=helper.file_format, file_size=helper.file_size)
     saveData.saveToLocal()
     saveData.saveToSQLDatabase()
 
@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+from data_extractor.data_extractor.batch import collect_files, print_summary, run_batch
+from data_extractor.data_extractor.corpus_sync import (DEFAULT_POLL_SECONDS, print_sync_summary, sync_corpus,
+                                                       watch_corpus)
+from data_extractor.data_extractor.extraction_cache import ExtractionCache
+from data_extractor.data_extractor.extraction_spec import ExtractionSpec
+from data_extractor.data_extractor.instrumentation import sinks_from_spec
+
+def main():
+    """
+    Extract and save every document under a directory or matching a glob,
+    inside one long-lived process.
+    """
+    parser = argparse.ArgumentParser(description="Batch extraction of PDF, DOCX and PPTX files.")
+    parser.add_argument("source", help="Directory to walk recursively, or a glob such as 'files/**/*.pdf'")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_WORKERS", "1")),
+                        help="Number of extraction worker processes (1 runs in-process)")
+    parser.add_argument("--database", default=None, help="SQLite database path (defaults to DATABASE_NAME)")
+    parser.add_argument("--output-dir", default="extracted_data", help="Root folder for the extracted files")
+    parser.add_argument("--pdf-engine", default=os.getenv("PDF_ENGINE", "default"), help="PDF engine: default or pymupdf")
+    parser.add_argument("--ooxml-engine", default=os.getenv("OOXML_ENGINE", "default"),
+                        help="DOCX/PPTX engine: default (python-docx/python-pptx) or raw")
+    parser.add_argument("--table-engine", default=os.getenv("TABLE_ENGINE", "pdfplumber"),
+                        help="PDF table detection: pdfplumber or pymupdf (find_tables)")
+    parser.add_argument("--table-screen", choices=("on", "off", "verify"), default=os.getenv("TABLE_SCREEN", "on"),
+                        help="Skip table detection on PDF pages without ruling lines; 'verify' counts what it would miss")
+    parser.add_argument("--mmap", action="store_true", default=os.getenv("INPUT_MMAP") == "1",
+                        help="Memory-map input files instead of reading them into memory")
+    parser.add_argument("--image-storage", choices=("blob", "reference"), default=os.getenv("IMAGE_STORAGE", "blob"),
+                        help="Store image bytes in the database, or only a reference to the saved image file")
+    parser.add_argument("--cache", default=os.getenv("EXTRACTION_CACHE"),
+                        help="Extraction cache database; identical files are extracted only once")
+    parser.add_argument("--metrics", default=os.getenv("METRICS_SINK"),
+                        help="Report per-file stage timings and counters: json, json:<path> or prometheus:<path>")
+    parser.add_argument("--artifacts", default=os.getenv("EXTRACT_ARTIFACTS"),
+                        help="Artifacts to extract, e.g. 'text,tables' (defaults to text,images,urls,tables)")
+    parser.add_argument("--pages", default=os.getenv("EXTRACT_PAGES"),
+                        help="Pages, slides or sections to extract, e.g. '1-3,7' (defaults to all)")
+    parser.add_argument("--max-pages", default=os.getenv("MAX_PAGES"), help="Extract at most this many pages per file")
+    parser.add_argument("--max-image-bytes", default=os.getenv("MAX_IMAGE_BYTES"),
+                        help="Skip images larger than this many bytes")
+    parser.add_argument("--clear-cache", action="store_true", help="Empty the extraction cache before the run")
+    parser.add_argument("--sync", action="store_true",
+                        help="Only extract new or changed files, and delete the rows of deleted or replaced ones")
+    parser.add_argument("--watch", action="store_true", help="Keep polling the source and sync new arrivals")
+    parser.add_argument("--interval", type=float, default=DEFAULT_POLL_SECONDS, help="Seconds between polls in --watch")
+    args = parser.parse_args()
+    metrics_sinks = sinks_from_spec(args.metrics)
+    spec = ExtractionSpec.from_strings(args.artifacts, args.pages, args.max_pages, args.max_image_bytes)
+
+    if args.cache:
+        cache = ExtractionCache(args.cache)
+        if args.clear_cache:
+            cache.invalidate()
+        else:
+            # results of an older extractor version are never reused
+            cache.invalidate_stale()
+        cache.close()
+
+    batch_options = {"workers": args.workers, "database": args.database, "output_root": args.output_dir,
+                     "options": {"pdf_engine": args.pdf_engine, "ooxml_engine": args.ooxml_engine,
+                                 "cache": args.cache, "use_mmap": args.mmap, "spec": spec,
+                                 "table_engine": args.table_engine, "table_screen": args.table_screen},
+                     "image_storage": args.image_storage, "metrics_sinks": metrics_sinks}
+
+    if args.watch:
+        print(f"Watching {args.source} every {args.interval:g}s; press Ctrl+C to stop.")
+        try:
+            watch_corpus(args.source, interval=args.interval, on_sync=print_sync_summary, **batch_options)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.sync:
+        # an empty source is still synced, so the rows of its deleted files go too
+        summary = sync_corpus(args.source, **batch_options)
+        print_summary(summary)
+        print_sync_summary(summary)
+    else:
+        paths = collect_files(args.source)
+        if not paths:
+            print(f"No supported files found in: {args.source}")
+            sys.exit(1)
+        summary = run_batch(paths, **batch_options)
+        print_summary(summary)
+
+    # a non-zero exit code tells callers that some files failed
+    if summary["failed"]:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import sys
+from data_extractor.data_extractor.benchmark import (DEFAULT_SOURCES, DEFAULT_TOLERANCE, compare, load_results,
+                                                     print_report, run_benchmarks, save_results)
+
+def main():
+    """
+    Benchmark every loader, extract_* method and storage over the sample
+    documents, and compare the results with a saved baseline.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark extraction and storage of PDF, DOCX and PPTX files.")
+    parser.add_argument("sources", nargs="*", default=list(DEFAULT_SOURCES),
+                        help="Directories or globs of documents (defaults to test_files and files)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the fastest is reported")
+    parser.add_argument("--engine", action="append", dest="engines",
+                        help="Only run this engine (default, pymupdf, raw, unscreened or pymupdf_tables); "
+                             "may be given several times; cases of the baseline that are not run count as regressions")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip the traced run that measures peak memory (several times faster)")
+    parser.add_argument("--output", default="benchmarks/results.json", help="Where to write the results as JSON")
+    parser.add_argument("--baseline", default="benchmarks/baseline.json", help="Saved results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown or memory growth before a case counts as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sources, repeat=args.repeat, engines=args.engines,
+                             trace_memory=not args.no_memory)
+    save_results(results, args.output)
+
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print_report(results)
+        print(f"Baseline saved to: {args.baseline}")
+        return
+
+    try:
+        baseline = load_results(args.baseline)
+    except FileNotFoundError:
+        print_report(results)
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    print_report(results, regressions)
+    print(f"Results saved to: {args.output}")
+
+    # a non-zero exit code lets CI fail on regressions
+    if regressions:
+        sys.exit(3)
+
+if __name__ == "__main__":
+    main()
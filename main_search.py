@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+from data_extractor.storage.sql_storage import SQLStorage
+load_dotenv()
+
+def main():
+    """
+    Search the text of every saved document and print the best matching pages.
+    """
+    parser = argparse.ArgumentParser(description="Full-text search over extracted documents.")
+    parser.add_argument("query", help="Words that must all occur on a page")
+    parser.add_argument("--database", default=os.getenv("DATABASE_NAME", "database"), help="SQLite database path")
+    parser.add_argument("--limit", type=int, default=10, help="Maximum number of hits")
+    parser.add_argument("--raw", action="store_true",
+                        help="Pass the query to FTS5 unchanged (phrases, OR, NEAR, prefix*)")
+    args = parser.parse_args()
+
+    sql_storage = SQLStorage(args.database)
+    try:
+        hits = sql_storage.search(args.query, limit=args.limit, raw=args.raw)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+    finally:
+        sql_storage.close()
+
+    if not hits:
+        print(f"No matches for: {args.query}")
+        sys.exit(1)
+    for hit in hits:
+        page = hit["page_number"] if hit["page_number"] is not None else "-"
+        print(f"{hit['filename']} (page {page})")
+        print(f"    {' '.join(hit['snippet'].split())}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
+import argparse
 import os
-import sys
 from data_extractor.data_extractor.docx_extractor import DOCXExtractor
+from data_extractor.data_extractor.extraction_spec import ExtractionSpec, extract_with_spec
 from data_extractor.data_extractor.pdf_extractor import PDFExtractor
 from data_extractor.data_extractor.pptx_extractor import PPTXExtractor
 from data_extractor.file_loaders.pdf_loader import PDFLoader
@@ -23,12 +24,16 @@ def main():
     Returns:
         None
     """
-    # Ensure that a file path is passed as an argument
-    if len(sys.argv) < 2:
-        print("Usage: python3 main.py <file_path>")
-        sys.exit(1)
- 
-    file_path = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Extract data from a PDF, DOCX or PPTX file.")
+    parser.add_argument("file_path", help="Path to the file to be processed")
+    parser.add_argument("--artifacts", help="Artifacts to extract, e.g. 'text,tables' (defaults to all)")
+    parser.add_argument("--pages", help="Pages, slides or sections to extract, e.g. '1-3,7' (defaults to all)")
+    parser.add_argument("--max-pages", help="Extract at most this many pages")
+    parser.add_argument("--max-image-bytes", help="Skip images larger than this many bytes")
+    args = parser.parse_args()
+ 
+    file_path = args.file_path
+    spec = ExtractionSpec.from_strings(args.artifacts, args.pages, args.max_pages, args.max_image_bytes)
 
     # file_path = "files/demo.docx"  # Change this to the file you want to process
  
@@ -45,18 +50,16 @@ def main():
     else:
         raise ValueError("Unsupported file format. Use PDF, DOCX, or PPTX.")
  
-    # Extract text from the file
+    # Extract the selected text, images, URLs and tables; skipped ones are None
     extractor.load(file_path)
-    extracted_text = extractor.extract_text()
- 
-    # Extract images (if available)
-    images = extractor.extract_images()
- 
-    # Extract URLs (if it's a PDF or DOCX)
-    urls = extractor.extract_urls()
- 
-    # Extract tables (for PDFs or DOCX only)
-    tables = extractor.extract_tables()
+    extracted_data = extract_with_spec(extractor, spec)
+    extracted_text = extracted_data["text"]
+    images = extracted_data["images"]
+    urls = extracted_data["urls"]
+    tables = extracted_data["tables"]
+
+    # Close the parsed document handles
+    extractor.close()
  
     # Create a folder for storing the extracted data
     base_name = os.path.splitext(os.path.basename(file_path))[0]
@@ -64,7 +67,8 @@ def main():
     file_storage = FileStorage(output_dir)
  
     # Save the extracted text
-    file_storage.store(extracted_text, os.path.basename(file_path), 'text')
+    if extracted_text is not None:
+        file_storage.store(extracted_text, os.path.basename(file_path), 'text')
  
     # Save the extracted images
     if images:
@@ -76,28 +80,31 @@ def main():
  
     # Save the extracted tables (if any)
     if tables:
-        file_storage.store(tables, os.path.basename(file_path), 'table')
+        file_storage.store(tables, os.path.basename(file_path), 'data_table')
  
     print(f"Extracted data saved to: {output_dir}")
     
     # Create an instance of SQLStorage
-    sql_storage = SQLStorage()
- 
-    # Store the extracted text in the SQL database
-    sql_storage.store("text", extracted_text)
- 
-    # Store the extracted images in the SQL database
-    if images:
-        sql_storage.store("image", images)
- 
-    # Store the extracted URLs in the SQL database
-    if urls:
-        sql_storage.store("url", urls)
- 
-    # Store the extracted tables in the SQL database
-    if tables:
-        for table in tables:
-            sql_storage.store("data_table", table)
+    sql_storage = SQLStorage(os.getenv("DATABASE_NAME", "database"))
+    filename = os.path.basename(file_path)
+ 
+    # the whole document is written in one transaction (a single commit)
+    with sql_storage.transaction():
+        # Store the extracted text in the SQL database
+        if extracted_text is not None:
+            sql_storage.store("text", extracted_text, filename)
+ 
+        # Store the extracted images in the SQL database
+        if images:
+            sql_storage.store("image", images, filename)
+ 
+        # Store the extracted URLs in the SQL database
+        if urls:
+            sql_storage.store("url", urls, filename)
+ 
+        # Store every cell of the extracted tables in the SQL database with one bulk insert
+        if tables:
+            sql_storage.store_many("data_table", tables, filename)
  
     print("Data stored in SQL database")
     sql_storage.close()